@@ -0,0 +1,750 @@
+"""
+Perfilamiento por bloques: un acumulador combinable por columna (numérica, categórica o de texto)
+y PerfilPorBloques, que entrega las tablas de eda.genera_profiling_general y
+eda.genera_profiling_por_variable sin tener el data set completo en memoria y guarda su estado
+para actualizarlo con lotes nuevos.
+"""
+import json
+import os
+import pandas as pd
+import numpy as np
+
+from .base import FAMILIAS_NUMERICAS, familia_de_tipo, huellas_renglones, separa_variables_por_tipo
+from .sketches import (
+    ConjuntoHuellas, ConteoDeValores, HyperLogLog, SketchCuantiles, TopFrecuentes, huellas_64, _valor_json)
+from .eda import (
+    LISTA_PERFILAMIENTO_CATEGORICO, LISTA_PERFILAMIENTO_TEXTO, MemoNormalizacion, _arma_profiling_de_numericos,
+    _arma_profiling_general, _datos_modas, _estadisticos_de_sketches, prepara_dataset, valores_numericos_canonicos)
+
+
+# Versión del formato con el que PerfilPorBloques.guarda escribe su estado; si cambia, carga rechaza los
+# archivos anteriores
+VERSION_ESTADO_PERFIL = 2
+
+
+class AcumuladorColumna:
+    """
+    Acumulador combinable con las métricas comunes a cualquier columna: tipo de dato, número de
+    observaciones, número de nulos y posición del primer nulo. Con precision_hll también lleva un
+    HyperLogLog para estimar los valores distintos. Las subclases agregan las métricas de cada tipo.
+    """
+
+    def __init__(self, nombre, precision_hll=None):
+        self.nombre = nombre
+        self.tipo = None
+        self.observaciones = 0
+        self.nulos = 0
+        self.primer_nulo = None
+        self.distintos = None if precision_hll is None else HyperLogLog(precision_hll)
+
+    def actualiza(self, serie, desplazamiento):
+        nulos = serie.isna().to_numpy()
+        self.observaciones += len(serie)
+        self.nulos += int(nulos.sum())
+        if self.primer_nulo is None and nulos.any():
+            self.primer_nulo = desplazamiento + int(np.argmax(nulos))
+        if self.distintos is not None:
+            self.distintos.actualiza(serie)
+
+    def combina(self, otro):
+        if self.tipo is None:
+            self.tipo = otro.tipo
+        self.observaciones += otro.observaciones
+        self.nulos += otro.nulos
+        if otro.primer_nulo is not None:
+            self.primer_nulo = otro.primer_nulo if self.primer_nulo is None \
+                else min(self.primer_nulo, otro.primer_nulo)
+        if otro.distintos is not None:
+            self.distintos = otro.distintos if self.distintos is None else self.distintos.combina(otro.distintos)
+        return self
+
+    def desplaza(self, desplazamiento):
+        """
+        Recorre las posiciones guardadas (para combinarlo después de otro acumulador).
+        """
+        if self.primer_nulo is not None:
+            self.primer_nulo += desplazamiento
+        valores = getattr(self, 'valores', None)
+        frecuentes = getattr(self, 'frecuentes', None)
+        if valores is not None:
+            valores.desplaza(desplazamiento)
+        if frecuentes is not None and frecuentes is not valores:
+            frecuentes.desplaza(desplazamiento)
+
+    def estado(self, arreglos, prefijo):
+        """
+        Guarda los arreglos del acumulador en arreglos (diccionario de arreglos de NumPy) con llaves que
+        empiezan con prefijo y regresa un diccionario con el resto (se guarda como JSON).
+        """
+        return {'clase': type(self).__name__, 'nombre': self.nombre, 'tipo': _tipo_a_texto(self.tipo),
+                'observaciones': self.observaciones, 'nulos': self.nulos, 'primer_nulo': self.primer_nulo,
+                'distintos': None if self.distintos is None else self.distintos.estado(arreglos,
+                                                                                       prefijo + '/distintos')}
+
+    def carga_estado(self, estado, arreglos, prefijo):
+        """
+        Carga en este acumulador (recién creado con los mismos parámetros) lo que regresó estado.
+        """
+        self.tipo = _tipo_de_texto(estado['tipo'])
+        self.observaciones = estado['observaciones']
+        self.nulos = estado['nulos']
+        self.primer_nulo = estado['primer_nulo']
+        if estado['distintos'] is not None:
+            self.distintos = HyperLogLog.de_estado(estado['distintos'], arreglos, prefijo + '/distintos')
+        return self
+
+
+def _tipo_a_texto(tipo):
+    # por su nombre ('float64', 'object', 'Int64', 'string', ...), que pandas_dtype vuelve a convertir en tipo
+    return None if tipo is None else str(tipo)
+
+
+def _tipo_de_texto(texto):
+    return None if texto is None else pd.api.types.pandas_dtype(texto)
+
+
+def _estado_valores(acumulador, arreglos, prefijo):
+    # el conteo exacto de valores puede ser el mismo objeto que el TopFrecuentes, otro conteo o no existir
+    if acumulador.valores is None:
+        return None
+    if acumulador.valores is acumulador.frecuentes:
+        return 'frecuentes'
+    return acumulador.valores.estado(arreglos, prefijo + '/valores')
+
+
+def _carga_valores_acumulador(acumulador, estado, arreglos, prefijo):
+    acumulador.frecuentes = TopFrecuentes.de_estado(estado['frecuentes'], arreglos, prefijo + '/frecuentes')
+    if estado['valores'] is None:
+        acumulador.valores = None
+    elif estado['valores'] == 'frecuentes':
+        acumulador.valores = acumulador.frecuentes
+    else:
+        acumulador.valores = ConteoDeValores.de_estado(estado['valores'], arreglos, prefijo + '/valores')
+
+
+def _tipo_comun(tipo, otro):
+    # los tipos de pandas (Int64, ...) no los acepta np.result_type; si son iguales no hace falta
+    if tipo == otro:
+        return tipo
+    return np.result_type(tipo, otro)
+
+
+class AcumuladorNumerico(AcumuladorColumna):
+    """
+    Acumulador para variables numéricas: conteo, media y varianza por el método de Welford (combinados con la
+    fórmula de Chan), mínimo, máximo y conteo de valores para únicos, cuartiles y top de repetidos. Con
+    k_cuantiles los cuartiles salen de un SketchCuantiles, con precision_hll los únicos de un HyperLogLog y con
+    capacidad_top el top de repetidos de un TopFrecuentes; si se dan los tres, la memoria queda acotada.
+    """
+
+    def __init__(self, nombre, k_cuantiles=None, precision_hll=None, capacidad_top=None):
+        super().__init__(nombre, precision_hll)
+        self.conteo = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = np.nan
+        self.maximo = np.nan
+        self.sketch = None if k_cuantiles is None else SketchCuantiles(k_cuantiles)
+        self.frecuentes = TopFrecuentes(capacidad_top)
+        # El conteo exacto de valores sólo hace falta para cuartiles o únicos exactos
+        if capacidad_top is None:
+            self.valores = self.frecuentes
+        elif k_cuantiles is None or precision_hll is None:
+            self.valores = ConteoDeValores()
+        else:
+            self.valores = None
+
+    def actualiza(self, serie, desplazamiento):
+        super().actualiza(serie, desplazamiento)
+        self.tipo = serie.dtype if self.tipo is None else _tipo_comun(self.tipo, serie.dtype)
+        arreglo = serie.to_numpy(dtype='float64', na_value=np.nan)
+        arreglo = arreglo[~np.isnan(arreglo)]
+        if len(arreglo) > 0:
+            media = arreglo.mean()
+            self._combina_momentos(len(arreglo), media, ((arreglo - media) ** 2).sum(),
+                                   arreglo.min(), arreglo.max())
+            if self.sketch is not None:
+                self.sketch.actualiza(arreglo)
+        serie = pd.Series(valores_numericos_canonicos(serie))
+        self.frecuentes.actualiza(serie, desplazamiento)
+        if self.valores is not None and self.valores is not self.frecuentes:
+            self.valores.actualiza(serie, desplazamiento)
+
+    def combina(self, otro):
+        super().combina(otro)
+        if otro.tipo is not None:
+            self.tipo = otro.tipo if self.tipo is None else _tipo_comun(self.tipo, otro.tipo)
+        if otro.conteo > 0:
+            self._combina_momentos(otro.conteo, otro.media, otro.m2, otro.minimo, otro.maximo)
+        if otro.sketch is not None:
+            self.sketch = otro.sketch if self.sketch is None else self.sketch.combina(otro.sketch)
+        self.frecuentes.combina(otro.frecuentes)
+        if self.valores is not None and self.valores is not self.frecuentes:
+            self.valores.combina(otro.valores)
+        return self
+
+    def _combina_momentos(self, conteo, media, m2, minimo, maximo):
+        total = self.conteo + conteo
+        delta = media - self.media
+        self.media = self.media + delta * conteo / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.conteo * conteo / total
+        self.conteo = total
+        self.minimo = np.fmin(self.minimo, minimo)
+        self.maximo = np.fmax(self.maximo, maximo)
+
+    def estado(self, arreglos, prefijo):
+        estado = super().estado(arreglos, prefijo)
+        estado.update({'conteo': self.conteo, 'media': self.media, 'm2': self.m2, 'minimo': self.minimo,
+                       'maximo': self.maximo,
+                       'sketch': None if self.sketch is None else self.sketch.estado(arreglos, prefijo + '/sketch'),
+                       'frecuentes': self.frecuentes.estado(arreglos, prefijo + '/frecuentes'),
+                       'valores': _estado_valores(self, arreglos, prefijo)})
+        return estado
+
+    def carga_estado(self, estado, arreglos, prefijo):
+        super().carga_estado(estado, arreglos, prefijo)
+        self.conteo = estado['conteo']
+        self.media = np.float64(estado['media'])
+        self.m2 = np.float64(estado['m2'])
+        self.minimo = np.float64(estado['minimo'])
+        self.maximo = np.float64(estado['maximo'])
+        if estado['sketch'] is not None:
+            self.sketch = SketchCuantiles.de_estado(estado['sketch'], arreglos, prefijo + '/sketch')
+        _carga_valores_acumulador(self, estado, arreglos, prefijo)
+        return self
+
+    def estadisticos(self, top=5):
+        """
+        Regresa los estadísticos de la columna con el formato de calcula_estadisticos_numericos (un valor por llave).
+        """
+        cuartiles = [np.nan] * 3
+        if self.sketch is None and self.conteo > 0:
+            # la tabla de valores se ordena y se acumula una sola vez para los tres cuartiles
+            ordenada = self.valores.tabla().sort_index()
+            valores = ordenada.index.to_numpy(dtype='float64')
+            acumulado = ordenada['conteo'].to_numpy().cumsum()
+            cuartiles = []
+            for q in (0.25, 0.5, 0.75):
+                # interpolación lineal sobre la posición q*(n-1), igual que describe()
+                posicion = q * (self.conteo - 1)
+                abajo = int(np.floor(posicion))
+                valor_abajo = valores[np.searchsorted(acumulado, abajo, side='right')]
+                valor_arriba = valores[np.searchsorted(acumulado, min(abajo + 1, self.conteo - 1), side='right')]
+                cuartiles.append(valor_abajo + (valor_arriba - valor_abajo) * (posicion - abajo))
+
+        estadisticos = {'conteo': np.float64(self.conteo),
+                        'media': np.float64(self.media) if self.conteo > 0 else np.float64(np.nan),
+                        'desviacion': np.sqrt(np.float64(self.m2) / (self.conteo - 1)) if self.conteo > 1
+                        else np.float64(np.nan),
+                        'minimo': np.float64(self.minimo), 'maximo': np.float64(self.maximo),
+                        'unicos': len(self.valores.tabla()) if self.distintos is None
+                        else self.distintos.cardinalidad(),
+                        'nulos': self.nulos, 'top5': self.frecuentes.top_repetidos(top)}
+        if self.sketch is None:
+            estadisticos.update({'cuartil_25': np.float64(cuartiles[0]), 'cuartil_50': np.float64(cuartiles[1]),
+                                 'cuartil_75': np.float64(cuartiles[2])})
+        else:
+            estadisticos.update({llave: valor[0] for llave, valor in _estadisticos_de_sketches([self.sketch]).items()})
+        return estadisticos
+
+
+class AcumuladorCategorico(AcumuladorColumna):
+    """
+    Acumulador para variables categóricas: conteo de cada categoría (para las modas y los valores únicos) y
+    el conjunto de categorías observadas. Con capacidad_top las modas salen de un TopFrecuentes y, si además
+    se da precision_hll, el conteo de todas las categorías se descarta en cuanto el HyperLogLog deja de ser
+    exacto (a partir de ahí la memoria queda acotada).
+    """
+
+    def __init__(self, nombre, precision_hll=None, capacidad_top=None):
+        super().__init__(nombre, precision_hll)
+        self.frecuentes = TopFrecuentes(capacidad_top)
+        self.valores = self.frecuentes if capacidad_top is None else ConteoDeValores()
+
+    def actualiza(self, serie, desplazamiento):
+        super().actualiza(serie, desplazamiento)
+        self.frecuentes.actualiza(serie, desplazamiento)
+        if self.valores is not None and self.valores is not self.frecuentes:
+            self.valores.actualiza(serie, desplazamiento)
+            self._descarta_valores()
+
+    def combina(self, otro):
+        super().combina(otro)
+        self.frecuentes.combina(otro.frecuentes)
+        if self.valores is not None and self.valores is not self.frecuentes:
+            if otro.valores is None:
+                self.valores = None
+            else:
+                self.valores.combina(otro.valores)
+                self._descarta_valores()
+        return self
+
+    def _descarta_valores(self):
+        if self.distintos is not None and not self.distintos.es_exacto():
+            self.valores = None
+
+    def estado(self, arreglos, prefijo):
+        estado = super().estado(arreglos, prefijo)
+        estado.update({'frecuentes': self.frecuentes.estado(arreglos, prefijo + '/frecuentes'),
+                       'valores': _estado_valores(self, arreglos, prefijo)})
+        return estado
+
+    def carga_estado(self, estado, arreglos, prefijo):
+        super().carga_estado(estado, arreglos, prefijo)
+        _carga_valores_acumulador(self, estado, arreglos, prefijo)
+        return self
+
+    def tipo_dato(self):
+        """
+        Regresa el tipo category con las categorías observadas (ordenadas, como las deja astype('category')).
+        """
+        if self.valores is None:
+            return pd.CategoricalDtype()
+        return pd.CategoricalDtype(self.valores.tabla().index.sort_values())
+
+    def datos_variable(self):
+        """
+        Regresa la columna de la tabla de genera_profiling_de_categorias para esta variable.
+        """
+        tipo_dato = self.tipo_dato()
+
+        # en columnas category value_counts deja los empates en el orden de las categorías
+        tabla_importantes = self.frecuentes.tabla_conteo_porcentaje(orden='valor')
+        datos_modas = _datos_modas(tabla_importantes, self.frecuentes.error)
+
+        num_obs_nulas = np.int64(self.nulos)
+        if self.distintos is None or self.distintos.es_exacto():
+            num_categorias = np.int64(len(self.valores.tabla()))
+            valores_unicos = self.valores.unicos(self.primer_nulo)
+        else:
+            num_categorias = self.distintos.cardinalidad()
+            valores_unicos = "Más de " + str(self.distintos.umbral_exacto) + " valores distintos"
+        return [tipo_dato, num_categorias, self.observaciones, num_obs_nulas, num_obs_nulas / self.observaciones,
+                valores_unicos] + datos_modas
+
+
+class AcumuladorTexto(AcumuladorColumna):
+    """
+    Acumulador para variables de texto: número de observaciones, huellas de 64 bits de los valores distintos
+    (para no guardar los textos completos; con precision_hll sólo los registros del HyperLogLog) y
+    estadísticas de longitud (suma, conteo, mínimo y máximo).
+    """
+
+    def __init__(self, nombre, precision_hll=None):
+        super().__init__(nombre, precision_hll)
+        self.tipo = np.dtype('O')
+        self.huellas = ConjuntoHuellas()
+        self.suma_longitud = 0
+        self.conteo_longitud = 0
+        self.longitud_minima = np.nan
+        self.longitud_maxima = np.nan
+
+    def actualiza(self, serie, desplazamiento):
+        super().actualiza(serie, desplazamiento)
+        validos = serie.dropna()
+        if self.distintos is None:
+            self.huellas.agrega(huellas_64(validos))
+
+        longitudes = validos.str.len().dropna()
+        if len(longitudes) > 0:
+            self._combina_longitudes(longitudes.sum(), len(longitudes), longitudes.min(), longitudes.max())
+
+    def combina(self, otro):
+        super().combina(otro)
+        self.huellas.combina(otro.huellas)
+        if otro.conteo_longitud > 0:
+            self._combina_longitudes(otro.suma_longitud, otro.conteo_longitud,
+                                     otro.longitud_minima, otro.longitud_maxima)
+        return self
+
+    def _combina_longitudes(self, suma, conteo, minimo, maximo):
+        self.suma_longitud += suma
+        self.conteo_longitud += conteo
+        self.longitud_minima = np.fmin(self.longitud_minima, minimo)
+        self.longitud_maxima = np.fmax(self.longitud_maxima, maximo)
+
+    def estado(self, arreglos, prefijo):
+        estado = super().estado(arreglos, prefijo)
+        estado.update({'huellas': self.huellas.estado(arreglos, prefijo + '/huellas'),
+                       'suma_longitud': self.suma_longitud, 'conteo_longitud': self.conteo_longitud,
+                       'longitud_minima': self.longitud_minima, 'longitud_maxima': self.longitud_maxima})
+        return estado
+
+    def carga_estado(self, estado, arreglos, prefijo):
+        super().carga_estado(estado, arreglos, prefijo)
+        self.huellas = ConjuntoHuellas.de_estado(estado['huellas'], arreglos, prefijo + '/huellas')
+        self.suma_longitud = estado['suma_longitud']
+        self.conteo_longitud = estado['conteo_longitud']
+        self.longitud_minima = np.float64(estado['longitud_minima'])
+        self.longitud_maxima = np.float64(estado['longitud_maxima'])
+        return self
+
+    def datos_variable(self):
+        """
+        Regresa la columna de la tabla de genera_profiling_de_texto para esta variable.
+        """
+        num_obs_unicas = len(self.huellas) if self.distintos is None else self.distintos.cardinalidad()
+        tam_prom = np.float64(self.suma_longitud / self.conteo_longitud) if self.conteo_longitud > 0 \
+            else np.float64(np.nan)
+        tam_min, tam_max = self.longitud_minima, self.longitud_maxima
+        # str.len() sólo entrega enteros cuando ningún valor es nulo
+        if self.conteo_longitud == self.observaciones:
+            tam_min, tam_max = np.int64(tam_min), np.int64(tam_max)
+        return [self.tipo, self.observaciones, num_obs_unicas, num_obs_unicas / self.observaciones,
+                tam_prom, tam_min, tam_max]
+
+
+class PerfilPorBloques:
+    """
+    Perfilamiento combinable por bloques: recibe el data set en pedazos (por ejemplo, con
+    pd.read_csv(..., chunksize=...)) y mantiene un acumulador por columna más las huellas de 64 bits de los
+    renglones para contar duplicados. Al final entrega las tablas de genera_profiling_general y
+    genera_profiling_por_variable sin tener todo el data set en memoria. Con k_cuantiles los cuartiles se
+    aproximan con un SketchCuantiles por variable numérica, con precision_hll los valores distintos se
+    estiman con un HyperLogLog por variable y con capacidad_top el top de repetidos y las modas salen de un
+    TopFrecuentes por variable. Por default se usan los tres, así que la memoria queda acotada; mientras una
+    columna tenga pocos valores distintos (menos de 2^precision_hll y de capacidad_top) y pocos renglones
+    (hasta que el SketchCuantiles compacta) sus métricas siguen siendo exactas. Con los tres en None las
+    tablas son exactamente las mismas que en memoria, pero cada columna guarda el conteo de todos sus
+    valores distintos.
+
+    Los duplicados entre bloques se detectan sólo por la huella de 64 bits de cada renglón (no se guardan
+    los renglones para verificarlos como en marca_duplicados), igual que las observaciones únicas de las
+    variables de texto: dos valores distintos con la misma huella cuentan como uno, con una probabilidad de
+    alrededor de n^2/2^65 (menos de 3e-4 con 10^8 renglones).
+
+    El estado se puede guardar en disco (guarda/carga) para agregarle después los renglones nuevos, por
+    ejemplo cada bimestre, sin volver a recorrer la historia (ver actualiza_perfil_persistido). Las huellas
+    de los renglones, que crecen con la historia, van en segmentos que no se reescriben; el resto del estado
+    se reescribe completo cada vez (ver guarda).
+
+    ==========
+    Ejemplo:
+        >>perfil = PerfilPorBloques()
+        >>for bloque in pd.read_csv('../data/consumo-agua.csv', chunksize=100000):
+        >>    perfil.actualiza(prepara_dataset(bloque))
+        >>perfilamiento_general = perfil.genera_profiling_general()
+        >>profiling_numericas,profiling_categoricas,profiling_de_texto = perfil.genera_profiling_por_variable()
+        >>perfil.guarda('../data/perfil_consumo_agua.npz')
+    """
+
+    def __init__(self, k_cuantiles=200, precision_hll=14, capacidad_top=1000):
+        self.k_cuantiles = k_cuantiles
+        self.precision_hll = precision_hll
+        self.capacidad_top = capacidad_top
+        self.columnas = []
+        self.acumuladores = {}
+        self.renglones = 0
+        self.huellas_renglones = ConjuntoHuellas()
+        self.duplicados = 0
+
+    def actualiza(self, df):
+        """
+        Agrega un bloque (data frame) al perfilamiento.
+        """
+        for col in df.columns:
+            if col not in self.acumuladores:
+                self.columnas.append(col)
+                self.acumuladores[col] = AcumuladorColumna(col, self.precision_hll)
+
+            acumulador = self.acumuladores[col]
+            # Un bloque sin ningún valor no nos dice el tipo de la columna; sólo cuenta sus nulos
+            if type(acumulador) is AcumuladorColumna and df[col].notna().any():
+                acumulador = self._acumulador_para(col, df[col].dtype, acumulador)
+            acumulador.actualiza(df[col], self.renglones)
+
+        # Duplicados: un renglón es duplicado si su huella ya se vio (en este bloque o en los anteriores)
+        huellas = huellas_renglones(df)
+        repetidos_en_bloque = pd.Series(huellas).duplicated(keep='first').to_numpy()
+        vistos = self.huellas_renglones.contiene(huellas)
+        self.duplicados += int((repetidos_en_bloque | vistos).sum())
+        self.huellas_renglones.agrega(huellas)
+
+        self.renglones += len(df)
+        return self
+
+    def combina(self, otro):
+        """
+        Combina este perfilamiento con el de un bloque posterior del mismo data set (por ejemplo, el que
+        calculó otro proceso). Las posiciones del otro perfilamiento se recorren después de las de éste, por
+        lo que el otro perfilamiento ya no debe usarse después de combinarlo.
+        """
+        for col in otro.columnas:
+            acumulador_otro = otro.acumuladores[col]
+            acumulador_otro.desplaza(self.renglones)
+            if col not in self.acumuladores:
+                self.columnas.append(col)
+                self.acumuladores[col] = AcumuladorColumna(col, self.precision_hll)
+            acumulador = self.acumuladores[col]
+            if type(acumulador) is AcumuladorColumna and type(acumulador_otro) is not AcumuladorColumna:
+                # las categóricas no guardan tipo, así que se usa la clase del otro acumulador
+                acumulador = self._reemplaza_acumulador(type(acumulador_otro).__name__, col, acumulador)
+            if type(acumulador_otro) is AcumuladorColumna:
+                AcumuladorColumna.combina(acumulador, acumulador_otro)
+            else:
+                acumulador.combina(acumulador_otro)
+
+        # Los renglones únicos del otro que ya estaban aquí ahora cuentan como duplicados
+        self.duplicados += otro.duplicados + self.huellas_renglones.cuenta_comunes(otro.huellas_renglones)
+        self.huellas_renglones.combina(otro.huellas_renglones)
+        self.renglones += otro.renglones
+        return self
+
+    def guarda(self, ruta):
+        """
+        Guarda el estado del perfilamiento sin pickle. Las huellas de los renglones (8 bytes por renglón de
+        toda la historia) van en el directorio de segmentos (ruta sin extensión más '_huellas'), un archivo
+        .npy por corrida del ConjuntoHuellas: las corridas que ya estaban guardadas no se vuelven a escribir
+        y, como las corridas se juntan geométricamente, cada huella se reescribe O(log N) veces en total.
+        Todo lo demás va en el archivo .npz de ruta, que sí se reescribe completo: los arreglos de cada
+        acumulador (conteos, sketches y registros) y un JSON con la versión del formato
+        (VERSION_ESTADO_PERFIL). Con los sketches (el default) ese archivo tiene tamaño acotado; sin ellos
+        crece con el número de valores distintos de cada columna (y de textos distintos sin precision_hll),
+        no con el de renglones. Primero se escriben los segmentos nuevos, luego el .npz a un temporal que
+        reemplaza al anterior y al final se borran los segmentos que ya no se usan, así que nunca queda un
+        estado a medias.
+        """
+        segmentos = _SegmentosHuellas(_directorio_segmentos(ruta))
+        arreglos = {}
+        estado = {'version': VERSION_ESTADO_PERFIL, 'k_cuantiles': self.k_cuantiles,
+                  'precision_hll': self.precision_hll, 'capacidad_top': self.capacidad_top,
+                  'renglones': self.renglones, 'duplicados': self.duplicados,
+                  'columnas': [self.acumuladores[col].estado(arreglos, 'columna_' + str(i))
+                               for i, col in enumerate(self.columnas)],
+                  'huellas_renglones': self.huellas_renglones.estado(arreglos, 'huellas_renglones', segmentos)}
+        arreglos['estado'] = np.array(json.dumps(estado, default=_valor_json))
+        with open(ruta + '.tmp', 'wb') as archivo:
+            np.savez(archivo, **arreglos)
+        os.replace(ruta + '.tmp', ruta)
+        segmentos.borra_sin_usar()
+
+    @classmethod
+    def carga(cls, ruta):
+        """
+        Carga un estado guardado con guarda. Los segmentos de huellas se abren con mmap, así que buscar los
+        renglones de un bloque nuevo sólo lee las partes que necesita. Si se guardó con otra versión del
+        formato lanza ValueError.
+        """
+        with np.load(ruta, allow_pickle=False) as arreglos:
+            estado = json.loads(str(arreglos['estado']))
+            if estado.get('version') != VERSION_ESTADO_PERFIL:
+                raise ValueError("El estado " + str(ruta) + " tiene la versión " + str(estado.get('version')) +
+                                 " del formato y se esperaba la " + str(VERSION_ESTADO_PERFIL))
+            perfil = cls(estado['k_cuantiles'], estado['precision_hll'], estado['capacidad_top'])
+            perfil.renglones = estado['renglones']
+            perfil.duplicados = estado['duplicados']
+            perfil.huellas_renglones = ConjuntoHuellas.de_estado(estado['huellas_renglones'], arreglos,
+                                                                 'huellas_renglones',
+                                                                 _SegmentosHuellas(_directorio_segmentos(ruta)))
+            for i, estado_columna in enumerate(estado['columnas']):
+                col = estado_columna['nombre']
+                acumulador = perfil._acumulador_vacio(estado_columna['clase'], col)
+                perfil.columnas.append(col)
+                perfil.acumuladores[col] = acumulador.carga_estado(estado_columna, arreglos, 'columna_' + str(i))
+        return perfil
+
+    def _acumulador_vacio(self, clase, col):
+        if clase == 'AcumuladorNumerico':
+            return AcumuladorNumerico(col, self.k_cuantiles, self.precision_hll, self.capacidad_top)
+        if clase == 'AcumuladorCategorico':
+            return AcumuladorCategorico(col, self.precision_hll, self.capacidad_top)
+        if clase == 'AcumuladorTexto':
+            return AcumuladorTexto(col, self.precision_hll)
+        return AcumuladorColumna(col, self.precision_hll)
+
+    def _acumulador_para(self, col, tipo, anterior):
+        familia = familia_de_tipo(tipo)
+        if familia in FAMILIAS_NUMERICAS:
+            clase = 'AcumuladorNumerico'
+        elif familia == 'categorica':
+            clase = 'AcumuladorCategorico'
+        elif familia == 'texto':
+            clase = 'AcumuladorTexto'
+        else:
+            # booleanas, fechas, etc.: genera_profiling_por_variable no las perfila, sólo cuentan en los tipos
+            anterior.tipo = tipo
+            return anterior
+        return self._reemplaza_acumulador(clase, col, anterior)
+
+    def _reemplaza_acumulador(self, clase, col, anterior):
+        acumulador = self._acumulador_vacio(clase, col)
+        AcumuladorColumna.combina(acumulador, anterior)
+        self.acumuladores[col] = acumulador
+        return acumulador
+
+    def vars_type(self):
+        """
+        Regresa la tabla de tipos (columnas tipo y variable) como la que se arma a partir de df.dtypes.
+        """
+        tipos = []
+        for col in self.columnas:
+            acumulador = self.acumuladores[col]
+            if isinstance(acumulador, AcumuladorCategorico):
+                tipos.append(acumulador.tipo_dato())
+            elif acumulador.tipo is None:
+                tipos.append(np.dtype('float64'))
+            else:
+                tipos.append(acumulador.tipo)
+        vars_type = pd.DataFrame({'tipo': pd.Series(tipos, index=self.columnas, dtype='object')})
+        vars_type['variable'] = vars_type.index
+        return vars_type
+
+    def genera_profiling_general(self):
+        """
+        Regresa la misma tabla que genera_profiling_general(df).
+        """
+        nulos_totales = np.int64(sum(self.acumuladores[col].nulos for col in self.columnas))
+        return _arma_profiling_general(self.vars_type(), self.renglones, nulos_totales, self.duplicados)
+
+    def genera_profiling_por_variable(self):
+        """
+        Regresa las mismas tablas que genera_profiling_por_variable(df).
+        """
+        vars_type = self.vars_type()
+        lista_numericas, lista_date, lista_category, lista_texto = separa_variables_por_tipo(vars_type)
+
+        if len(lista_numericas)==0:
+            profiling_numericas = "No hay variables numéricas"
+        else:
+            por_columna = [self.acumuladores[col].estadisticos() for col in lista_numericas]
+            estadisticos = {llave: [e[llave] for e in por_columna] for llave in por_columna[0]}
+            tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
+            profiling_numericas = _arma_profiling_de_numericos(lista_numericas, tipos, estadisticos)
+
+        if len(lista_category)==0:
+            profiling_categoricas = "No hay variables categóricas"
+        else:
+            profiling_categoricas = pd.DataFrame(data={'metrica':LISTA_PERFILAMIENTO_CATEGORICO})
+            for col in lista_category:
+                profiling_categoricas[col] = self.acumuladores[col].datos_variable()
+
+        if len(lista_texto)==0:
+            profiling_texto = "No hay variables de tipo texto"
+        else:
+            profiling_texto = pd.DataFrame(data={'metrica':LISTA_PERFILAMIENTO_TEXTO})
+            for col in lista_texto:
+                profiling_texto[col] = self.acumuladores[col].datos_variable()
+
+        return (profiling_numericas,profiling_categoricas,profiling_texto)
+
+
+def _directorio_segmentos(ruta):
+    # 'perfil.npz' -> 'perfil_huellas'
+    return os.path.splitext(ruta)[0] + '_huellas'
+
+
+class _SegmentosHuellas:
+    """
+    Directorio con las corridas de huellas de un estado guardado, un archivo .npy por corrida. Una corrida
+    que ya está en el directorio se referencia por su nombre; las nuevas se escriben con un nombre que no
+    existe, así que nunca se sobreescribe un segmento que el estado anterior todavía usa.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.usados = set()
+        self._siguiente = 0
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def guarda(self, corrida, archivo):
+        if archivo is not None and os.path.dirname(archivo) == self.directorio and os.path.exists(archivo):
+            nombre = os.path.basename(archivo)
+        else:
+            os.makedirs(self.directorio, exist_ok=True)
+            nombre = self._nombre_libre()
+            np.save(self.ruta(nombre), np.asarray(corrida))
+        self.usados.add(nombre)
+        return nombre
+
+    def carga(self, nombre):
+        return np.load(self.ruta(nombre), mmap_mode='r', allow_pickle=False)
+
+    def borra_sin_usar(self):
+        if not os.path.isdir(self.directorio):
+            return
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.npy') and nombre not in self.usados:
+                os.remove(self.ruta(nombre))
+
+    def _nombre_libre(self):
+        while os.path.exists(self.ruta('corrida_' + str(self._siguiente) + '.npy')):
+            self._siguiente += 1
+        self._siguiente += 1
+        return 'corrida_' + str(self._siguiente - 1) + '.npy'
+
+
+def actualiza_perfil_persistido(ruta_estado, df, k_cuantiles=200, precision_hll=14, capacidad_top=1000):
+    """
+    Función que agrega un lote nuevo (por ejemplo, un bimestre ya preparado) al perfilamiento guardado en
+    ruta_estado, guarda el estado actualizado y regresa las tablas del perfilamiento de toda la historia. No
+    se vuelve a recorrer la historia: las huellas de los renglones anteriores se leen con mmap sólo donde
+    hace falta y sólo se escriben las corridas nuevas (O(n log N) amortizado para n renglones nuevos de N en
+    total), más el resto del estado, que se reescribe completo y tiene tamaño acotado con los sketches (sin
+    ellos crece con los valores distintos, ver PerfilPorBloques.guarda). Si el estado no existe se crea con
+    k_cuantiles, precision_hll y capacidad_top; si ya existe, se usan los parámetros con los que se creó.
+
+    ==========
+    * Args:
+         - ruta_estado: archivo .npz con el estado del perfilamiento (las huellas de los renglones quedan en
+           el directorio de junto, con el mismo nombre más '_huellas').
+         - df: el lote nuevo.
+         - k_cuantiles, precision_hll, capacidad_top: parámetros de PerfilPorBloques para un estado nuevo.
+    * Return:
+         - perfilamiento_general: Data Frame con el perfilamiento general.
+         - profiling_numericas: Data Frame con el perfilamiento para las variables numéricas.
+         - profiling_categoricas: Data Frame con el perfilamiento para las variables categóricas
+         - profiling_de_texto: Data Frame con el perfilamiento para las variables de tipo texto
+    ==========
+    Ejemplo:
+        >>general,numericas,categoricas,texto = actualiza_perfil_persistido('../data/perfil.npz', df_bimestre)
+    """
+    if os.path.exists(ruta_estado):
+        perfil = PerfilPorBloques.carga(ruta_estado)
+    else:
+        perfil = PerfilPorBloques(k_cuantiles, precision_hll, capacidad_top)
+    perfil.actualiza(df)
+    perfil.guarda(ruta_estado)
+
+    profiling_numericas,profiling_categoricas,profiling_texto = perfil.genera_profiling_por_variable()
+    return perfil.genera_profiling_general(),profiling_numericas,profiling_categoricas,profiling_texto
+
+
+def genera_profiling_por_bloques(ruta_csv, tamano_bloque=100000, prepara=True, k_cuantiles=200,
+                                 precision_hll=14, capacidad_top=1000, **kwargs):
+    """
+    Función que genera el perfilamiento general y por variable leyendo el csv por bloques, para data sets
+    que no caben en memoria. Entrega las tablas de genera_profiling_general y genera_profiling_por_variable,
+    con la memoria acotada por los sketches de PerfilPorBloques; con k_cuantiles, precision_hll y
+    capacidad_top en None son exactamente las mismas que en memoria.
+
+    ==========
+    * Args:
+         - ruta_csv: ruta (o url) del csv.
+         - tamano_bloque: número de renglones que se leen en cada bloque.
+         - prepara: si es True se aplica prepara_dataset a cada bloque antes de perfilarlo.
+         - k_cuantiles: tamaño del SketchCuantiles de los cuartiles (None para cuartiles exactos).
+         - precision_hll: precisión del HyperLogLog de los valores distintos (None para conteo exacto).
+         - capacidad_top: capacidad del TopFrecuentes del top de repetidos y las modas (None para conteo
+           exacto).
+         - kwargs: argumentos adicionales para pd.read_csv.
+    * Return:
+         - perfilamiento_general: Data Frame con el perfilamiento general.
+         - profiling_numericas: Data Frame con el perfilamiento para las variables numéricas.
+         - profiling_categoricas: Data Frame con el perfilamiento para las variables categóricas
+         - profiling_de_texto: Data Frame con el perfilamiento para las variables de tipo texto
+    ==========
+    Ejemplo:
+        >>general,numericas,categoricas,texto = genera_profiling_por_bloques('../data/consumo-agua.csv')
+    """
+    perfil = PerfilPorBloques(k_cuantiles, precision_hll, capacidad_top)
+    # las alcaldías, colonias, etc. se repiten entre bloques, así que se estandarizan una sola vez
+    memo = MemoNormalizacion()
+    for bloque in pd.read_csv(ruta_csv, chunksize=tamano_bloque, **kwargs):
+        if prepara:
+            bloque = prepara_dataset(bloque, memo)
+        perfil.actualiza(bloque)
+
+    profiling_numericas,profiling_categoricas,profiling_texto = perfil.genera_profiling_por_variable()
+    return perfil.genera_profiling_general(),profiling_numericas,profiling_categoricas,profiling_texto
@@ -0,0 +1,483 @@
+"""
+Piezas que comparten todos los módulos de perfilamiento: la clasificación de tipos por familia, el
+ContextoPerfilamiento con los resultados intermedios de un data frame, las huellas de renglón y la
+instrumentación por etapa. No importa ningún otro módulo del paquete, así que eda, los sketches y los
+backends (acumuladores, sql, paralelo, correlacion, muestreo) pueden importarlo sin hacer un ciclo.
+"""
+import contextlib
+import json
+import time
+import tracemalloc
+import pandas as pd
+import numpy as np
+
+
+# Familias de tipo de dato que cuentan como numéricas
+FAMILIAS_NUMERICAS = ['entera', 'flotante']
+
+# Nombres de tipo que se aceptan en cuenta_tipo_de_dato y la familia que representan
+ALIAS_FAMILIAS = {'object': 'texto', 'category': 'categorica', 'Date': 'fecha'}
+
+
+def familia_de_tipo(tipo):
+    """
+    Función que regresa la familia de un tipo de dato, para clasificar las variables sin depender del
+    tamaño o de la implementación del tipo (int8 a int64, Int64, float32, string, etc.).
+
+    ==========
+    * Args:
+         - tipo: tipo de dato (por ejemplo, un elemento de df.dtypes).
+    * Return:
+         - str: 'entera', 'flotante', 'booleana', 'categorica', 'fecha', 'texto' u 'otra'.
+    ==========
+    Ejemplo:
+        >>familia_de_tipo(df['consumo_total'].dtype)
+    """
+    # category va primero porque is_bool_dtype también acepta categorías booleanas
+    if isinstance(tipo, pd.CategoricalDtype):
+        return 'categorica'
+    if pd.api.types.is_bool_dtype(tipo):
+        return 'booleana'
+    if pd.api.types.is_integer_dtype(tipo):
+        return 'entera'
+    if pd.api.types.is_float_dtype(tipo):
+        return 'flotante'
+    if pd.api.types.is_datetime64_any_dtype(tipo):
+        return 'fecha'
+    if pd.api.types.is_object_dtype(tipo) or pd.api.types.is_string_dtype(tipo):
+        return 'texto'
+    return 'otra'
+
+
+# Número de bits prendidos en cada valor de un byte, para contar nulos en la máscara empaquetada
+BITS_POR_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype='uint8')
+
+
+class ContextoPerfilamiento:
+    """
+    Resultados intermedios de un data frame que comparten las funciones de perfilamiento: la máscara de
+    nulos (empaquetada en bits, una fila de bytes por columna, ocho veces más chica que df.isnull()), la
+    tabla de tipos y su partición por familia, los conteos de valores por columna y las huellas de renglón
+    para los duplicados. Cada cosa se calcula la
+    primera vez que se pide y se reutiliza después, así que un reporte completo recorre los datos el mínimo
+    de veces. Si el data frame se modifica hay que crear otro contexto.
+
+    ==========
+    * Args:
+         - df: el data frame a perfilar.
+    ==========
+    Ejemplo:
+        >>contexto = ContextoPerfilamiento(df)
+        >>perfilamiento_general = genera_profiling_general(df, contexto)
+        >>numericas,categoricas,texto = genera_profiling_por_variable(df, contexto=contexto)
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._mascara_nulos = None
+        self._nulos_por_columna = None
+        self._nulos_por_renglon = None
+        self._vars_type = None
+        self._listas = None
+        self._conteos = {}
+        self._unicos = {}
+        self._categorias = {}
+        # huellas de renglón por columnas llave (ver huellas_renglones)
+        self.huellas = {}
+
+    @property
+    def mascara_nulos(self):
+        """
+        Máscara de nulos empaquetada: arreglo uint8 de (columnas, ceil(renglones/8)).
+        """
+        if self._mascara_nulos is None:
+            mascara = np.zeros((self.df.shape[1], (len(self.df) + 7) // 8), dtype='uint8')
+            for j in range(self.df.shape[1]):
+                mascara[j] = np.packbits(self.df.iloc[:, j].isna().to_numpy())
+            self._mascara_nulos = mascara
+        return self._mascara_nulos
+
+    def nulos_columna(self, col):
+        """
+        Regresa la máscara booleana de nulos de una columna.
+        """
+        j = self.df.columns.get_loc(col)
+        return np.unpackbits(self.mascara_nulos[j], count=len(self.df)).astype(bool)
+
+    def nulos_por_columna(self):
+        """
+        Regresa el número de nulos por columna (igual que df.isnull().sum()).
+        """
+        if self._nulos_por_columna is None:
+            conteos = BITS_POR_BYTE[self.mascara_nulos].sum(axis=1, dtype='int64')
+            self._nulos_por_columna = pd.Series(conteos, index=self.df.columns)
+        return self._nulos_por_columna
+
+    def nulos_por_renglon(self, bytes_por_bloque=1 << 16):
+        """
+        Regresa el número de nulos por renglón (desempaca la máscara por bloques de renglones).
+        """
+        if self._nulos_por_renglon is None:
+            mascara = self.mascara_nulos
+            nulos = np.zeros(mascara.shape[1] * 8, dtype='int64')
+            for inicio in range(0, mascara.shape[1], bytes_por_bloque):
+                bloque = np.unpackbits(mascara[:, inicio:inicio + bytes_por_bloque], axis=1)
+                nulos[inicio * 8:inicio * 8 + bloque.shape[1]] = bloque.sum(axis=0)
+            self._nulos_por_renglon = nulos[:len(self.df)]
+        return self._nulos_por_renglon
+
+    @property
+    def vars_type(self):
+        """
+        Tabla de tipos (columnas tipo y variable) del data frame.
+        """
+        if self._vars_type is None:
+            vars_type = pd.DataFrame(self.df.dtypes, columns = ['tipo'])
+            vars_type['variable']=vars_type.index
+            self._vars_type = vars_type
+        return self._vars_type
+
+    @property
+    def listas(self):
+        """
+        (lista_numericas, lista_date, lista_category, lista_texto), ver separa_variables_por_tipo.
+        """
+        if self._listas is None:
+            self._listas = separa_variables_por_tipo(self.vars_type)
+        return self._listas
+
+    def conteo_valores(self, col):
+        """
+        Regresa df[col].value_counts(dropna=True), calculado una sola vez por columna.
+        """
+        if col not in self._conteos:
+            if familia_de_tipo(self.df[col].dtype) == 'categorica':
+                self._conteos[col] = self.conteo_categorias(col)['conteos']
+            else:
+                self._conteos[col] = self.df[col].value_counts(dropna=True)
+        return self._conteos[col]
+
+    def conteo_categorias(self, col):
+        """
+        Regresa cuenta_categorias(df[col]) de una columna category, calculado una sola vez por columna.
+        """
+        if col not in self._categorias:
+            self._categorias[col] = cuenta_categorias(self.df[col])
+        return self._categorias[col]
+
+    def resumen_columna(self, col):
+        """
+        Regresa lo que ya se calculó de una columna y cabe en unos cuantos números (tipo, nulos y número de
+        únicos), para mandarlo a otro proceso sin volver a recorrer los datos.
+        """
+        resumen = {'tipo': self.vars_type.loc[col, 'tipo']}
+        if self._nulos_por_columna is not None or self._mascara_nulos is not None:
+            resumen['nulos'] = self.nulos_por_columna()[col]
+        if col in self._unicos or col in self._conteos:
+            resumen['unicos'] = self.numero_unicos(col)
+        return resumen
+
+    def carga_resumen_columna(self, col, resumen):
+        """
+        Carga el resumen de resumen_columna en el contexto de un data frame que sólo tiene la columna col.
+        """
+        vars_type = pd.DataFrame({'tipo': [resumen['tipo']], 'variable': [col]}, index=[col])
+        self._vars_type = vars_type
+        if 'nulos' in resumen:
+            self._nulos_por_columna = pd.Series([resumen['nulos']], index=[col])
+        if 'unicos' in resumen:
+            self._unicos[col] = resumen['unicos']
+
+    def numero_unicos(self, col):
+        """
+        Regresa df[col].nunique(), a partir de los conteos de valores si ya se calcularon.
+        """
+        if col not in self._unicos:
+            if col in self._conteos:
+                self._unicos[col] = int((self._conteos[col] > 0).sum())
+            else:
+                self._unicos[col] = int(self.df[col].nunique())
+        return self._unicos[col]
+
+
+def cuenta_categorias(serie, dropna=True):
+    """
+    Función que cuenta una columna category directamente sobre sus códigos enteros, sin hashear valores: un
+    solo np.bincount de los códigos (el -1 de los nulos queda en la primera casilla) da los conteos por
+    categoría y los nulos, y los valores únicos en orden de aparición salen de la primera posición de cada
+    código. Los conteos quedan igual que serie.value_counts(dropna) y los únicos igual que
+    list(serie.unique()).
+
+    ==========
+    * Args:
+         - serie: columna de tipo category.
+         - dropna: si es False los nulos se cuentan como una categoría más (igual que en value_counts).
+    * Return:
+         - diccionario con conteos (Series ordenada de más a menos frecuente), nulos y unicos (lista).
+    ==========
+    Ejemplo:
+        >>conteos = cuenta_categorias(df['colonia'])['conteos']
+    """
+    codigos = serie.cat.codes.to_numpy()
+    numero_categorias = len(serie.cat.categories)
+    # códigos desplazados en uno: la casilla 0 es la de los nulos
+    desplazados = codigos.astype('int64') + 1 if codigos.dtype.itemsize < 2 else codigos + 1
+    casillas = np.bincount(desplazados, minlength=numero_categorias + 1)
+    nulos = np.int64(casillas[0])
+
+    indice = np.arange(numero_categorias)
+    conteos = casillas[1:]
+    if not dropna and nulos > 0:
+        indice = np.append(indice, -1)
+        conteos = np.append(conteos, nulos)
+    categorias = pd.CategoricalIndex(pd.Categorical.from_codes(indice, dtype=serie.dtype))
+    # mismo orden que value_counts: la Series en orden de categorías ordenada con sort_values
+    conteos = pd.Series(conteos, index=categorias, dtype='int64', name=serie.name).sort_values(ascending=False)
+
+    # Primera aparición de cada código: se recorren bloques cada vez más grandes hasta encontrar todos
+    primeros = np.full(numero_categorias + 1, -1, dtype='int64')
+    faltan = int((casillas > 0).sum())
+    inicio, tamano = 0, 4096
+    while faltan > 0:
+        bloque = desplazados[inicio:inicio + tamano]
+        posiciones = np.full(numero_categorias + 1, -1, dtype='int64')
+        # con índices repetidos gana la última asignación, así que se asigna al revés
+        posiciones[bloque[::-1]] = np.arange(inicio + len(bloque) - 1, inicio - 1, -1)
+        nuevos = (primeros < 0) & (posiciones >= 0)
+        primeros[nuevos] = posiciones[nuevos]
+        faltan -= int(nuevos.sum())
+        inicio, tamano = inicio + tamano, tamano * 2
+    presentes = np.flatnonzero(primeros >= 0)
+    presentes = presentes[np.argsort(primeros[presentes], kind='mergesort')]
+    unicos = list(pd.Categorical.from_codes(presentes - 1, dtype=serie.dtype))
+
+    return {'conteos': conteos, 'nulos': nulos, 'unicos': unicos}
+
+
+class Instrumentacion:
+    """
+    Registro de tiempos de una corrida de perfilamiento: por cada etapa (y, donde aplica, por columna) guarda
+    el tiempo de reloj, el tiempo de CPU, los renglones procesados y, con mide_memoria, el pico de memoria
+    reservada durante la etapa (tracemalloc, sólo lo que se reservó después de empezar la etapa). Las etapas
+    se pueden anidar; nivel indica la profundidad. Se activa con instrumenta(); mientras no está activa, las
+    funciones del paquete no registran nada.
+
+    ==========
+    * Args:
+         - ruta_log: si se indica, cada registro se agrega a ese archivo como una línea de json.
+         - mide_memoria: si es True se mide el pico de memoria de cada etapa (hace más lenta la corrida).
+    ==========
+    Ejemplo:
+        >>with instrumenta(mide_memoria=True) as instrumentacion:
+        >>    profiling_numericas,profiling_categoricas,profiling_de_texto = genera_profiling_por_variable(df)
+        >>instrumentacion.tabla()
+        >>instrumentacion.resumen()
+    """
+
+    def __init__(self, ruta_log=None, mide_memoria=False):
+        self.ruta_log = ruta_log
+        self.mide_memoria = mide_memoria
+        self.registros = []
+        self._pila = []
+
+    @contextlib.contextmanager
+    def etapa(self, nombre, renglones=None, columna=None):
+        """
+        Mide el bloque with como la etapa nombre.
+        """
+        marco = {'pico': 0, 'memoria_inicial': 0}
+        if self.mide_memoria and tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            if self._pila:
+                self._pila[-1]['pico'] = max(self._pila[-1]['pico'], pico)
+            _reinicia_pico_memoria()
+            marco = {'pico': actual, 'memoria_inicial': actual}
+        self._pila.append(marco)
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            segundos, segundos_cpu = time.perf_counter() - inicio, time.process_time() - inicio_cpu
+            self._pila.pop()
+            memoria_pico = None
+            if self.mide_memoria and tracemalloc.is_tracing():
+                pico = max(tracemalloc.get_traced_memory()[1], marco['pico'])
+                memoria_pico = pico - marco['memoria_inicial']
+                if self._pila:
+                    self._pila[-1]['pico'] = max(self._pila[-1]['pico'], pico)
+            self._registra({'etapa': nombre, 'columna': None if columna is None else str(columna),
+                            'renglones': None if renglones is None else int(renglones),
+                            'segundos': segundos, 'segundos_cpu': segundos_cpu,
+                            'memoria_pico_bytes': memoria_pico, 'nivel': len(self._pila)})
+
+    def _registra(self, registro):
+        self.registros.append(registro)
+        if self.ruta_log is not None:
+            with open(self.ruta_log, 'a') as archivo:
+                archivo.write(json.dumps(registro) + '\n')
+
+    def tabla(self):
+        """
+        Regresa los registros como data frame, en el orden en que terminaron las etapas.
+        """
+        return pd.DataFrame(self.registros, columns=['etapa', 'columna', 'renglones', 'segundos', 'segundos_cpu',
+                                                     'memoria_pico_bytes', 'nivel'])
+
+    def resumen(self):
+        """
+        Regresa por etapa el número de veces, los tiempos totales, los renglones y el mayor pico de memoria,
+        ordenado de la etapa más lenta a la más rápida.
+        """
+        tabla = self.tabla()
+        resumen = tabla.groupby('etapa', sort=False).agg(veces=('segundos', 'size'), segundos=('segundos', 'sum'),
+                                                         segundos_cpu=('segundos_cpu', 'sum'),
+                                                         renglones=('renglones', 'sum'),
+                                                         memoria_pico_bytes=('memoria_pico_bytes', 'max'))
+        return resumen.sort_values('segundos', ascending=False)
+
+
+def _reinicia_pico_memoria():
+    # tracemalloc.reset_peak existe desde Python 3.9; antes el pico es el de toda la corrida
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+# Instrumentación activa (None: no se registra nada) y el contexto vacío que se usa mientras no hay una
+_INSTRUMENTACION = None
+_ETAPA_VACIA = contextlib.nullcontext()
+
+
+def _etapa(nombre, renglones=None, columna=None):
+    """
+    Regresa el contexto que mide una etapa, o un contexto vacío si la instrumentación no está activa.
+    """
+    if _INSTRUMENTACION is None:
+        return _ETAPA_VACIA
+    return _INSTRUMENTACION.etapa(nombre, renglones, columna)
+
+
+@contextlib.contextmanager
+def instrumenta(ruta_log=None, mide_memoria=False):
+    """
+    Función que activa la instrumentación de las funciones del paquete dentro de un bloque with y regresa
+    la Instrumentacion con los registros. Fuera del bloque la instrumentación no cuesta nada más que un if.
+
+    ==========
+    * Args:
+         - ruta_log: si se indica, cada registro se agrega a ese archivo como una línea de json.
+         - mide_memoria: si es True se mide el pico de memoria de cada etapa con tracemalloc.
+    * Return:
+         - Instrumentacion: los registros de la corrida.
+    ==========
+    Ejemplo:
+        >>with instrumenta('../results/perfilamiento.jsonl') as instrumentacion:
+        >>    perfilamiento_general = genera_profiling_general(df)
+        >>instrumentacion.resumen()
+    """
+    global _INSTRUMENTACION
+    anterior = _INSTRUMENTACION
+    instrumentacion = Instrumentacion(ruta_log, mide_memoria)
+    inicia_tracemalloc = mide_memoria and not tracemalloc.is_tracing()
+    if inicia_tracemalloc:
+        tracemalloc.start()
+    _INSTRUMENTACION = instrumentacion
+    try:
+        yield instrumentacion
+    finally:
+        _INSTRUMENTACION = anterior
+        if inicia_tracemalloc:
+            tracemalloc.stop()
+
+
+def separa_variables_por_tipo(vars_type):
+    """
+    Función que separa los nombres de las variables por tipo de dato.
+
+    ==========
+    * Args:
+         - vars_type: Data Frame con las columnas tipo y variable (un renglón por variable).
+    * Return:
+         - lista_numericas: variables numéricas (primero las enteras y luego las flotantes, de cualquier tamaño).
+         - lista_date: variables de fecha.
+         - lista_category: variables categóricas.
+         - lista_texto: variables de tipo texto.
+    ==========
+    Ejemplo:
+        >>lista_numericas, lista_date, lista_category, lista_texto = separa_variables_por_tipo(vars_type)
+    """
+    familias = vars_type["tipo"].map(familia_de_tipo)
+
+    # variables numericas
+    variables_int = vars_type.loc[familias == "entera"]
+    variables_float = vars_type.loc[familias == "flotante"]
+    lista_numericas = list(variables_int['variable']) + list(variables_float['variable'])
+
+    # variables fecha
+    variables_date = vars_type.loc[familias == "fecha"]
+    lista_date = list(variables_date['variable'])
+
+    # variables categoricas
+    variables_category = vars_type.loc[familias == "categorica"]
+    lista_category = list(variables_category['variable'])
+
+    # variables texto
+    variables_texto = vars_type.loc[familias == "texto"]
+    lista_texto = list(variables_texto['variable'])
+
+    return lista_numericas, lista_date, lista_category, lista_texto
+
+
+def huellas_renglones(df, columnas=None, cache=None):
+    """
+    Función que regresa una huella de 64 bits por renglón (pd.util.hash_pandas_object sobre las columnas
+    indicadas). Si se da un cache (un diccionario, por ejemplo el de un ContextoPerfilamiento) las huellas se
+    guardan ahí por columnas, así que contar duplicados y perfilar el mismo data frame no vuelve a recorrer
+    las columnas; quien crea el cache decide cuánto vive, y si el data frame se modifica hay que usar otro.
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - columnas: lista de columnas llave (por default, todas).
+         - cache: diccionario opcional donde se guardan las huellas.
+    * Return:
+         - arreglo uint64 con una huella por renglón.
+    ==========
+    Ejemplo:
+        >>huellas = huellas_renglones(df, ['gid', 'bimestre'])
+    """
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    llave = tuple(columnas)
+    if cache is not None and llave in cache:
+        return cache[llave]
+
+    datos = df[columnas]
+    # -0.0 y 0.0 son iguales para duplicated() pero tienen distintos bits
+    flotantes = [col for col in columnas if familia_de_tipo(datos[col].dtype) == 'flotante']
+    if len(flotantes) > 0:
+        datos = datos.assign(**{col: datos[col] + 0.0 for col in flotantes})
+    # categorize=False: geo_point y geo_shape casi no se repiten, factorizarlas antes sólo cuesta más
+    huellas = pd.util.hash_pandas_object(datos, index=False, categorize=False).to_numpy()
+    if cache is not None:
+        cache[llave] = huellas
+    return huellas
+
+
+def _codigos_en_diccionario(diccionario, valores):
+    """
+    Regresa la posición de cada uno de los valores (distintos entre sí) en la lista diccionario, agregando al
+    final los que no estaban.
+    """
+    codigos = pd.Index(diccionario, dtype='object').get_indexer(pd.Index(valores, dtype='object'))
+    nuevos = np.flatnonzero(codigos < 0)
+    codigos[nuevos] = len(diccionario) + np.arange(len(nuevos))
+    diccionario.extend(valores[i] for i in nuevos)
+    return codigos
+
+
+def _extiende(arreglo, longitud, relleno):
+    """
+    Regresa una copia del arreglo extendida hasta longitud con el valor relleno.
+    """
+    extendido = np.full(longitud, relleno, dtype=arreglo.dtype)
+    extendido[:len(arreglo)] = arreglo
+    return extendido
@@ -0,0 +1,342 @@
+"""
+Benchmarks de las funciones de eda.py sobre datos sintéticos con el esquema de consumo-agua.
+
+Uso desde la raíz del repositorio:
+
+    python -m src.algorithms.benchmark --renglones 10000 100000 1000000 --salida results/benchmark.json
+    python -m src.algorithms.benchmark --renglones 10000 100000 --base results/benchmark_base.json
+
+Con --base los resultados se comparan contra un archivo guardado antes con --salida y el proceso termina con
+código 1 si alguna función se volvió más lenta (o usa más memoria) que el umbral. La base de referencia
+(10^4 y 10^5 renglones, 3 repeticiones) está en results/benchmark_base.json, con el ambiente en el que se
+midió; si se cambia de máquina hay que regenerarla con --salida.
+
+Arriba de MAXIMO_RENGLONES_EN_MEMORIA renglones (--maximo-en-memoria) el data set no se junta en un data
+frame: sólo se miden las funciones de FUNCIONES_POR_BLOQUES, bloque por bloque, hasta MAXIMO_RENGLONES.
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from . import acumuladores, eda
+
+
+ALCALDIAS = ['Álvaro Obregón', 'Azcapotzalco', 'Benito Juárez', 'Coyoacán', 'Cuajimalpa de Morelos',
+             'Cuauhtémoc', 'Gustavo A. Madero', 'Iztacalco', 'Iztapalapa', 'La Magdalena Contreras',
+             'Miguel Hidalgo', 'Milpa Alta', 'Tláhuac', 'Tlalpan', 'Venustiano Carranza', 'Xochimilco']
+
+INDICES_DESARROLLO = ['POPULAR', 'BAJO', 'MEDIO', 'ALTO']
+
+# Variables de consumo: (escala, sigma) de una lognormal, sesgada como las del data set original
+VARIABLES_CONSUMO = {'consumo_total_mixto': (60, 1.2), 'consumo_prom_dom': (25, 0.9),
+                     'consumo_total_dom': (40, 1.1), 'consumo_prom_mixto': (20, 1.0),
+                     'consumo_total': (90, 1.3), 'consumo_prom': (10, 1.0), 'consumo_prom_no_dom': (8, 1.4),
+                     'consumo_total_no_dom': (12, 1.5)}
+
+ORDEN_COLUMNAS = ['geo_point', 'geo_shape', 'consumo_total_mixto', 'anio', 'nomgeo', 'consumo_prom_dom',
+                  'consumo_total_dom', 'alcaldia', 'colonia', 'consumo_prom_mixto', 'consumo_total',
+                  'consumo_prom', 'consumo_prom_no_dom', 'bimestre', 'consumo_total_no_dom', 'gid', 'indice_des']
+
+COLUMNAS_CON_NULOS = ['consumo_prom_dom', 'consumo_total', 'consumo_prom_no_dom', 'colonia', 'indice_des']
+
+RENGLONES_POR_BLOQUE = 100000
+
+MAXIMO_RENGLONES = 10 ** 8
+
+# Arriba de este número de renglones el data set no se junta en un solo data frame (los geo_shape solos
+# pasan de 10 GB en 10^8 renglones): se mide por bloques
+MAXIMO_RENGLONES_EN_MEMORIA = 2 * 10 ** 6
+
+FUNCIONES = ['genera_profiling_general', 'genera_profiling_por_variable', 'cuenta_nulos_por_renglones_tabla',
+             'EstandarizaFormato', 'prepara_dataset', 'PerfilPorBloques']
+
+# Funciones que se pueden medir por bloques (las demás necesitan el data frame completo)
+FUNCIONES_POR_BLOQUES = ['EstandarizaFormato', 'prepara_dataset', 'PerfilPorBloques']
+
+
+def _catalogo_colonias(numero_colonias, semilla):
+    """
+    Arma el catálogo fijo de colonias: alcaldía, índice de desarrollo, geo_point y geo_shape de cada una.
+    """
+    generador = np.random.default_rng([semilla, 0])
+    alcaldias = generador.integers(0, len(ALCALDIAS), numero_colonias)
+    latitudes = 19.1 + 0.5 * generador.random(numero_colonias)
+    longitudes = -99.35 + 0.4 * generador.random(numero_colonias)
+    geo_points = ['%.10f,%.10f' % (latitud, longitud) for latitud, longitud in zip(latitudes, longitudes)]
+    geo_shapes = []
+    for latitud, longitud in zip(latitudes, longitudes):
+        vertices = generador.integers(4, 12)
+        angulos = np.sort(generador.random(vertices)) * 2 * np.pi
+        puntos = ['[%.6f, %.6f]' % (longitud + 0.004 * np.cos(angulo), latitud + 0.004 * np.sin(angulo))
+                  for angulo in angulos]
+        geo_shapes.append('{"type": "Polygon", "coordinates": [[%s, %s]]}' % (', '.join(puntos), puntos[0]))
+    colonias = ['Colonia %d' % i if i % 7 else ' Col.  Ñúñez %d ' % i for i in range(numero_colonias)]
+    return {'alcaldia': np.array(ALCALDIAS, dtype='object')[alcaldias],
+            'indice_des': np.array(INDICES_DESARROLLO, dtype='object')[generador.integers(0, 4, numero_colonias)],
+            'colonia': np.array(colonias, dtype='object'),
+            'geo_point': np.array(geo_points, dtype='object'),
+            'geo_shape': np.array(geo_shapes, dtype='object')}
+
+
+def genera_consumo_agua(renglones, semilla=0, numero_colonias=1800, proporcion_nulos=0.03,
+                        proporcion_ceros=0.08):
+    """
+    Función que genera un data set sintético con el esquema de consumo-agua, por bloques. El resultado sólo
+    depende de renglones y semilla: cada bloque de RENGLONES_POR_BLOQUE renglones tiene su propio generador,
+    así que los bloques completos son los mismos para cualquier tamaño total.
+
+    ==========
+    * Args:
+         - renglones: número total de renglones (hasta MAXIMO_RENGLONES).
+         - semilla: semilla de los generadores aleatorios.
+         - numero_colonias: número de colonias distintas (cada una con su alcaldía, geo_point y geo_shape).
+         - proporcion_nulos: proporción de nulos en cada columna de COLUMNAS_CON_NULOS.
+         - proporcion_ceros: proporción de renglones con todas las variables de consumo en cero.
+    * Return:
+         - generador de data frames de hasta RENGLONES_POR_BLOQUE renglones con las columnas de ORDEN_COLUMNAS.
+    ==========
+    Ejemplo:
+        >>agua = pd.concat(genera_consumo_agua(10 ** 5), ignore_index=True)
+    """
+    if renglones > MAXIMO_RENGLONES:
+        raise ValueError('renglones debe ser a lo más %d' % MAXIMO_RENGLONES)
+    catalogo = _catalogo_colonias(numero_colonias, semilla)
+    # Las colonias más pobladas aparecen mucho más (ley de potencias)
+    pesos = 1.0 / np.arange(1, numero_colonias + 1) ** 0.8
+    pesos /= pesos.sum()
+
+    for numero_bloque, inicio in enumerate(range(0, renglones, RENGLONES_POR_BLOQUE)):
+        yield _bloque_consumo_agua(min(RENGLONES_POR_BLOQUE, renglones - inicio), inicio,
+                                   [semilla, numero_bloque + 1], catalogo, pesos, proporcion_nulos,
+                                   proporcion_ceros)
+
+
+def _bloque_consumo_agua(renglones, inicio, semilla, catalogo, pesos, proporcion_nulos, proporcion_ceros):
+    generador = np.random.default_rng(semilla)
+    colonias = generador.choice(len(pesos), renglones, p=pesos)
+    datos = {}
+    for col, (escala, sigma) in VARIABLES_CONSUMO.items():
+        datos[col] = np.round(escala * generador.lognormal(0, sigma, renglones), 2)
+    ceros = generador.random(renglones) < proporcion_ceros
+    for col in VARIABLES_CONSUMO:
+        datos[col][ceros] = 0.0
+
+    alcaldias = catalogo['alcaldia'][colonias]
+    # nomgeo repite la alcaldía, con el typo 'Talpan' que corrige prepara_dataset
+    nomgeo = alcaldias.copy()
+    nomgeo[(nomgeo == 'Tlalpan') & (generador.random(renglones) < 0.1)] = 'Talpan'
+    datos.update({'geo_point': catalogo['geo_point'][colonias], 'geo_shape': catalogo['geo_shape'][colonias],
+                  'anio': np.full(renglones, 2019), 'nomgeo': nomgeo, 'alcaldia': alcaldias,
+                  'colonia': catalogo['colonia'][colonias], 'bimestre': generador.integers(1, 4, renglones),
+                  'gid': np.arange(inicio + 1, inicio + renglones + 1),
+                  'indice_des': catalogo['indice_des'][colonias]})
+    df = pd.DataFrame(datos, columns=ORDEN_COLUMNAS)
+    for col in COLUMNAS_CON_NULOS:
+        nulos = generador.random(renglones) < proporcion_nulos
+        df[col] = df[col].mask(nulos)
+    return df
+
+
+def mide(funcion, *args, repeticiones=1, **kwargs):
+    """
+    Función que mide una llamada: el mejor tiempo de reloj y de CPU de las repeticiones y el pico de memoria
+    reservada durante la llamada (tracemalloc, que también registra los arreglos de NumPy).
+
+    ==========
+    * Args:
+         - funcion: la función a medir; lo que imprime se descarta.
+         - args, kwargs: sus argumentos.
+         - repeticiones: número de veces que se llama.
+    * Return:
+         - diccionario con segundos, segundos_cpu y memoria_pico_bytes.
+    ==========
+    Ejemplo:
+        >>mide(eda.genera_profiling_general, agua, repeticiones=3)
+    """
+    segundos = []
+    segundos_cpu = []
+    for _ in range(repeticiones):
+        inicio, inicio_cpu = time.perf_counter(), time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcion(*args, **kwargs)
+        segundos.append(time.perf_counter() - inicio)
+        segundos_cpu.append(time.process_time() - inicio_cpu)
+
+    # La memoria se mide en una llamada aparte, porque tracemalloc hace más lenta la ejecución
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcion(*args, **kwargs)
+        memoria_pico = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'segundos': min(segundos), 'segundos_cpu': min(segundos_cpu), 'memoria_pico_bytes': memoria_pico}
+
+
+def corre_benchmarks(lista_renglones, semilla=0, repeticiones=1, funciones=None, mide_memoria=True,
+                     maximo_en_memoria=MAXIMO_RENGLONES_EN_MEMORIA):
+    """
+    Función que corre los benchmarks de las funciones de FUNCIONES para cada número de renglones. Hasta
+    maximo_en_memoria renglones el data set se junta en un data frame; arriba de eso cada función de
+    FUNCIONES_POR_BLOQUES se mide sobre los bloques de genera_consumo_agua (las demás no se miden), así que
+    la memoria sólo depende del tamaño del bloque y se puede llegar a MAXIMO_RENGLONES.
+
+    ==========
+    * Args:
+         - lista_renglones: lista con los tamaños del data set (por ejemplo [10 ** 4, 10 ** 5, 10 ** 6]).
+         - semilla: semilla de genera_consumo_agua.
+         - repeticiones: número de veces que se mide cada función (se reporta el mejor tiempo).
+         - funciones: subconjunto de FUNCIONES a medir (default todas).
+         - mide_memoria: si es False no se mide el pico de memoria (tracemalloc duplica el tiempo).
+         - maximo_en_memoria: número máximo de renglones que se juntan en un solo data frame.
+    * Return:
+         - diccionario con el ambiente y la lista de resultados (funcion, renglones, modo, segundos,
+           segundos_cpu, memoria_pico_bytes), listo para json.
+    ==========
+    Ejemplo:
+        >>resultados = corre_benchmarks([10 ** 4, 10 ** 5])
+    """
+    funciones = FUNCIONES if funciones is None else funciones
+    resultados = []
+    for renglones in lista_renglones:
+        def bloques():
+            return genera_consumo_agua(renglones, semilla)
+
+        if renglones <= maximo_en_memoria:
+            modo = 'memoria'
+            crudo = pd.concat(bloques(), ignore_index=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                preparado = eda.prepara_dataset(crudo.copy())
+            # EstandarizaFormato y prepara_dataset modifican el data frame que reciben, así que cada llamada
+            # usa una copia
+            casos = {'genera_profiling_general': (eda.genera_profiling_general, preparado),
+                     'genera_profiling_por_variable': (eda.genera_profiling_por_variable, preparado),
+                     'cuenta_nulos_por_renglones_tabla': (eda.cuenta_nulos_por_renglones_tabla, preparado),
+                     'EstandarizaFormato': (lambda df: eda.EstandarizaFormato(df.copy()), crudo),
+                     'prepara_dataset': (lambda df: eda.prepara_dataset(df.copy()), crudo),
+                     'PerfilPorBloques': (_perfila_por_bloques, bloques)}
+        else:
+            modo = 'bloques'
+            casos = {'EstandarizaFormato': (lambda bloques: _por_bloques(eda.EstandarizaFormato, bloques),
+                                            bloques),
+                     'prepara_dataset': (lambda bloques: _por_bloques(eda.prepara_dataset, bloques), bloques),
+                     'PerfilPorBloques': (_perfila_por_bloques, bloques)}
+
+        for nombre in funciones:
+            if nombre not in casos:
+                continue
+            funcion, datos = casos[nombre]
+            if mide_memoria:
+                medicion = mide(funcion, datos, repeticiones=repeticiones)
+            else:
+                inicio, inicio_cpu = time.perf_counter(), time.process_time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    funcion(datos)
+                medicion = {'segundos': time.perf_counter() - inicio,
+                            'segundos_cpu': time.process_time() - inicio_cpu, 'memoria_pico_bytes': None}
+            medicion.update({'funcion': nombre, 'renglones': renglones, 'modo': modo})
+            resultados.append(medicion)
+        del casos
+
+    ambiente = {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                'plataforma': platform.platform(), 'semilla': semilla}
+    return {'ambiente': ambiente, 'resultados': resultados}
+
+
+def _por_bloques(funcion, bloques):
+    """
+    Aplica funcion a cada bloque (para funciones que trabajan renglón por renglón).
+    """
+    for bloque in bloques():
+        funcion(bloque)
+
+
+def _perfila_por_bloques(bloques):
+    """
+    Perfilamiento general y por variable con PerfilPorBloques y sketches de memoria acotada.
+    """
+    perfil = acumuladores.PerfilPorBloques(k_cuantiles=200, precision_hll=14, capacidad_top=1000)
+    memo = eda.MemoNormalizacion()
+    for bloque in bloques():
+        perfil.actualiza(eda.prepara_dataset(bloque, memo))
+    perfil.genera_profiling_general()
+    perfil.genera_profiling_por_variable()
+
+
+def compara_con_base(resultados, base, umbral_tiempo=0.25, umbral_memoria=0.25, segundos_minimos=0.05):
+    """
+    Función que compara unos resultados contra los de una base guardada.
+
+    ==========
+    * Args:
+         - resultados: diccionario de corre_benchmarks.
+         - base: diccionario de corre_benchmarks guardado antes.
+         - umbral_tiempo: aumento relativo del tiempo que se considera regresión (0.25 = 25% más lento).
+         - umbral_memoria: aumento relativo del pico de memoria que se considera regresión.
+         - segundos_minimos: los tiempos menores a éste en la base no se marcan (son ruido).
+    * Return:
+         - Data Frame con una fila por (funcion, renglones) presente en ambos, las razones nuevo/base y la
+           columna regresion.
+    ==========
+    Ejemplo:
+        >>comparacion = compara_con_base(resultados, json.load(open('results/benchmark_base.json')))
+    """
+    llaves = ['funcion', 'renglones', 'modo']
+    nuevos = pd.DataFrame(resultados['resultados'])
+    anteriores = pd.DataFrame(base['resultados'])
+    comparacion = nuevos.merge(anteriores, on=llaves, suffixes=('', '_base'))
+    comparacion['razon_tiempo'] = comparacion['segundos'] / comparacion['segundos_base']
+    comparacion['razon_memoria'] = (comparacion['memoria_pico_bytes'].astype('float64') /
+                                    comparacion['memoria_pico_bytes_base'].astype('float64'))
+    lento = (comparacion['razon_tiempo'] > 1 + umbral_tiempo) & \
+            (comparacion['segundos_base'] >= segundos_minimos)
+    memoria = comparacion['razon_memoria'] > 1 + umbral_memoria
+    comparacion['regresion'] = lento | memoria
+    return comparacion[llaves + ['segundos', 'segundos_base', 'razon_tiempo', 'memoria_pico_bytes',
+                                 'memoria_pico_bytes_base', 'razon_memoria', 'regresion']]
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de eda.py con datos sintéticos de consumo-agua.')
+    parser.add_argument('--renglones', type=float, nargs='+', default=[1e4, 1e5, 1e6],
+                        help='tamaños del data set (de 1e4 a 1e8)')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--funciones', nargs='+', choices=FUNCIONES, default=None)
+    parser.add_argument('--sin-memoria', action='store_true', help='no medir el pico de memoria')
+    parser.add_argument('--maximo-en-memoria', type=float, default=MAXIMO_RENGLONES_EN_MEMORIA,
+                        help='arriba de este número de renglones se mide por bloques')
+    parser.add_argument('--salida', help='archivo json donde se guardan los resultados')
+    parser.add_argument('--base', help='archivo json con resultados anteriores contra los que se compara')
+    parser.add_argument('--umbral-tiempo', type=float, default=0.25)
+    parser.add_argument('--umbral-memoria', type=float, default=0.25)
+    opciones = parser.parse_args(argumentos)
+
+    resultados = corre_benchmarks([int(renglones) for renglones in opciones.renglones], opciones.semilla,
+                                  opciones.repeticiones, opciones.funciones, not opciones.sin_memoria,
+                                  int(opciones.maximo_en_memoria))
+    print(pd.DataFrame(resultados['resultados']).to_string(index=False))
+    if opciones.salida:
+        with open(opciones.salida, 'w') as archivo:
+            json.dump(resultados, archivo, indent=2)
+
+    if opciones.base:
+        with open(opciones.base) as archivo:
+            base = json.load(archivo)
+        comparacion = compara_con_base(resultados, base, opciones.umbral_tiempo, opciones.umbral_memoria)
+        print(comparacion.to_string(index=False))
+        if comparacion['regresion'].any():
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
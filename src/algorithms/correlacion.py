@@ -0,0 +1,278 @@
+"""
+Matrices de correlación y covarianza combinables por bloques (Pearson, y Spearman sobre los rangos
+aproximados de un SketchCuantiles), en serie o en varios procesos.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import pandas as pd
+import numpy as np
+
+from .sketches import SketchCuantiles
+from .base import FAMILIAS_NUMERICAS, _etapa, familia_de_tipo
+
+
+class CorrelacionPorBloques:
+    """
+    Matriz de covarianzas y correlaciones de Pearson calculada por bloques, para no tener todas las variables
+    numéricas en memoria como float64 (lo que pide df.corr()). Por cada par de variables se acumulan los
+    co-momentos (renglones, medias, sumas de cuadrados y productos cruzados) sobre los renglones donde las dos
+    tienen valor, igual que pandas con los nulos por pares; cada bloque se centra en sus medias y se combina
+    con los anteriores con la fórmula de Chan, así que los acumuladores de distintos bloques o procesos se
+    pueden combinar en cualquier orden.
+
+    Con precision='float32' el bloque se guarda en float32 (la mitad de memoria) y los productos se hacen en
+    float32 por pedazos de renglones_por_suma renglones, cuyos parciales se suman en float64 (suma
+    compensada), así que el error no crece con el número de renglones. Con rangos (un SketchCuantiles por
+    variable, ver genera_correlacion) los valores se cambian por su rango aproximado antes de acumular y la
+    correlación es la de Spearman.
+
+    ==========
+    * Args:
+         - columnas: variables a correlacionar (por default, las numéricas y booleanas del primer bloque, igual
+           que df.corr()).
+         - precision: 'float64' o 'float32'.
+         - renglones_por_suma: renglones de cada producto parcial con precision='float32'.
+         - rangos: diccionario variable -> SketchCuantiles para la correlación de Spearman.
+    ==========
+    Ejemplo:
+        >>correlacion = CorrelacionPorBloques(precision='float32')
+        >>for bloque in pd.read_csv('../data/consumo-agua.csv', chunksize=100000):
+        >>    correlacion.actualiza(bloque)
+        >>corr = correlacion.correlacion()
+        >>cov = correlacion.covarianza()
+    """
+
+    def __init__(self, columnas=None, precision='float64', renglones_por_suma=4096, rangos=None):
+        if precision not in ('float64', 'float32'):
+            raise ValueError("precision debe ser 'float64' o 'float32'")
+        self.columnas = None if columnas is None else list(columnas)
+        self.precision = precision
+        self.renglones_por_suma = renglones_por_suma
+        self.rangos = rangos
+        # matrices de variables x variables: el renglón i, columna j se refiere a la variable i sobre los
+        # renglones donde i y j tienen valor
+        self.conteo = None
+        self.media = None
+        self.m2 = None
+        self.comomento = None
+
+    def actualiza(self, df):
+        """
+        Agrega un bloque (data frame) a los co-momentos.
+        """
+        if self.columnas is None:
+            self.columnas = [col for col in df.columns
+                             if familia_de_tipo(df[col].dtype) in FAMILIAS_NUMERICAS + ['booleana']]
+        # columna por columna, para no pasar por un bloque intermedio en float64
+        bloque = np.empty((len(df), len(self.columnas)), dtype=self.precision, order='F')
+        for j, col in enumerate(self.columnas):
+            if self.rangos is None:
+                bloque[:, j] = df[col].to_numpy(dtype=self.precision, na_value=np.nan)
+            else:
+                bloque[:, j] = self.rangos[col].rangos(df[col].to_numpy(dtype='float64', na_value=np.nan))
+        return self.actualiza_arreglo(bloque)
+
+    def actualiza_arreglo(self, bloque):
+        """
+        Agrega un bloque que ya es un arreglo (renglones x columnas, con NaN en los nulos).
+        """
+        with _etapa('correlacion_bloque', len(bloque)):
+            momentos = _comomentos_de_bloque(bloque, len(bloque) if self.precision == 'float64'
+                                             else self.renglones_por_suma)
+        self._combina_momentos(*momentos)
+        return self
+
+    def combina(self, otro):
+        """
+        Combina con el acumulador de otro bloque o proceso (con las mismas columnas).
+        """
+        if otro.conteo is None:
+            return self
+        if self.columnas is not None and self.columnas != otro.columnas:
+            raise ValueError('Los acumuladores tienen columnas distintas')
+        self.columnas = otro.columnas
+        self._combina_momentos(otro.conteo, otro.media, otro.m2, otro.comomento)
+        return self
+
+    def _combina_momentos(self, conteo, media, m2, comomento):
+        if self.conteo is None:
+            self.conteo, self.media, self.m2, self.comomento = conteo, media, m2, comomento
+            return
+        total = self.conteo + conteo
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(total > 0, conteo / total, 0)
+            cruzado = np.where(total > 0, self.conteo * conteo / total, 0)
+        delta = media - self.media
+        self.media = self.media + delta * peso
+        self.m2 = self.m2 + m2 + delta ** 2 * cruzado
+        self.comomento = self.comomento + comomento + delta * delta.T * cruzado
+        self.conteo = total
+
+    def covarianza(self, minimo_observaciones=1):
+        """
+        Regresa la matriz de covarianzas (igual que df.cov(min_periods=minimo_observaciones)).
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matriz = self.comomento / (self.conteo - 1)
+        matriz[(self.conteo < max(minimo_observaciones, 1)) | (self.conteo < 2)] = np.nan
+        return pd.DataFrame(matriz, index=self.columnas, columns=self.columnas)
+
+    def correlacion(self, minimo_observaciones=1):
+        """
+        Regresa la matriz de correlaciones (igual que df.corr(min_periods=minimo_observaciones)).
+        """
+        divisor = np.sqrt(self.m2 * self.m2.T)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matriz = self.comomento / divisor
+        matriz[(self.conteo < max(minimo_observaciones, 1)) | (divisor == 0)] = np.nan
+        return pd.DataFrame(matriz, index=self.columnas, columns=self.columnas)
+
+
+def _comomentos_de_bloque(bloque, renglones_por_suma):
+    """
+    Función que regresa los co-momentos por pares (conteo, media, m2, comomento) de un bloque. Los valores se
+    centran en la media de cada columna del bloque y las sumas salen de productos de matrices sobre pedazos
+    de renglones_por_suma renglones, acumulados en float64.
+    """
+    presentes = ~np.isnan(bloque)
+    conteo_columna = presentes.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centro = np.where(conteo_columna > 0, np.nansum(bloque, axis=0, dtype='float64') / conteo_columna, 0)
+    centrados = np.where(presentes, bloque - centro.astype(bloque.dtype), 0).astype(bloque.dtype)
+    presentes = presentes.astype(bloque.dtype)
+
+    numero_columnas = bloque.shape[1]
+    conteo, suma, cuadrados, productos = (np.zeros((numero_columnas, numero_columnas)) for _ in range(4))
+    for inicio in range(0, len(bloque), max(renglones_por_suma, 1)):
+        pedazo = centrados[inicio:inicio + renglones_por_suma]
+        mascara = presentes[inicio:inicio + renglones_por_suma]
+        conteo += mascara.T @ mascara
+        # suma[i, j]: suma de la variable i centrada en los renglones donde j tiene valor
+        suma += pedazo.T @ mascara
+        cuadrados += (pedazo * pedazo).T @ mascara
+        productos += pedazo.T @ pedazo
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diferencia = np.where(conteo > 0, suma / conteo, 0)
+    media = centro[:, None] + diferencia
+    m2 = cuadrados - suma * diferencia
+    comomento = productos - suma * diferencia.T
+    return conteo, media, m2, comomento
+
+
+def genera_correlacion(df, metodo='pearson', columnas=None, precision='float64', tamano_bloque=100000,
+                       k_cuantiles=2000, minimo_observaciones=1, n_jobs=None):
+    """
+    Función que calcula la matriz de correlaciones por bloques con CorrelacionPorBloques, con memoria acotada
+    por el tamaño del bloque. Con metodo='spearman' se hace una primera pasada para armar un SketchCuantiles
+    por variable y en la segunda los valores se cambian por su rango aproximado (el error de rango es el del
+    sketch, ver SketchCuantiles.k_para_error; si una variable tiene a lo más k_cuantiles valores el rango es
+    exacto). Los rangos son sobre todos los valores de cada variable, así que con nulos la correlación de
+    Spearman puede diferir un poco de la de pandas, que vuelve a rankear cada par sólo con los renglones
+    completos.
+
+    ==========
+    * Args:
+         - df: el data frame, la ruta de un csv (se lee por bloques) o un iterable de data frames (por ejemplo
+           pd.read_csv(..., chunksize=...); sólo con metodo='pearson', porque se recorre una vez).
+         - metodo: 'pearson' o 'spearman'.
+         - columnas: variables a correlacionar (por default, las numéricas y booleanas).
+         - precision: 'float64' o 'float32' (ver CorrelacionPorBloques).
+         - tamano_bloque: número de renglones de cada bloque.
+         - k_cuantiles: tamaño de los sketches para los rangos de Spearman.
+         - minimo_observaciones: mínimo de renglones completos por par (como min_periods de df.corr()).
+         - n_jobs: con un data frame, número de procesos que reparten los bloques (-1 para usar todos los
+           núcleos); el data frame se copia una sola vez a memoria compartida.
+    * Return:
+         - Data Frame: matriz de correlaciones.
+    ==========
+    Ejemplo:
+        >>corr = genera_correlacion(agua, precision='float32')
+        >>corr = genera_correlacion('../data/consumo-agua.csv', metodo='spearman', tamano_bloque=500000)
+    """
+    if metodo not in ('pearson', 'spearman'):
+        raise ValueError("metodo debe ser 'pearson' o 'spearman'")
+    if isinstance(df, pd.DataFrame):
+        def bloques():
+            return (df.iloc[inicio:inicio + tamano_bloque] for inicio in range(0, len(df), tamano_bloque))
+    elif isinstance(df, str):
+        def bloques():
+            return pd.read_csv(df, chunksize=tamano_bloque, usecols=columnas)
+    elif metodo == 'spearman':
+        raise ValueError('La correlación de Spearman recorre los datos dos veces: se necesita un data frame o '
+                         'la ruta de un csv')
+    else:
+        def bloques():
+            return df
+
+    rangos = None
+    if metodo == 'spearman':
+        rangos = {}
+        for bloque in bloques():
+            if columnas is None:
+                columnas = [col for col in bloque.columns
+                            if familia_de_tipo(bloque[col].dtype) in FAMILIAS_NUMERICAS + ['booleana']]
+            for col in columnas:
+                rangos.setdefault(col, SketchCuantiles(k_cuantiles)).actualiza(
+                    bloque[col].to_numpy(dtype='float64', na_value=np.nan))
+
+    correlacion = CorrelacionPorBloques(columnas, precision, rangos=rangos)
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if isinstance(df, pd.DataFrame) and n_jobs is not None and n_jobs > 1:
+        return _correlacion_en_paralelo(df, correlacion, tamano_bloque, n_jobs).correlacion(minimo_observaciones)
+
+    for bloque in bloques():
+        correlacion.actualiza(bloque)
+    return correlacion.correlacion(minimo_observaciones)
+
+
+def _correlacion_en_paralelo(df, correlacion, tamano_bloque, n_jobs):
+    """
+    Función que reparte los bloques de df entre procesos y combina sus acumuladores. Las columnas (ya en la
+    precisión pedida, o como rangos) se copian una sola vez a un segmento de memoria compartida y cada
+    proceso sólo recibe el rango de renglones que le toca.
+    """
+    if correlacion.columnas is None:
+        correlacion.columnas = [col for col in df.columns
+                                if familia_de_tipo(df[col].dtype) in FAMILIAS_NUMERICAS + ['booleana']]
+    forma = (len(df), len(correlacion.columnas))
+    tipo = np.dtype(correlacion.precision)
+    memoria = shared_memory.SharedMemory(create=True, size=max(tipo.itemsize * forma[0] * forma[1], 1))
+    try:
+        # el arreglo va por renglones, así que los renglones de cada bloque quedan contiguos
+        compartido = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+        for j, col in enumerate(correlacion.columnas):
+            if correlacion.rangos is None:
+                compartido[:, j] = df[col].to_numpy(dtype=tipo, na_value=np.nan)
+            else:
+                compartido[:, j] = correlacion.rangos[col].rangos(df[col].to_numpy(dtype='float64', na_value=np.nan))
+
+        vacio = CorrelacionPorBloques(correlacion.columnas, correlacion.precision, correlacion.renglones_por_suma)
+        descriptores = [(memoria.name, forma, tipo.str, inicio, inicio + tamano_bloque)
+                        for inicio in range(0, len(df), tamano_bloque)]
+        n_procesos = max(1, min(n_jobs, len(descriptores)))
+        with ProcessPoolExecutor(max_workers=n_procesos) as procesos:
+            for acumulador in procesos.map(_correlacion_de_bloque_compartido, descriptores,
+                                           [vacio] * len(descriptores)):
+                correlacion.combina(acumulador)
+    finally:
+        memoria.close()
+        memoria.unlink()
+    return correlacion
+
+
+def _correlacion_de_bloque_compartido(descriptor, correlacion):
+    """
+    Función que corre en cada proceso: lee sus renglones de la memoria compartida y regresa su acumulador.
+    """
+    nombre, forma, tipo, inicio, fin = descriptor
+    memoria = shared_memory.SharedMemory(name=nombre)
+    try:
+        bloque = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)[inicio:fin]
+        correlacion.actualiza_arreglo(bloque)
+        del bloque
+    finally:
+        memoria.close()
+    return correlacion
@@ -1,7 +1,65 @@
+import csv
+import hashlib
+import io
+import json
+import os
 import re
+import unicodedata
+import warnings
 import pandas as pd
 import numpy as np
 
+# Instrumentacion, instrumenta y separa_variables_por_tipo no se usan aquí, pero se siguen pudiendo llamar
+# como eda.instrumenta, etc.
+from .base import (
+    ALIAS_FAMILIAS, FAMILIAS_NUMERICAS, ContextoPerfilamiento, Instrumentacion, _codigos_en_diccionario, _etapa,
+    _extiende, cuenta_categorias, familia_de_tipo, huellas_renglones, instrumenta, separa_variables_por_tipo)
+from .paralelo import genera_profiling_en_paralelo
+from .sketches import HyperLogLog, SketchCuantiles, TopFrecuentes, tabla_top_repetidos
+
+# Métricas (renglones) de las tablas de perfilamiento por tipo de variable
+LISTA_PERFILAMIENTO_NUMERICO = ['tipo','numero de observaciones', 'media', 'desviacion estándar',
+                                'cuartil 25%','cuartil 50%','cuartil 75%','minimo','maximo',
+                                'numero de observaciones unicas','top5 repetidos']
+
+# Con cuantiles aproximados (sketch) cada cuartil se reporta junto con sus cotas
+LISTA_PERFILAMIENTO_NUMERICO_SKETCH = ['tipo','numero de observaciones', 'media', 'desviacion estándar',
+                                       'cuartil 25%/cota inferior/cota superior',
+                                       'cuartil 50%/cota inferior/cota superior',
+                                       'cuartil 75%/cota inferior/cota superior','minimo','maximo',
+                                       'numero de observaciones unicas','top5 repetidos',
+                                       'error de rango de los cuartiles']
+
+LISTA_PERFILAMIENTO_CATEGORICO = ['tipo','numero de categorias', 'numero de observaciones',
+                                  'observaciones nulas','% observaciones nulas', 'valores unicos',
+                                  'moda1/veces/porcentaje','moda2/veces/porcentaje','moda3/veces/porcentaje']
+
+LISTA_PERFILAMIENTO_GRUPO_NUMERICO = ['numero de observaciones', 'observaciones nulas', '% observaciones nulas',
+                                      'media', 'desviacion estándar', 'minimo', 'maximo']
+
+LISTA_PERFILAMIENTO_GRUPO_CATEGORICO = ['numero de observaciones', 'observaciones nulas', '% observaciones nulas',
+                                        'numero de categorias', 'moda', 'veces moda']
+
+COLUMNAS_GRUPO = ['alcaldia', 'colonia', 'bimestre']
+
+VARIABLES_CATEGORICAS_CEROS = ['alcaldia', 'bimestre', 'colonia', 'gid', 'indice_des', 'nomgeo']
+
+PARES_CEROS = [('colonia', 'alcaldia'), ('alcaldia', 'indice_des'), ('alcaldia', 'bimestre')]
+
+# Versión de prepara_dataset; se incluye en la llave del cache para invalidarlo si cambia la preparación
+VERSION_PREPARACION = 1
+
+# Patrón para colapsar espacios dobles (o mas), compilado una sola vez
+PATRON_ESPACIOS = re.compile(' +')
+
+LISTA_PERFILAMIENTO_TEXTO = ['tipo','numero de observaciones', 'observaciones unicas', '% observaciones unicas',
+                             'tamano promedio','tamano minmo','tamano maximo']
+
+# Métricas adicionales del perfilamiento de texto con motor='arrow'
+LISTA_PERFILAMIENTO_TEXTO_ARROW = LISTA_PERFILAMIENTO_TEXTO + ['bytes promedio', 'bytes minimo', 'bytes maximo',
+                                                               'histograma de tamanos']
+
+
 def cuenta_tipo_de_dato(df,tipo):
     """
     Esta función crea la tabla con información sobre la cantidad de cada tipo de dato encontrado en el csv.
@@ -9,7 +67,8 @@ def cuenta_tipo_de_dato(df,tipo):
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el conteo del tipo de dato.
-         - tipo: El nombre del tipo de dato que estamos buscando.
+         - tipo: El nombre del tipo de dato que estamos buscando. 'numerico', 'object', 'category' y 'Date'
+           cuentan a toda su familia (ver familia_de_tipo); cualquier otro nombre se compara exacto.
     * Return:
          - Data Frame: entrega el data frame con los la categoría de la columna RESPUESTA modificada.
     ==========
@@ -23,16 +82,18 @@ def cuenta_tipo_de_dato(df,tipo):
     vars_type = df.dtypes
     vars_type = pd.DataFrame(vars_type, columns = ['tipo'])
 
+    familias = vars_type["tipo"].map(familia_de_tipo)
     if tipo == 'numerico':
-        cantidad_tipo = len(vars_type.loc[vars_type["tipo"] == "int64"])
-        cantidad_tipo = cantidad_tipo + len(vars_type.loc[vars_type["tipo"] == "float64"])
+        cantidad_tipo = int(familias.isin(FAMILIAS_NUMERICAS).sum())
+    elif tipo in ALIAS_FAMILIAS:
+        cantidad_tipo = int((familias == ALIAS_FAMILIAS[tipo]).sum())
     else:
         cantidad_tipo = len(vars_type.loc[vars_type["tipo"] == tipo])
 
     return cantidad_tipo
 
 
-def cuenta_nulos_por_columnas(df):
+def cuenta_nulos_por_columnas(df, contexto=None):
     """
     Función que realiza una tabla con la cuenta de missing values por columna y obtiene la proporción que estos missing
     values representan del total.
@@ -40,14 +101,16 @@ def cuenta_nulos_por_columnas(df):
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el conteo de los nulos por cada columna.
+         - contexto: ContextoPerfilamiento opcional del data frame.
     * Return:
          - Data Frame: entrega el data frame que indica cuantos elementos nulos fueron encontrados en cada columna.
     ==========
     Ejemplo:
          >>faltates_por_columna = cuenta_nulos_por_columnas(df)
     """
-    valores_nulos = df.isnull().sum()
-    porcentaje_valores_nulos = 100 * df.isnull().sum() / len(df)
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    valores_nulos = contexto.nulos_por_columna()
+    porcentaje_valores_nulos = 100 * valores_nulos / len(df)
     tabla_valores_nulos = pd.concat([valores_nulos, porcentaje_valores_nulos], axis=1)
     tabla_valores_nulos_ordenada = tabla_valores_nulos.rename(
         columns={0: 'Missing Values', 1: '% del Total'})
@@ -60,60 +123,82 @@ def cuenta_nulos_por_columnas(df):
     return tabla_valores_nulos_ordenada
 
 
-def genera_profiling_general(df):
+def genera_profiling_general(df, contexto=None):
     """
     Función que genera la tabla con un perfilamiento general del data set, sin entrar al detalle por variable.
 
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el perfilamiento general.
+         - contexto: ContextoPerfilamiento opcional del data frame.
     * Return:
          - Data Frame: entrega el data frame con un perfilamiento general del data set.
     ==========
     Ejemplo:
          >>perfilamiento_general = genera_profiling_general(df)
     """
-    cuenta_de_variables = len(df.columns)
-    cuenta_observaciones = len(df)
-    total_celdas = cuenta_de_variables*cuenta_observaciones
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
 
     # Contamos el tipo de datos del dataset
-    vars_type = df.dtypes
-    vars_type = pd.DataFrame(vars_type, columns = ['tipo'])
+    with _etapa('tipos', len(df)):
+        vars_type = contexto.vars_type
+
+    # Contamos los faltantes
+    with _etapa('nulos', len(df)):
+        nulos_totales = cuenta_nulos_por_columnas(df, contexto)['Missing Values'].sum()
+    #print(nulos_totales)
 
-    # Asignamos un valor para cada tipo
+    # Obtenemos el total de renglones duplicados (con huellas de 64 bits verificadas)
+    with _etapa('duplicados', len(df)):
+        numero_de_duplicados = cuenta_duplicados(df, contexto=contexto)
+    #print(numero_de_duplicados)
+
+    return _arma_profiling_general(vars_type, len(df), nulos_totales, numero_de_duplicados)
+
+
+def _arma_profiling_general(vars_type, cuenta_observaciones, nulos_totales, numero_de_duplicados):
+    """
+    Función que arma la tabla del perfilamiento general a partir de los conteos ya calculados, para que
+    el perfilamiento en memoria y el perfilamiento por bloques entreguen exactamente la misma tabla.
+
+    ==========
+    * Args:
+         - vars_type: Data Frame con la columna tipo (un renglón por variable).
+         - cuenta_observaciones: número de renglones del data set.
+         - nulos_totales: número total de celdas nulas.
+         - numero_de_duplicados: número de renglones duplicados.
+    * Return:
+         - Data Frame: entrega el data frame con un perfilamiento general del data set.
+    ==========
+    Ejemplo:
+         >>perfilamiento_general = _arma_profiling_general(vars_type, 1000, 25, 3)
+    """
+    cuenta_de_variables = len(vars_type)
+    total_celdas = cuenta_de_variables*cuenta_observaciones
+
+    # Asignamos un valor para cada tipo (por familia, así int32 o float32 cuentan igual que int64 o float64)
+    familias = vars_type["tipo"].map(familia_de_tipo)
 
     ## Numéricas
-    cantidad_numericas = len(vars_type.loc[vars_type["tipo"] == "int64"])
-    cantidad_numericas = cantidad_numericas + len(vars_type.loc[vars_type["tipo"] == "float64"])
+    cantidad_numericas = int(familias.isin(FAMILIAS_NUMERICAS).sum())
     #print(cantidad_numericas)
 
     ## Fechas
-    cantidad_fecha = len(vars_type.loc[vars_type["tipo"] == "Date"])
+    cantidad_fecha = int((familias == 'fecha').sum())
     #print(cantidad_fecha)
 
     ## Categoricas
-    cantidad_categoricas = len(vars_type.loc[vars_type["tipo"] == "category"])
+    cantidad_categoricas = int((familias == 'categorica').sum())
     #print(cantidad_categoricas)
 
     ## Texto
-    cantidad_texto = len(vars_type.loc[vars_type["tipo"] == "object"])
+    cantidad_texto = int((familias == 'texto').sum())
     #print(cantidad_texto)
 
-    # Contamos los faltantes
-    nulos_totales = cuenta_nulos_por_columnas(df)['Missing Values'].sum()
-    #print(nulos_totales)
-
     # Obtenemos el porcentaje de datos que son faltantes
     nulos_porcentaje = ((nulos_totales/(total_celdas))*100).round(1).astype(str)+'%'
     #print(nulos_porcentaje)
 
-    # Obtenemos el total de columnas duplicadas
-    ds_duplicados = df.duplicated(subset=None, keep='first')
-    ds_duplicados = pd.DataFrame(ds_duplicados,columns = ['duplicated'])
-    numero_de_duplicados = len(ds_duplicados.loc[ds_duplicados["duplicated"] == True])
-    #print(numero_de_duplicados)
-
     # Obtenemos el porcentaje de duplicados
     porcentaje_de_duplicados = str(((numero_de_duplicados/(total_celdas))*100))+'%'
     #print(porcentaje_de_duplicados)
@@ -133,7 +218,7 @@ def genera_profiling_general(df):
     df_perfilamiento_general = pd.DataFrame(data=valores)
     return df_perfilamiento_general
 
-def cuenta_nulos_por_renglones(df):
+def cuenta_nulos_por_renglones(df, contexto=None):
     """
     Función que cuenta la cantidad de valores nulos por cada renglón, para valorar si es posible o no realizar
     imputaciones o se tendrían que tirar las columnas o renglones correspondientes.
@@ -141,55 +226,81 @@ def cuenta_nulos_por_renglones(df):
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el conteo de nulos por renglon.
+         - contexto: ContextoPerfilamiento opcional del data frame.
     * Return:
          - Información del data frame: Imprime información relevante sobre los faltantes en el dataframe.
     ==========
     Ejemplo:
          >>nulos_por_renglon = cuenta_nulos_por_renglones(df)
     """
-    df_aux = df.copy()
-    valores_nulos_totales = sum(df_aux.apply(lambda x: sum(x.isnull().values), axis=1) > 0)
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    with _etapa('nulos_por_renglon', len(df)):
+        valores_nulos_totales = np.int64((contexto.nulos_por_renglon() > 0).sum())
     print("Existen un total de: ", valores_nulos_totales, "renglones con al menos un valor nulo\n")
-    numero_de_lineas = len(df_aux)
+    numero_de_lineas = len(df)
     porcentaje_de_lineas_con_nulos = valores_nulos_totales / numero_de_lineas
     texto = "Representan el {:.2%} del total de renglones.". \
         format(porcentaje_de_lineas_con_nulos)
     print(texto)
     return valores_nulos_totales
 
-def cuenta_nulos_por_renglones_tabla(df):
+def cuenta_nulos_por_renglones_tabla(df, top=10, regresa_histograma=False, contexto=None):
     """
     Función que cuenta la cantidad de valores nulos por cada renglón y entrega un Data Frame
-    que indica el top 5 de renglones con valores faltantes en el Data set.
+    que indica el top de renglones con valores faltantes en el Data set.
+
+    Los nulos por renglón salen de una sola máscara de nulos; el top se elige con una selección
+    parcial (argpartition) y sólo se construyen las etiquetas de los renglones que se regresan.
 
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el conteo de nulos por renglon.
+         - top: número de renglones con más nulos que se regresan (10 por defecto).
+         - regresa_histograma: si es True también se regresa el histograma de renglones por número de nulos.
+         - contexto: ContextoPerfilamiento opcional del data frame.
     * Return:
-         - Data Frame: Imprime información relevante sobre los faltantes en el dataframe.
+         - Data Frame: Data Frame con el top de renglones con más valores nulos.
+         - Data Frame (opcional): histograma con el número de renglones que tienen cada cantidad de nulos.
     ==========
     Ejemplo:
          >>tabla_nulos_por_renglon = cuenta_nulos_por_renglones_tabla(df)
+         >>tabla_nulos_por_renglon, histograma = cuenta_nulos_por_renglones_tabla(df, top=20, regresa_histograma=True)
     """
-    arreglo_nulos=[]
-    arreglo_renglones=[]
-    for i in range(len(df.index)):
-        string = "Nan in row "+ str(i)
-        valor = df.iloc[i].isnull().sum()
-        arreglo_renglones.append(string)
-        arreglo_nulos.append(valor)
-        #print("Nan in row ", i, " : ", df.iloc[i].isnull().sum())
-    sum([True for idx, row in df.iterrows() if any(row.isnull())])
-    list(df.index[df.isnull().sum(axis=1) > 0])
-    data={'renglon':arreglo_renglones,'valores_nulos':arreglo_nulos}
-    tabla_valores_nulos_ordenada = pd.DataFrame(data=data)
-    tabla_valores_nulos_ordenada_solonulos = pd.DataFrame(tabla_valores_nulos_ordenada)
-    tabla_valores_nulos_ordenada_solonulos = tabla_valores_nulos_ordenada_solonulos.loc[tabla_valores_nulos_ordenada_solonulos["valores_nulos"] > 0]
-    tabla_valores_nulos_ordenada_solonulos=tabla_valores_nulos_ordenada_solonulos.sort_values('valores_nulos', ascending = False)
-
-    return tabla_valores_nulos_ordenada_solonulos.head(10)
-
-def genera_profiling_de_numericos(df,lista_numericas,vars_type):
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    with _etapa('nulos_por_renglon', len(df)):
+        arreglo_nulos = contexto.nulos_por_renglon()
+
+    # Renglones con al menos un nulo
+    renglones_con_nulos = np.flatnonzero(arreglo_nulos > 0)
+    nulos_con_nulos = arreglo_nulos[renglones_con_nulos]
+
+    # Selección parcial del top: todo lo que supera al k-ésimo valor y, en empate, los primeros renglones
+    if len(renglones_con_nulos) > top:
+        umbral = np.partition(nulos_con_nulos, len(nulos_con_nulos) - top)[len(nulos_con_nulos) - top]
+        mayores = np.flatnonzero(nulos_con_nulos > umbral)
+        empates = np.flatnonzero(nulos_con_nulos == umbral)[:top - len(mayores)]
+        seleccion = np.sort(np.concatenate([mayores, empates]))
+    else:
+        seleccion = np.arange(len(renglones_con_nulos))
+    seleccion = seleccion[np.argsort(-nulos_con_nulos[seleccion], kind='stable')]
+    renglones_top = renglones_con_nulos[seleccion]
+
+    arreglo_renglones = ["Nan in row " + str(i) for i in renglones_top]
+    data = {'renglon': arreglo_renglones, 'valores_nulos': arreglo_nulos[renglones_top]}
+    tabla_valores_nulos_ordenada_solonulos = pd.DataFrame(data=data, index=renglones_top)
+
+    if not regresa_histograma:
+        return tabla_valores_nulos_ordenada_solonulos
+
+    # Histograma de renglones por número de nulos
+    frecuencias = np.bincount(arreglo_nulos, minlength=1)
+    cantidades = np.flatnonzero(frecuencias)
+    histograma = pd.DataFrame({'valores_nulos': cantidades, 'renglones': frecuencias[cantidades]})
+
+    return tabla_valores_nulos_ordenada_solonulos, histograma
+
+def genera_profiling_de_numericos(df,lista_numericas,vars_type,k_cuantiles=None,precision_hll=None,
+                                  capacidad_top=None):
     """
     Función que genera un perfilamiento para los datos numéricos.
 
@@ -198,6 +309,12 @@ def genera_profiling_de_numericos(df,lista_numericas,vars_type):
          - df: el data frame al que se le va a realizar el perfilamiento para variables numéricas.
          - lista_numericas: una lista con el nombre de las variables que son de tipo numérico.
          - vars_type: tabla generada por la función cuenta_tipo_de_dato de este mismo script.
+         - k_cuantiles: si se indica, los cuartiles se aproximan con un SketchCuantiles de ese tamaño y se
+           reportan con sus cotas y el error de rango (ver SketchCuantiles.k_para_error).
+         - precision_hll: si se indica junto con capacidad_top, el número de observaciones únicas se estima
+           con un HyperLogLog (ver calcula_estadisticos_numericos).
+         - capacidad_top: si se indica, el top de repetidos sale de un TopFrecuentes con esa capacidad y, si
+           los conteos quedan aproximados, trae la columna cota_error.
     * Return:
          - Data Frame: Data Frame con el perfilamiento para las variables numéricas.
     ==========
@@ -213,110 +330,180 @@ def genera_profiling_de_numericos(df,lista_numericas,vars_type):
         # Generamos el perfilamiento para esas variables
         >>perfilamiento_de_numericas = genera_profiling_de_numericos(df,lista_numericas,vars_type)
     """
-    # Obtenemos los estadísticos de la columna si es numérica
-    lista_perfilamiento_numerico = ['tipo','numero de observaciones', 'media', 'desviacion estándar',
-                                    'cuartil 25%','cuartil 50%','cuartil 75%','minimo','maximo',
-                                    'numero de observaciones unicas','top5 repetidos']
-    datos_dataframe_profiling_numericas = {'metrica':lista_perfilamiento_numerico}
+    # tipo de dato de cada variable
+    tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
+
+    # Obtenemos las métricas de todas las columnas en un solo bloque
+    estadisticos = calcula_estadisticos_numericos(df, lista_numericas, k_cuantiles=k_cuantiles,
+                                                  precision_hll=precision_hll, capacidad_top=capacidad_top)
+
+    return _arma_profiling_de_numericos(lista_numericas, tipos, estadisticos)
+
+
+def _arma_profiling_de_numericos(lista_numericas, tipos, estadisticos):
+    """
+    Función que arma la tabla del perfilamiento numérico a partir de los estadísticos ya calculados.
+
+    ==========
+    * Args:
+         - lista_numericas: una lista con el nombre de las variables que son de tipo numérico.
+         - tipos: diccionario variable -> tipo de dato.
+         - estadisticos: diccionario con el formato que entrega calcula_estadisticos_numericos.
+    * Return:
+         - Data Frame: Data Frame con el perfilamiento para las variables numéricas.
+    ==========
+    Ejemplo:
+        >>perfilamiento = _arma_profiling_de_numericos(lista_numericas, tipos, estadisticos)
+    """
+    con_sketch = 'error_cuantiles' in estadisticos
+    if con_sketch:
+        datos_dataframe_profiling_numericas = {'metrica':LISTA_PERFILAMIENTO_NUMERICO_SKETCH}
+    else:
+        datos_dataframe_profiling_numericas = {'metrica':LISTA_PERFILAMIENTO_NUMERICO}
     dataframe_profiling_numericas = pd.DataFrame(data=datos_dataframe_profiling_numericas)
-    for col in lista_numericas:
-        # tipo de dato
-        vars_type_num = pd.DataFrame(vars_type)
-        #vars_type_num
-        df_tipo = pd.DataFrame(data=vars_type_num.loc[vars_type_num["variable"] == col])
-        tipo_dato=df_tipo['tipo'][0]
-        #print(tipo_dato)
-
-        # Obtenemos las métricas relevantes
-        descr_col = df[col].describe()
-        descr_col = pd.DataFrame(descr_col)
-        descr_col['metrica']=descr_col.index
-        descr_col.columns=['valor','metrica']
-
-        # número de observaciones
-        medida = 'count'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        num_observaciones_num = metrica['valor'][0]
-        #print(num_observaciones_num)
-
-        # media
-        medida = 'mean'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        media_obs_num = metrica['valor'][0]
-        media_obs_num = media_obs_num.round(2)
-        #print(media_obs_num)
-
-        # desviacion estándar
-        medida = 'std'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        sd_obs_num = metrica['valor'][0]
-        sd_obs_num = sd_obs_num.round(2)
-        #print(sd_obs_num)
-
-        # cuartil 25
-        medida = '25%'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        cuant_25_obs_num = metrica['valor'][0]
-        cuant_25_obs_num = cuant_25_obs_num.round(2)
-        #print(cuant_25_obs_num)
-
-        # cuartil 50
-        medida = '50%'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        cuant_50_obs_num = metrica['valor'][0]
-        cuant_50_obs_num = cuant_50_obs_num.round(2)
-        #print(cuant_50_obs_num)
-        #cuant_50_obs_num = agua.quantile(q=0.25)
-        #print(cuant_50_obs_num)
-
-        # cuartil 75
-        medida = '75%'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        cuant_75_obs_num = metrica['valor'][0]
-        cuant_75_obs_num = cuant_75_obs_num.round(2)
-        #print(cuant_75_obs_num)
-        #cuant_75_obs_num = agua.quantile(q=0.25)
-        #print(cuant_75_obs_num)
-
-        # minimo
-        medida = 'min'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        minimo_obs_num = metrica['valor'][0]
-        minimo_obs_num = minimo_obs_num.round(2)
-        #print(minimo_obs_num)
-
-        # maximo
-        medida = 'max'
-        metrica = descr_col.loc[descr_col["metrica"] == medida]
-        maximo_obs_num = metrica['valor'][0]
-        maximo_obs_num = maximo_obs_num.round(2)
-        #print(maximo_obs_num)
-
-        # numero de observaciones unicas
-        num_obs_unicas_obs_num = df[col].nunique()
-        #print(num_obs_unicas_obs_num)
-
-        # top 5 observaciones repetidas
-        df_resultado = df[col].value_counts(dropna=True)
-        df_resultado = pd.DataFrame(df_resultado)
-        df_resultado.columns=['conteo_top_5']
-        df_resultado=df_resultado.sort_values('conteo_top_5', ascending = False)
-
-        top5 = df_resultado.head(5)
-        #print(top5)
-
-        # Número de observaciones con valores faltantes
-        obs_faltantes_obs_num = df[col].isna().sum()
-        #print(obs_faltantes_obs_num)
-
-        datos_variable = [tipo_dato,num_observaciones_num,media_obs_num,sd_obs_num,
-                          cuant_25_obs_num, cuant_50_obs_num,cuant_75_obs_num,minimo_obs_num,
-                          maximo_obs_num,num_obs_unicas_obs_num,top5]
+
+    for i, col in enumerate(lista_numericas):
+        cuartiles = [estadisticos[llave][i].round(2) for llave in ('cuartil_25', 'cuartil_50', 'cuartil_75')]
+        if con_sketch:
+            cuartiles = [[cuartil] + [np.round(cota, 2) for cota in estadisticos['cotas_' + llave][i]]
+                         for cuartil, llave in zip(cuartiles, ('cuartil_25', 'cuartil_50', 'cuartil_75'))]
+        datos_variable = [tipos[col],
+                          estadisticos['conteo'][i],
+                          estadisticos['media'][i].round(2),
+                          estadisticos['desviacion'][i].round(2)] + cuartiles + \
+                         [estadisticos['minimo'][i].round(2),
+                          estadisticos['maximo'][i].round(2),
+                          int(estadisticos['unicos'][i]),
+                          estadisticos['top5'][i]]
+        if con_sketch:
+            datos_variable.append(estadisticos['error_cuantiles'][i])
         dataframe_profiling_numericas[col]=datos_variable
     return dataframe_profiling_numericas
 
 
-def genera_profiling_de_categorias(df, lista_category,vars_type):
+def calcula_estadisticos_numericos(df, lista_numericas, top=5, k_cuantiles=None, precision_hll=None,
+                                   capacidad_top=None):
+    """
+    Función que calcula en un solo bloque los estadísticos de todas las variables numéricas: conteo,
+    media, desviación estándar, cuartiles, mínimo, máximo, observaciones únicas, nulos y los valores
+    más repetidos.
+
+    Las columnas se copian una sola vez a un arreglo 2-D de float64 y los conteos, momentos, extremos y
+    cuartiles se obtienen con reducciones de NumPy sobre ese bloque (axis=0). Los únicos y el top de
+    repetidos salen de una sola factorización por columna, que sólo se hace si se necesita el top exacto
+    (capacidad_top None) o los únicos exactos (precision_hll None); con los dos la memoria queda acotada.
+
+    ==========
+    * Args:
+         - df: el data frame que contiene las variables numéricas.
+         - lista_numericas: una lista con el nombre de las variables que son de tipo numérico.
+         - top: número de valores más repetidos que se regresan por variable.
+         - k_cuantiles: si se indica, los cuartiles se aproximan con un SketchCuantiles de ese tamaño.
+         - precision_hll: si se indica junto con capacidad_top, los únicos se estiman con un HyperLogLog de
+           esa precisión. Sin capacidad_top no se usa: el top exacto ya factoriza la columna y los únicos
+           salen exactos de ahí.
+         - capacidad_top: si se indica, el top de repetidos sale de un TopFrecuentes con esa capacidad (la
+           memoria queda acotada por la capacidad y no por el número de valores distintos).
+    * Return:
+         - dict: diccionario con un arreglo por métrica (conteo, media, desviacion, cuartil_25,
+           cuartil_50, cuartil_75, minimo, maximo, unicos, nulos) en el orden de lista_numericas,
+           y la llave top5 con una lista de Data Frames (columna conteo_top_5). Con k_cuantiles también
+           trae cotas_cuartil_25, cotas_cuartil_50, cotas_cuartil_75 y error_cuantiles.
+    ==========
+    Ejemplo:
+        >>estadisticos = calcula_estadisticos_numericos(df, ['consumo_total', 'consumo_prom'])
+        >>estadisticos['media']
+    """
+    with _etapa('numericas_bloque', len(df)):
+        bloque = df[lista_numericas].to_numpy(dtype='float64', na_value=np.nan)
+    n_renglones = bloque.shape[0]
+
+    # Nulos y conteos
+    nulos = np.isnan(bloque).sum(axis=0)
+    conteo = (n_renglones - nulos).astype('float64')
+
+    # Momentos, extremos y cuartiles (interpolación lineal, igual que describe())
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings(), \
+            _etapa('numericas_momentos', n_renglones):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        media = np.nansum(bloque, axis=0) / conteo
+        desviacion = np.sqrt(np.nansum((bloque - media) ** 2, axis=0) / (conteo - 1))
+        minimo = np.nanmin(bloque, axis=0)
+        maximo = np.nanmax(bloque, axis=0)
+        if k_cuantiles is None:
+            cuartiles = np.nanpercentile(bloque, [25, 50, 75], axis=0)
+    desviacion[conteo < 2] = np.nan
+
+    sketches = {}
+    if k_cuantiles is not None:
+        sketches = {col: SketchCuantiles(k_cuantiles).actualiza(bloque[:, j])
+                    for j, col in enumerate(lista_numericas)}
+
+    # Únicos y top de repetidos: se factoriza la columna sólo si hace falta el top exacto o los únicos exactos
+    unicos = np.zeros(len(lista_numericas), dtype='int64')
+    lista_top = []
+    for j, col in enumerate(lista_numericas):
+        with _etapa('numericas_unicos_top', len(df), col):
+            valores_columna = valores_numericos_canonicos(df[col])
+            if capacidad_top is not None:
+                lista_top.append(TopFrecuentes(capacidad_top).actualiza_por_bloques(pd.Series(valores_columna))
+                                 .top_repetidos(top))
+                if precision_hll is not None:
+                    unicos[j] = HyperLogLog(precision_hll).actualiza(df[col]).cardinalidad()
+                    continue
+
+            codigos, valores_unicos = pd.factorize(valores_columna)
+            unicos[j] = len(valores_unicos)
+            if capacidad_top is None:
+                # los valores quedan en orden de aparición
+                veces = np.bincount(codigos[codigos >= 0], minlength=len(valores_unicos))
+                lista_top.append(tabla_top_repetidos(pd.Series(veces, index=valores_unicos), top))
+
+    estadisticos = {'conteo': conteo, 'media': media, 'desviacion': desviacion, 'nulos': nulos,
+                    'minimo': minimo, 'maximo': maximo, 'unicos': unicos, 'top5': lista_top}
+    if k_cuantiles is None:
+        estadisticos.update({'cuartil_25': cuartiles[0], 'cuartil_50': cuartiles[1], 'cuartil_75': cuartiles[2]})
+    else:
+        estadisticos.update(_estadisticos_de_sketches([sketches[col] for col in lista_numericas]))
+    return estadisticos
+
+
+def valores_numericos_canonicos(serie):
+    """
+    Función que regresa los valores de una columna numérica como int64 (enteras sin nulos) o float64 (el
+    resto, con NaN en los nulos), para que una columna compactada (int8, float32, Int64, ...) dé los mismos
+    únicos y el mismo top de repetidos que la original.
+
+    ==========
+    * Args:
+         - serie: columna numérica.
+    * Return:
+         - arreglo de NumPy int64 o float64.
+    ==========
+    Ejemplo:
+        >>valores = valores_numericos_canonicos(df['consumo_total'])
+    """
+    if familia_de_tipo(serie.dtype) == 'entera' and not serie.hasnans:
+        # uint64 no cabe en int64
+        return serie.to_numpy(dtype='uint64' if serie.dtype == 'uint64' else 'int64')
+    return serie.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _estadisticos_de_sketches(sketches):
+    """
+    Función que convierte una lista de SketchCuantiles (uno por variable) en las llaves de cuartiles, cotas y
+    error de rango que usa _arma_profiling_de_numericos.
+    """
+    estadisticos = {'error_cuantiles': [sketch.error_rango() for sketch in sketches]}
+    for llave, q in (('cuartil_25', 0.25), ('cuartil_50', 0.5), ('cuartil_75', 0.75)):
+        resultados = [sketch.cuantil(q) for sketch in sketches]
+        estadisticos[llave] = np.array([np.float64(r[0]) for r in resultados])
+        estadisticos['cotas_' + llave] = [(r[1], r[2]) for r in resultados]
+    return estadisticos
+
+
+def genera_profiling_de_categorias(df, lista_category,vars_type,precision_hll=None,capacidad_top=None,
+                                   contexto=None):
     """
     Función que genera un perfilamiento para los datos categóricos.
 
@@ -325,6 +512,11 @@ def genera_profiling_de_categorias(df, lista_category,vars_type):
          - df: el data frame al que se le va a realizar el perfilamiento para variables categóricas.
          - lista_category: una lista con el nombre de las variables que son de tipo categórico.
          - vars_type: tabla generada por la función cuenta_tipo_de_dato de este mismo script.
+         - precision_hll: si se indica, el número de categorías se estima con un HyperLogLog y la lista de
+           valores únicos sólo se arma cuando el conteo es exacto (por debajo de su umbral).
+         - capacidad_top: si se indica, las modas salen de un TopFrecuentes con esa capacidad; si los conteos
+           quedan aproximados, cada moda trae como cuarto elemento la cota de su error.
+         - contexto: ContextoPerfilamiento opcional del data frame (nulos y conteos de valores).
     * Return:
          - Data Frame: Data Frame con el perfilamiento para las variables categóricas.
     ==========
@@ -339,69 +531,68 @@ def genera_profiling_de_categorias(df, lista_category,vars_type):
         >>profiling_de_categorias = genera_profiling_de_categorias(df,lista_category,vars_type)
     """
     # Obtenemos los estadísticos de la columna si es catagorica
-    lista_perfilamiento_categorico = ['tipo','numero de categorias', 'numero de observaciones',
-                                      'observaciones nulas','% observaciones nulas', 'valores unicos',
-                                      'moda1/veces/porcentaje','moda2/veces/porcentaje','moda3/veces/porcentaje']
-    datos_dataframe_profiling_categoricos = {'metrica':lista_perfilamiento_categorico}
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    datos_dataframe_profiling_categoricos = {'metrica':LISTA_PERFILAMIENTO_CATEGORICO}
     dataframe_profiling_categoricas = pd.DataFrame(data=datos_dataframe_profiling_categoricos)
-    for col in lista_category:
-        # tipo de dato
-        vars_type_cat = pd.DataFrame(vars_type)
-        #vars_type_cat
-        df_tipo = pd.DataFrame(data=vars_type_cat.loc[vars_type_cat["variable"] == col])
-        tipo_dato=df_tipo['tipo'][0]
-
-        # Obtenemos las métricas relevantes
-        descr_col = df[col]
-        descr_col = pd.DataFrame(descr_col)
-        descr_col['metrica']=descr_col.index
-        descr_col.columns=['valor','metrica']
 
-        #Numero de categorias
-
-        num_categorias=descr_col.nunique()["valor"]
+    # tipo de dato de cada variable
+    tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
+    for col in lista_category:
+        with _etapa('categoricas', len(df), col):
+            tipo_dato=tipos[col]
 
-        #Numero de observaciones
+            #Numero de categorias
 
-        num_observaciones=len(descr_col)
+            if precision_hll is None:
+                contexto.conteo_valores(col)
+                num_categorias=np.int64(contexto.numero_unicos(col))
+            else:
+                hll = HyperLogLog(precision_hll).actualiza(df[col])
+                num_categorias=hll.cardinalidad()
 
-        #Valores nulos
+            #Numero de observaciones
 
-        num_obs_nulas=df[col].isna().sum()
+            num_observaciones=len(df)
 
-        #%Valores nulos
+            #Valores nulos
 
-        por_obs_nulas=num_obs_nulas/num_observaciones
+            es_category = familia_de_tipo(df[col].dtype) == 'categorica'
+            if es_category:
+                num_obs_nulas=contexto.conteo_categorias(col)['nulos']
+            else:
+                num_obs_nulas=contexto.nulos_por_columna()[col]
 
-        # valor de las categorias
-        valores_unicos = list(df[col].unique())
+            #%Valores nulos
 
-        # generamos tabla para las modas
-        tabla_importantes = CreaTablaConteoPorcentaje(df,str(col),True)
-        tabla_importantes.columns = ['conteo','porcentaje']
+            por_obs_nulas=num_obs_nulas/num_observaciones
 
-        moda1 = tabla_importantes.index[0]
-        veces1 = tabla_importantes['conteo'][0]
-        porcentaje1 = tabla_importantes['porcentaje'][0]
-        datos_moda1 = [moda1,veces1,porcentaje1]
+            # valor de las categorias
+            if es_category and precision_hll is None:
+                valores_unicos = list(contexto.conteo_categorias(col)['unicos'])
+            elif precision_hll is None or hll.es_exacto():
+                valores_unicos = list(df[col].unique())
+            else:
+                valores_unicos = "Más de " + str(hll.umbral_exacto) + " valores distintos"
 
-        moda2 = tabla_importantes.index[1]
-        veces2 = tabla_importantes['conteo'][1]
-        porcentaje2 = tabla_importantes['porcentaje'][1]
-        datos_moda2 = [moda2,veces2,porcentaje2]
+            # generamos tabla para las modas
+            if capacidad_top is None:
+                tabla_importantes = _tabla_conteo_porcentaje(contexto.conteo_valores(col))
+                tabla_importantes.columns = ['conteo','porcentaje']
+                cota_error = 0
+            else:
+                frecuentes = TopFrecuentes(capacidad_top).actualiza_por_bloques(df[col])
+                tabla_importantes = frecuentes.tabla_conteo_porcentaje(orden='valor')
+                cota_error = frecuentes.error
 
-        moda3 = tabla_importantes.index[2]
-        veces3 = tabla_importantes['conteo'][2]
-        porcentaje3 = tabla_importantes['porcentaje'][2]
-        datos_moda3 = [moda3,veces3,porcentaje3]
+            datos_moda1,datos_moda2,datos_moda3 = _datos_modas(tabla_importantes,cota_error)
 
-        datos_variable = [tipo_dato,num_categorias,num_observaciones,num_obs_nulas,por_obs_nulas,
-                          valores_unicos,datos_moda1,datos_moda2,datos_moda3]
-        dataframe_profiling_categoricas[col]=datos_variable
+            datos_variable = [tipo_dato,num_categorias,num_observaciones,num_obs_nulas,por_obs_nulas,
+                              valores_unicos,datos_moda1,datos_moda2,datos_moda3]
+            dataframe_profiling_categoricas[col]=datos_variable
     return dataframe_profiling_categoricas
 
 
-def genera_profiling_de_texto(df,lista_texto,vars_type):
+def genera_profiling_de_texto(df,lista_texto,vars_type,precision_hll=None,contexto=None,motor='pandas'):
     """
     Función que genera un perfilamiento para los datos de tipo texto.
 
@@ -410,6 +601,12 @@ def genera_profiling_de_texto(df,lista_texto,vars_type):
          - df: el data frame al que se le va a realizar el perfilamiento para variables de texto.
          - lista_texto: una lista con el nombre de las variables que son de tipo texto (object).
          - vars_type: tabla generada por la función cuenta_tipo_de_dato de este mismo script.
+         - precision_hll: si se indica, las observaciones únicas se estiman con un HyperLogLog.
+         - contexto: ContextoPerfilamiento opcional del data frame.
+         - motor: 'pandas' (default) o 'arrow'. Con 'arrow' las métricas salen de los buffers UTF-8 de un
+           arreglo de pyarrow (ver estadisticos_texto_arrow) y la tabla agrega las longitudes en bytes y el
+           histograma de tamaños (LISTA_PERFILAMIENTO_TEXTO_ARROW). Las columnas que no son sólo strings
+           se perfilan con pandas.
     * Return:
          - Data Frame: Data Frame con el perfilamiento para las variables categóricas.
     ==========
@@ -424,59 +621,175 @@ def genera_profiling_de_texto(df,lista_texto,vars_type):
         >>profiling_de_texto = genera_profiling_de_texto(df,lista_texto,vars_type)
     """
     # Obtenemos los estadísticos de la columna si es catagorica
-    lista_perfilamiento_txt = ['tipo','numero de observaciones', 'observaciones unicas', '% observaciones unicas',
-                                    'tamano promedio','tamano minmo','tamano maximo']
-    datos_dataframe_profiling_txt = {'metrica':lista_perfilamiento_txt}
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    if motor == 'arrow':
+        datos_dataframe_profiling_txt = {'metrica':LISTA_PERFILAMIENTO_TEXTO_ARROW}
+    else:
+        datos_dataframe_profiling_txt = {'metrica':LISTA_PERFILAMIENTO_TEXTO}
     dataframe_profiling_txt = pd.DataFrame(data=datos_dataframe_profiling_txt)
+
+    # tipo de dato de cada variable
+    tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
     for col in lista_texto:
-        # tipo de dato
-        vars_type_txt = pd.DataFrame(vars_type)
-        #vars_type_txt
-        df_tipo = pd.DataFrame(data=vars_type_txt.loc[vars_type_txt["variable"] == col])
-        tipo_dato=df_tipo['tipo'][0]
+        with _etapa('texto', len(df), col):
+            tipo_dato=tipos[col]
+
+            #Numero de observaciones
 
-        # Obtenemos las métricas relevantes
-        descr_col = df[col]
-        descr_col = pd.DataFrame(descr_col)
-        descr_col['metrica']=descr_col.index
-        descr_col.columns=['valor','metrica']
+            num_observaciones=len(df)
 
-        #Numero de observaciones
+            estadisticos = estadisticos_texto_arrow(df[col]) if motor == 'arrow' else None
+            if estadisticos is not None:
+                if precision_hll is None:
+                    num_obs_unicas=estadisticos['unicos']
+                else:
+                    num_obs_unicas=HyperLogLog(precision_hll).actualiza(df[col]).cardinalidad()
+                datos_variable = [tipo_dato,num_observaciones,num_obs_unicas,num_obs_unicas/num_observaciones,
+                                  estadisticos['caracteres_promedio'],estadisticos['caracteres_minimo'],
+                                  estadisticos['caracteres_maximo'],estadisticos['bytes_promedio'],
+                                  estadisticos['bytes_minimo'],estadisticos['bytes_maximo'],
+                                  estadisticos['histograma']]
+                dataframe_profiling_txt[col]=datos_variable
+                continue
 
-        num_observaciones=len(descr_col)
+            #Observaciones unicas
 
-        #Observaciones unicas
+            if precision_hll is None:
+                num_obs_unicas=contexto.numero_unicos(col)
+            else:
+                num_obs_unicas=HyperLogLog(precision_hll).actualiza(df[col]).cardinalidad()
 
-        num_obs_unicas=df[col].nunique()
+            #%Observaciones nulas
 
-        #%Observaciones nulas
+            por_obs_unicas=num_obs_unicas/num_observaciones
 
-        por_obs_unicas=num_obs_unicas/num_observaciones
+            # Longitudes de las cadenas (se calculan una sola vez)
+            longitudes = df[col].str.len()
 
-        #%Tamaño promedio
-        tam_prom=df[col].str.len().mean()
-        #tam_prom=agua[col].apply(len).mean()
+            #%Tamaño promedio
+            tam_prom=longitudes.mean()
 
-        #%Tamaño minimo
-        tam_min=df[col].str.len().min()
-        #tam_min=agua[col].apply(len).min()
+            #%Tamaño minimo
+            tam_min=longitudes.min()
 
-        #%Tamaño maximo
-        tam_max=df[col].str.len().max()
-        #tam_max=agua[col].apply(len).max()
+            #%Tamaño maximo
+            tam_max=longitudes.max()
 
-        datos_variable = [tipo_dato,num_observaciones,num_obs_unicas,por_obs_unicas,tam_prom,tam_min,tam_max]
-        dataframe_profiling_txt[col]=datos_variable
+            datos_variable = [tipo_dato,num_observaciones,num_obs_unicas,por_obs_unicas,tam_prom,tam_min,tam_max]
+            if motor == 'arrow':
+                datos_variable += [np.nan, np.nan, np.nan, None]
+            dataframe_profiling_txt[col]=datos_variable
     return dataframe_profiling_txt
 
 
-def genera_profiling_por_variable(df):
+def estadisticos_texto_arrow(serie, numero_bins=10):
+    """
+    Función que calcula las métricas de texto de una columna sobre los buffers de un arreglo de pyarrow (un
+    buffer contiguo de bytes UTF-8 más los offsets de cada string), sin recorrer objetos de Python: la
+    longitud en bytes es la diferencia de offsets y la longitud en caracteres es esa menos los bytes de
+    continuación (10xxxxxx) de cada string. Si la columna ya es de strings de Arrow no se copia.
+
+    ==========
+    * Args:
+         - serie: columna de texto.
+         - numero_bins: número máximo de intervalos del histograma de longitudes (en caracteres).
+    * Return:
+         - diccionario con unicos, caracteres_promedio/minimo/maximo, bytes_promedio/minimo/maximo e
+           histograma (Data Frame con desde, hasta y renglones), con los mismos tipos que da str.len()
+           (en una columna object, min y max flotantes si hay nulos). None si la columna tiene valores que
+           no son strings.
+    ==========
+    Ejemplo:
+        >>estadisticos = estadisticos_texto_arrow(df['geo_shape'])
+        >>estadisticos['histograma']
+    """
+    import pyarrow as pa
+
+    try:
+        if hasattr(serie.array, '__arrow_array__'):
+            arreglo = pa.array(serie.array)
+        else:
+            arreglo = pa.array(serie.to_numpy(dtype='object'), type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+    pedazos = arreglo.chunks if isinstance(arreglo, pa.ChunkedArray) else [arreglo]
+    if any(not pa.types.is_string(pedazo.type) for pedazo in pedazos):
+        return None
+
+    lista_bytes = []
+    lista_caracteres = []
+    for pedazo in pedazos:
+        validez, offsets, datos = pedazo.buffers()
+        offsets = np.frombuffer(offsets, dtype='int32')[pedazo.offset:pedazo.offset + len(pedazo) + 1]
+        if datos is None:
+            datos = np.zeros(0, dtype='uint8')
+        else:
+            datos = np.frombuffer(datos, dtype='uint8')[offsets[0]:offsets[-1]]
+        inicios = offsets[:-1] - offsets[0]
+        longitudes = np.diff(offsets).astype('int64')
+        caracteres = longitudes
+        continuacion = (datos & 0xC0) == 0x80
+        if continuacion.any():
+            # entre dos strings no vacíos consecutivos sólo hay strings vacíos, así que cada tramo de
+            # reduceat es exactamente un string
+            no_vacios = longitudes > 0
+            caracteres = longitudes.copy()
+            caracteres[no_vacios] -= np.add.reduceat(continuacion, inicios[no_vacios], dtype='int64')
+        if validez is not None and pedazo.null_count > 0:
+            bits = np.unpackbits(np.frombuffer(validez, dtype='uint8'), bitorder='little')
+            validos = bits[pedazo.offset:pedazo.offset + len(pedazo)].astype(bool)
+            longitudes = longitudes[validos]
+            caracteres = caracteres[validos]
+        lista_bytes.append(longitudes)
+        lista_caracteres.append(caracteres)
+    longitudes = np.concatenate(lista_bytes) if lista_bytes else np.zeros(0, dtype='int64')
+    caracteres = np.concatenate(lista_caracteres) if lista_caracteres else np.zeros(0, dtype='int64')
+
+    nulos = len(serie) - len(longitudes)
+    unicos = pa.chunked_array(pedazos, type=pa.string()).unique()
+    estadisticos = {'unicos': len(unicos) - unicos.null_count}
+    # como str.len(): en una columna string las longitudes son Int64 (sin datos, pd.NA); en una columna
+    # object son flotantes si hay nulos
+    columna_string = isinstance(serie.dtype, pd.StringDtype)
+    for nombre, valores in (('caracteres', caracteres), ('bytes', longitudes)):
+        if len(valores) == 0:
+            minimo = maximo = promedio = pd.NA if columna_string else np.nan
+        else:
+            minimo, maximo, promedio = valores.min(), valores.max(), valores.mean()
+            if nulos > 0 and not columna_string:
+                minimo, maximo = np.float64(minimo), np.float64(maximo)
+        estadisticos.update({nombre + '_promedio': promedio, nombre + '_minimo': minimo,
+                             nombre + '_maximo': maximo})
+
+    # Histograma con intervalos enteros [desde, hasta) del mismo ancho
+    if len(caracteres):
+        minimo = caracteres.min()
+        ancho = -(-(caracteres.max() - minimo + 1) // numero_bins)
+        renglones = np.bincount((caracteres - minimo) // ancho)
+        desde = minimo + ancho * np.arange(len(renglones))
+    else:
+        renglones = desde = np.zeros(0, dtype='int64')
+        ancho = 1
+    estadisticos['histograma'] = pd.DataFrame({'desde': desde, 'hasta': desde + ancho, 'renglones': renglones})
+    return estadisticos
+
+
+def genera_profiling_por_variable(df, k_cuantiles=None, precision_hll=None, capacidad_top=None, n_jobs=None,
+                                  contexto=None, motor_texto='pandas'):
     """
     Función que genera un perfilamiento para cada tipo de variable en el data frame.
 
     ==========
     * Args:
          - df: el data frame al que se le va a realizar el perfilamiento por variable.
+         - k_cuantiles: si se indica, los cuartiles de las numéricas se aproximan con un SketchCuantiles.
+         - precision_hll: si se indica, los valores distintos se estiman con un HyperLogLog de esa precisión.
+         - capacidad_top: si se indica, el top de repetidos y las modas salen de un TopFrecuentes con esa
+           capacidad.
+         - n_jobs: número de procesos para perfilar las columnas en paralelo (-1 para usar todos los núcleos).
+           Con None o 1 se perfila en el proceso actual. El resultado es el mismo que en serie.
+         - contexto: ContextoPerfilamiento opcional del data frame (tipos, nulos y conteos compartidos).
+         - motor_texto: motor del perfilamiento de texto, 'pandas' o 'arrow' (ver genera_profiling_de_texto).
     * Return:
          - profiling_numericas: Data Frame con el perfilamiento para las variables numéricas.
          - profiling_categoricas: Data Frame con el perfilamiento para las variables categóricas
@@ -485,48 +798,75 @@ def genera_profiling_por_variable(df):
     Ejemplo:
         # Generamos el perfilamiento para esas variables
         >>profiling_numericas,profiling_categoricas,profiling_de_texto = genera_profiling_por_variable(df)
-    """
-    # Dividimos variables por tipo de datos
-    vars_type = df.dtypes
-    vars_type = pd.DataFrame(vars_type, columns = ['tipo'])
-    vars_type['variable']=vars_type.index
-
-    # variables numericas
-    variables_int = vars_type.loc[vars_type["tipo"] == "int64"]
-    variables_float = vars_type.loc[vars_type["tipo"] == "float64"]
-    variables_numericas = variables_int.append(variables_float, ignore_index=True)
-    lista_numericas = list(variables_numericas['variable'])
-
-    # variables fecha
-    variables_date = vars_type.loc[vars_type["tipo"] == "Date"]
-    lista_date = list(variables_date['variable'])
 
-    # variables categoricas
-    variables_category = vars_type.loc[vars_type["tipo"] == "category"]
-    lista_category = list(variables_category['variable'])
+        # En paralelo, con un proceso por núcleo
+        >>profiling_numericas,profiling_categoricas,profiling_de_texto = genera_profiling_por_variable(df, n_jobs=-1)
+    """
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
 
-    # variables texto
-    variables_texto = vars_type.loc[vars_type["tipo"] == "object"]
-    lista_texto = list(variables_texto['variable'])
+    # Dividimos variables por tipo de datos
+    with _etapa('particion_tipos', len(df)):
+        vars_type = contexto.vars_type
+        lista_numericas, lista_date, lista_category, lista_texto = contexto.listas
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if n_jobs is not None and n_jobs > 1:
+        opciones = {'k_cuantiles': k_cuantiles, 'precision_hll': precision_hll, 'capacidad_top': capacidad_top,
+                    'motor_texto': motor_texto}
+        perfiladores = {'numerica': genera_profiling_de_numericos, 'categorica': genera_profiling_de_categorias,
+                        'texto': genera_profiling_de_texto}
+        with _etapa('perfilamiento_paralelo', len(df)):
+            return genera_profiling_en_paralelo(df, [lista_numericas, lista_category, lista_texto], n_jobs,
+                                                opciones, perfiladores, contexto)
 
     if len(lista_numericas)==0:
         profiling_numericas = "No hay variables numéricas"
     else:
-        profiling_numericas = genera_profiling_de_numericos(df,lista_numericas,vars_type)
+        profiling_numericas = genera_profiling_de_numericos(df,lista_numericas,vars_type,k_cuantiles,precision_hll,
+                                                            capacidad_top)
 
     if len(lista_category)==0:
         profiling_categoricas = "No hay variables categóricas"
     else:
-        profiling_categoricas = genera_profiling_de_categorias(df,lista_category,vars_type)
+        profiling_categoricas = genera_profiling_de_categorias(df,lista_category,vars_type,precision_hll,
+                                                               capacidad_top,contexto)
 
     if len(lista_texto)==0:
         profiling_texto = "No hay variables de tipo texto"
     else:
-        profiling_texto = genera_profiling_de_texto(df,lista_texto,vars_type)
+        profiling_texto = genera_profiling_de_texto(df,lista_texto,vars_type,precision_hll,contexto,motor_texto)
 
     return (profiling_numericas,profiling_categoricas,profiling_texto)
 
 
+def genera_profiling_completo(df, top=10, **kwargs):
+    """
+    Función que genera el perfilamiento general, la tabla de renglones con nulos y el perfilamiento por
+    variable compartiendo un solo ContextoPerfilamiento, de modo que la máscara de nulos, los tipos y los
+    conteos de valores se calculan una sola vez para los tres reportes.
+
+    ==========
+    * Args:
+         - df: el data frame a perfilar.
+         - top: número de renglones con más nulos a mostrar (ver cuenta_nulos_por_renglones_tabla).
+         - kwargs: parámetros adicionales para genera_profiling_por_variable (k_cuantiles, precision_hll,
+           capacidad_top, n_jobs).
+    * Return:
+         - perfilamiento_general: Data Frame con el perfilamiento general.
+         - tabla_nulos_renglones: Data Frame con los renglones con más nulos.
+         - profiling_por_variable: tupla (profiling_numericas, profiling_categoricas, profiling_de_texto).
+    ==========
+    Ejemplo:
+        >>perfilamiento_general, tabla_nulos, (numericas, categoricas, texto) = genera_profiling_completo(df)
+    """
+    contexto = ContextoPerfilamiento(df)
+    perfilamiento_general = genera_profiling_general(df, contexto)
+    tabla_nulos_renglones = cuenta_nulos_por_renglones_tabla(df, top, contexto=contexto)
+    profiling_por_variable = genera_profiling_por_variable(df, contexto=contexto, **kwargs)
+    return perfilamiento_general, tabla_nulos_renglones, profiling_por_variable
+
+
 def StringLowercase(df):
     """
     Función cambiar todos los strings de un dataframe a lowercase
@@ -555,7 +895,8 @@ def StringLowercase(df):
     StringColumns = list(objects.index)
 
     for col in StringColumns:
-        df[col] = df[col].str.lower()
+        df[col] = _transforma_valores_unicos(df[col], lambda valores: [x.lower() for x in valores], False,
+                                             lambda serie: serie.str.lower())
 
     return df
 
@@ -590,7 +931,9 @@ def StringAcentos(df):
     StringColumns = list(objects.index)
 
     for col in StringColumns:
-        df[col] = df[col].str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+        df[col] = _transforma_valores_unicos(df[col], lambda valores: [_quita_acentos(x) for x in valores], False,
+                                             lambda serie: serie.str.normalize('NFKD')
+                                             .str.encode('ascii', errors='ignore').str.decode('utf-8'))
 
     return df
 
@@ -619,7 +962,8 @@ def StringStrip(df):
     StringColumns = list(objects.index)
 
     for col in StringColumns:
-        df[col] = df[col].apply(lambda x: x.strip() if isinstance(x, str) else x)
+        df[col] = _transforma_valores_unicos(df[col], lambda valores: [x.strip() for x in valores], True,
+                                             lambda serie: serie.apply(lambda x: x.strip() if isinstance(x, str) else x))
 
     return df
 
@@ -639,7 +983,7 @@ def StringEspacios(df):
     """
     ### Columnas
 
-    df.columns = [re.sub(' +', ' ', col) for col in df.columns]
+    df.columns = [PATRON_ESPACIOS.sub(' ', col) for col in df.columns]
 
     ### Observaciones
 
@@ -648,11 +992,13 @@ def StringEspacios(df):
     StringColumns = list(objects.index)
 
     for col in StringColumns:
-        df[col] = df[col].apply(lambda x: re.sub(' +', ' ', x) if isinstance(x, str) else x)
+        df[col] = _transforma_valores_unicos(df[col], lambda valores: [PATRON_ESPACIOS.sub(' ', x) for x in valores],
+                                             True, lambda serie: serie.apply(
+                                                 lambda x: PATRON_ESPACIOS.sub(' ', x) if isinstance(x, str) else x))
 
     return df
 
-def EstandarizaFormato(df):
+def EstandarizaFormato(df, memo=None, incluye_categorias=False):
     """
     Función para estandarizar un dataframe: minúsculas, sin espacios en blanco,
     sin signos de puntuación (columnas y observaciones)
@@ -660,6 +1006,9 @@ def EstandarizaFormato(df):
     ==========
     * Args:
          - df: dataframe al que se desea hacer la modificación.
+         - memo: MemoNormalizacion opcional con strings ya estandarizados (de este u otros data sets).
+         - incluye_categorias: si es True también se estandarizan las columnas category cuyas categorías
+           son strings.
     * Return:
          - df: dataframe modificado
     ==========
@@ -669,20 +1018,193 @@ def EstandarizaFormato(df):
     ### Quita espacios en columnas
     df.columns = df.columns.str.replace(' ', '_')
 
-    ### Minúsculas
-    df = StringLowercase(df)
-
-    ### Acentos
-    df = StringAcentos(df)
+    ### Columnas: mismo resultado que StringLowercase, StringAcentos, StringStrip y StringEspacios
+    df.columns = [EstandarizaNombreColumna(col) for col in df.columns]
 
-    ### Quitamos espacios al principio y al final
-    df = StringStrip(df)
+    ### Observaciones: minúsculas, acentos, espacios al principio y al final y espacios dobles en una
+    ### sola pasada por columna
+    filtro = df.dtypes == object
+    if incluye_categorias:
+        filtro = filtro | (df.dtypes == 'category')
+    objects = df.dtypes[filtro]
+    StringColumns = list(objects.index)
 
-    ### Quitamos espacios
-    df = StringEspacios(df)
+    for col in StringColumns:
+        with _etapa('normalizacion', len(df), col):
+            df[col] = EstandarizaTexto(df[col], memo)
 
     return df
 
+def EstandarizaNombreColumna(col):
+    """
+    Función que aplica a un nombre de columna los mismos cambios que StringLowercase, StringAcentos,
+    StringStrip y StringEspacios.
+
+    ==========
+    * Args:
+         - col: nombre de la columna.
+    * Return:
+         - str: nombre estandarizado.
+    ==========
+    Ejemplo:
+        >>EstandarizaNombreColumna('Alcaldía ')
+    """
+    col = col.lower()
+    for acento, letra in (('á', 'a'), ('é', 'e'), ('í', 'i'), ('ó', 'o'), ('ú', 'u'), ('ü', 'u'), ('ñ', 'n')):
+        col = col.replace(acento, letra)
+    return PATRON_ESPACIOS.sub(' ', col.strip())
+
+def _quita_acentos(x):
+    return unicodedata.normalize('NFKD', x).encode('ascii', errors='ignore').decode('utf-8')
+
+def _estandariza_valor(x):
+    x = x.lower()
+    # NFKD no cambia un string ASCII, así que sólo normalizamos los que traen otros caracteres
+    if not x.isascii():
+        x = _quita_acentos(x)
+    x = x.strip()
+    if '  ' in x:
+        x = PATRON_ESPACIOS.sub(' ', x)
+    return x
+
+def _transforma_valores_unicos(serie, funcion, conserva_no_texto, paso_original):
+    """
+    Función que aplica una transformación de strings sólo a los valores distintos de una columna object y
+    la reconstruye con los códigos de pd.factorize, en lugar de transformar cada renglón.
+
+    ==========
+    * Args:
+         - serie: columna de tipo object.
+         - funcion: recibe la lista de strings distintos y regresa la lista transformada.
+         - conserva_no_texto: True si lo que no es string se queda igual (como en los apply de StringStrip y
+           StringEspacios); False si queda como NaN (como con el accesor .str). Los nulos siempre se quedan.
+         - paso_original: transformación renglón por renglón que se usa si la columna no tiene ningún string
+           (así pandas cambia el tipo de la columna o rechaza el accesor .str igual que antes).
+    * Return:
+         - Series: columna transformada.
+    ==========
+    Ejemplo:
+        >>df['colonia'] = _transforma_valores_unicos(df['colonia'], lambda valores: [x.strip() for x in valores],
+                                                     True, lambda serie: serie.str.strip())
+    """
+    originales = serie.to_numpy()
+    codigos, unicos = pd.factorize(originales)
+    es_texto = np.fromiter((isinstance(x, str) for x in unicos), dtype=bool, count=len(unicos))
+    if not es_texto.any():
+        return paso_original(serie)
+
+    transformados = np.empty(len(unicos), dtype=object)
+    transformados[es_texto] = funcion(list(unicos[es_texto]))
+
+    if conserva_no_texto:
+        resultado = originales.copy()
+    else:
+        resultado = np.full(len(originales), np.nan, dtype=object)
+        resultado[codigos < 0] = originales[codigos < 0]
+    renglones_texto = (codigos >= 0) & es_texto[codigos]
+    resultado[renglones_texto] = transformados[codigos[renglones_texto]]
+    return pd.Series(resultado, index=serie.index, name=serie.name)
+
+def EstandarizaTexto(serie, memo=None):
+    """
+    Función que estandariza una columna de texto en una sola pasada: minúsculas, sin acentos ni eñes, sin
+    espacios al inicio y al final y sin espacios dobles. El resultado es idéntico al de aplicar
+    StringLowercase, StringAcentos, StringStrip y StringEspacios a la columna: los nulos se quedan como
+    estaban y lo que no es string queda como NaN.
+
+    Sólo se estandarizan los valores distintos de la columna (pd.factorize) y, si se da un memo, sólo los
+    que no se hayan estandarizado antes. Las columnas category se estandarizan en sus categorías (si son
+    strings; si no, se regresan igual) y las categorías que quedan repetidas se juntan en la posición de la
+    primera, así que una columna ordenada conserva su orden.
+
+    ==========
+    * Args:
+         - serie: columna de tipo object o category.
+         - memo: MemoNormalizacion opcional.
+    * Return:
+         - Series: columna estandarizada (del mismo tipo).
+    ==========
+    Ejemplo:
+        >>df['colonia'] = EstandarizaTexto(df['colonia'])
+    """
+    estandariza = (lambda valores: [_estandariza_valor(x) for x in valores]) if memo is None else memo.estandariza
+
+    if serie.dtype == 'category':
+        categorias = serie.cat.categories
+        if len(categorias) == 0 or not all(isinstance(x, str) for x in categorias):
+            return serie
+        estandarizadas = estandariza(list(categorias))
+        # en el orden de las categorías originales, para que las ordenadas conserven su orden
+        nuevas_categorias = pd.Index(pd.unique(np.array(estandarizadas, dtype=object)))
+        mapeo = nuevas_categorias.get_indexer(estandarizadas)
+        codigos = serie.cat.codes.to_numpy()
+        nuevos_codigos = np.where(codigos >= 0, mapeo[codigos], -1)
+        categorica = pd.Categorical.from_codes(nuevos_codigos, categories=nuevas_categorias,
+                                               ordered=serie.cat.ordered)
+        return pd.Series(categorica, index=serie.index, name=serie.name)
+
+    def paso_original(serie):
+        serie = serie.str.lower()
+        if serie.dtype == object:
+            serie = serie.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+        if serie.dtype == object:
+            serie = serie.apply(lambda x: x.strip() if isinstance(x, str) else x)
+        if serie.dtype == object:
+            serie = serie.apply(lambda x: PATRON_ESPACIOS.sub(' ', x) if isinstance(x, str) else x)
+        return serie
+
+    return _transforma_valores_unicos(serie, estandariza, False, paso_original)
+
+class MemoNormalizacion:
+    """
+    Memo de strings ya estandarizados (valor original -> valor estandarizado) para que las cargas
+    repetidas (por ejemplo, cada bimestre) no vuelvan a estandarizar las alcaldías, colonias, etc. que ya
+    se vieron. Se puede guardar en un archivo JSON y volver a cargar. Los strings más largos que
+    longitud_maxima (como geo_shape) no se guardan, y cuando el memo llega a maximo_valores deja de crecer.
+
+    ==========
+    * Args:
+         - ruta: archivo JSON del memo; si existe se carga.
+         - longitud_maxima: largo máximo de los strings que se guardan.
+         - maximo_valores: número máximo de strings en el memo.
+    ==========
+    Ejemplo:
+        >>memo = MemoNormalizacion('../data/memo_normalizacion.json')
+        >>df = prepara_dataset(df, memo)
+        >>memo.guarda()
+    """
+
+    def __init__(self, ruta=None, longitud_maxima=200, maximo_valores=1000000):
+        self.ruta = ruta
+        self.longitud_maxima = longitud_maxima
+        self.maximo_valores = maximo_valores
+        self.valores = {}
+        if ruta is not None and os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as archivo:
+                self.valores = json.load(archivo)
+
+    def estandariza(self, valores):
+        """
+        Regresa la lista de valores estandarizados, usando y llenando el memo.
+        """
+        resultado = []
+        for x in valores:
+            estandarizado = self.valores.get(x)
+            if estandarizado is None:
+                estandarizado = _estandariza_valor(x)
+                if len(x) <= self.longitud_maxima and len(self.valores) < self.maximo_valores:
+                    self.valores[x] = estandarizado
+            resultado.append(estandarizado)
+        return resultado
+
+    def guarda(self, ruta=None):
+        """
+        Guarda el memo en ruta (o en la ruta con la que se creó).
+        """
+        ruta = self.ruta if ruta is None else ruta
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(self.valores, archivo, ensure_ascii=False)
+
 
 def CreaTablaConteoPorcentaje(df, nomColumna, booleanNA):
     """
@@ -701,21 +1223,35 @@ def CreaTablaConteoPorcentaje(df, nomColumna, booleanNA):
 
     """
 
-    df_resultado = df[nomColumna].value_counts(dropna=booleanNA)
-    df_resultado = pd.DataFrame(data=df_resultado)
+    if familia_de_tipo(df[nomColumna].dtype) == 'categorica':
+        # columnas category: conteo directo sobre los códigos
+        return _tabla_conteo_porcentaje(cuenta_categorias(df[nomColumna], dropna=booleanNA)['conteos'])
+    return _tabla_conteo_porcentaje(df[nomColumna].value_counts(dropna=booleanNA))
 
-    #obteniendo los porcentajes
-    df_resultado['porcentaje'] = df[nomColumna].value_counts(dropna=booleanNA, normalize=True).mul(100).round(2).astype(str)+'%'
+
+def _tabla_conteo_porcentaje(conteos):
+    """
+    Arma la tabla de CreaTablaConteoPorcentaje a partir de un value_counts ya calculado.
+    """
+    #obteniendo los porcentajes (con el mismo conteo, en lugar de un segundo value_counts)
+    porcentaje = (conteos / conteos.sum()).mul(100).round(2).astype(str)+'%'
+    df_resultado = pd.DataFrame(data=conteos)
+    df_resultado['porcentaje'] = porcentaje
 
     return df_resultado
 
-def prepara_dataset(df):
+def prepara_dataset(df, memo=None, tipo_coordenadas='float64', geo_shape_diferido=False):
     """
     Esta función hace las correcciones al dataset.
 
     ==========
     * Args:
          - df: el data frame al que se le van a hacer las correcciones.
+         - memo: MemoNormalizacion opcional para no volver a estandarizar strings ya vistos.
+         - tipo_coordenadas: 'float64' (default) o 'float32' para latitud y longitud.
+         - geo_shape_diferido: si es True la columna geo_shape se quita del data frame y su texto se guarda
+           en df.attrs['geo_shape'] como GeoShapesDiferidos (un solo buffer de bytes que sólo se parsea
+           cuando se piden los polígonos).
     * Return:
          - Data Frame: entrega el data frame corregido.
     ==========
@@ -727,18 +1263,15 @@ def prepara_dataset(df):
     df.loc[df["nomgeo"].str.contains('Talpan', case = False, na = None), "nomgeo"] = 'Tlalpan'
 
     # Estandarizamos formato
-    df = EstandarizaFormato(df)
+    df = EstandarizaFormato(df, memo)
 
     # cambiamos los tipos de variable
-    df = df.astype({"bimestre":'category', "indice_des":'category', "nomgeo":'category', "alcaldia":'category',"colonia":'category', "gid":'category'})
+    with _etapa('conversion_tipos', len(df)):
+        df = df.astype({"bimestre":'category', "indice_des":'category', "nomgeo":'category', "alcaldia":'category',"colonia":'category', "gid":'category'})
 
-    # cambiamos la columna geo_point
-    new = df['geo_point'].str.split(",", n = 1, expand = True)
-    df["latitud"]= new[0]
-    df["longitud"]= new[1]
-
-    # cambiamos el tipo para latitud y longitud
-    df = df.astype({"latitud":'float64', "longitud":'float64'})
+    # cambiamos la columna geo_point a latitud y longitud
+    with _etapa('geo_point', len(df)):
+        df["latitud"], df["longitud"] = parsea_geo_point(df['geo_point'], tipo_coordenadas)
 
     # Eliminamos la columna geo_point
     #df.drop(columns =["geo_point"], inplace = True)
@@ -746,4 +1279,1126 @@ def prepara_dataset(df):
     # Eliminamos la columna geo_shape
     #df.drop(columns =["geo_shape"], inplace = True)
 
+    # Guardamos geo_shape como texto compacto para parsearlo sólo si se necesita
+    if geo_shape_diferido:
+        geo_shapes = GeoShapesDiferidos.desde_serie(df['geo_shape'])
+        df = df.drop(columns=["geo_shape"])
+        df.attrs['geo_shape'] = geo_shapes
+
     return df
+
+
+def parsea_geo_point(serie, tipo='float64'):
+    """
+    Función que convierte la columna geo_point ("latitud,longitud") en dos arreglos contiguos de
+    latitudes y longitudes. Los strings se juntan en un solo buffer y el parser de C de pd.read_csv lo
+    convierte directo a float64 (con float_precision='round_trip', que redondea igual que float()), sin
+    partir cada renglón en strings intermedios. Si algún renglón no tiene el formato esperado se usa el
+    método original (str.split + astype), así que el resultado y los errores son los mismos.
+
+    ==========
+    * Args:
+         - serie: columna geo_point.
+         - tipo: 'float64' o 'float32'.
+    * Return:
+         - latitud: arreglo de NumPy.
+         - longitud: arreglo de NumPy.
+    ==========
+    Ejemplo:
+        >>df["latitud"], df["longitud"] = parsea_geo_point(df['geo_point'])
+    """
+    valores = serie.to_numpy()
+    validos = ~pd.isna(valores)
+    latitud = np.full(len(valores), np.nan)
+    longitud = np.full(len(valores), np.nan)
+
+    try:
+        texto = '\n'.join(valores[validos])
+        # index_col=False: sin él, si todos los renglones tienen tres campos el primero se vuelve el índice
+        coordenadas = pd.read_csv(io.StringIO(texto), header=None, index_col=False, dtype='float64',
+                                  float_precision='round_trip', na_filter=False, skip_blank_lines=False,
+                                  quoting=csv.QUOTE_NONE).to_numpy()
+        renglones_correctos = coordenadas.shape == (validos.sum(), 2) and not np.isnan(coordenadas).any()
+    except (TypeError, ValueError, pd.errors.ParserError):
+        renglones_correctos = False
+
+    if renglones_correctos:
+        latitud[validos] = coordenadas[:, 0]
+        longitud[validos] = coordenadas[:, 1]
+    else:
+        new = serie.str.split(",", n = 1, expand = True).reindex(columns=[0, 1])
+        latitud = new[0].astype('float64').to_numpy()
+        longitud = new[1].astype('float64').to_numpy()
+
+    return latitud.astype(tipo, copy=False), longitud.astype(tipo, copy=False)
+
+
+class GeoShapesDiferidos:
+    """
+    Columna geo_shape guardada como un solo buffer de bytes UTF-8 con las posiciones donde empieza cada
+    renglón, en lugar de millones de strings de Python. Los polígonos se parsean (GeoJSON) sólo cuando se
+    piden. El buffer se puede guardar en disco y volver a abrir con memmap, sin leerlo completo.
+
+    ==========
+    Ejemplo:
+        >>geo_shapes = GeoShapesDiferidos.desde_serie(df['geo_shape'])
+        >>geo_shapes.guarda('../data/geo_shape')
+        >>geo_shapes = GeoShapesDiferidos.carga('../data/geo_shape')
+        >>geo_shapes.poligonos(0)
+    """
+
+    def __init__(self, datos, posiciones, nulos):
+        self.datos = datos
+        self.posiciones = posiciones
+        self.nulos = nulos
+
+    @classmethod
+    def desde_serie(cls, serie):
+        """
+        Crea el buffer a partir de la columna geo_shape (los nulos quedan marcados y sin bytes).
+        """
+        valores = serie.to_numpy()
+        nulos = pd.isna(valores)
+        codificados = [b'' if nulo else valor.encode('utf-8') for valor, nulo in zip(valores, nulos)]
+        posiciones = np.zeros(len(codificados) + 1, dtype='int64')
+        np.cumsum(np.fromiter((len(c) for c in codificados), dtype='int64', count=len(codificados)),
+                  out=posiciones[1:])
+        datos = np.frombuffer(b''.join(codificados), dtype='uint8')
+        return cls(datos, posiciones, nulos)
+
+    @classmethod
+    def carga(cls, ruta):
+        """
+        Abre un buffer guardado con guarda; los bytes se quedan en disco (memmap).
+        """
+        return cls(np.load(ruta + '_datos.npy', mmap_mode='r'), np.load(ruta + '_posiciones.npy'),
+                   np.load(ruta + '_nulos.npy'))
+
+    def guarda(self, ruta):
+        """
+        Guarda el buffer en ruta + '_datos.npy', '_posiciones.npy' y '_nulos.npy'.
+        """
+        np.save(ruta + '_datos.npy', self.datos)
+        np.save(ruta + '_posiciones.npy', self.posiciones)
+        np.save(ruta + '_nulos.npy', self.nulos)
+
+    def __len__(self):
+        return len(self.nulos)
+
+    def texto(self, i):
+        """
+        Regresa el texto original del renglón i (NaN si es nulo).
+        """
+        if self.nulos[i]:
+            return np.nan
+        return bytes(self.datos[self.posiciones[i]:self.posiciones[i + 1]]).decode('utf-8')
+
+    def poligonos(self, i):
+        """
+        Regresa los anillos del Polygon o MultiPolygon del renglón i como una lista de arreglos (n, 2) de
+        float64 (lista vacía si es nulo).
+        """
+        if self.nulos[i]:
+            return []
+        geometria = json.loads(self.texto(i))
+        poligonos = geometria['coordinates']
+        # prepara_dataset deja el tipo en minúsculas
+        if geometria['type'].lower() == 'polygon':
+            poligonos = [poligonos]
+        return [np.asarray(anillo, dtype='float64') for poligono in poligonos for anillo in poligono]
+
+    def serie(self):
+        """
+        Regresa la columna geo_shape completa como Series de strings (parsea todo el buffer).
+        """
+        return pd.Series([self.texto(i) for i in range(len(self))], name='geo_shape')
+
+
+def optimiza_tipos(df, proporcion_maxima_categorias=0.5, compacta_flotantes=True):
+    """
+    Función que reduce la memoria de un data frame: baja las enteras al entero más chico en el que caben,
+    las float64 a float32 cuando ningún valor cambia y las columnas de texto con pocos valores distintos a
+    category. Como la clasificación de variables es por familia de tipo (ver familia_de_tipo) y los
+    estadísticos se calculan con los valores en int64/float64, las numéricas se perfilan igual que antes;
+    las de texto que pasan a category se perfilan como categóricas.
+
+    ==========
+    * Args:
+         - df: el data frame a compactar (no se modifica).
+         - proporcion_maxima_categorias: una columna de texto pasa a category si sus valores distintos son a
+           lo más esta proporción del número de renglones.
+         - compacta_flotantes: si es False las float64 se dejan igual.
+    * Return:
+         - Data Frame: el data frame compactado.
+         - Data Frame: reporte por columna con tipo original, tipo nuevo, bytes antes, bytes después y bytes
+           ahorrados.
+    ==========
+    Ejemplo:
+        >>df, reporte = optimiza_tipos(df)
+        >>reporte['bytes_ahorrados'].sum()
+    """
+    df_optimizado = df.copy()
+    reporte = []
+    for col in df.columns:
+        serie = df[col]
+        familia = familia_de_tipo(serie.dtype)
+        nueva = serie
+        if familia == 'entera' and isinstance(serie.dtype, np.dtype):
+            nueva = pd.to_numeric(serie, downcast='integer')
+        elif familia == 'flotante' and serie.dtype == 'float64' and compacta_flotantes:
+            compacta = serie.astype('float32')
+            # sólo si al regresar a float64 todos los valores quedan idénticos
+            if ((compacta.astype('float64') == serie) | serie.isna()).all():
+                nueva = compacta
+        elif familia == 'texto' and len(serie) > 0:
+            if serie.nunique() <= proporcion_maxima_categorias * len(serie):
+                nueva = serie.astype('category')
+
+        if nueva is not serie:
+            df_optimizado[col] = nueva
+        bytes_antes = int(serie.memory_usage(index=False, deep=True))
+        bytes_despues = int(nueva.memory_usage(index=False, deep=True))
+        reporte.append([col, serie.dtype, nueva.dtype, bytes_antes, bytes_despues, bytes_antes - bytes_despues])
+
+    reporte = pd.DataFrame(reporte, columns=['variable', 'tipo_original', 'tipo_optimizado', 'bytes_originales',
+                                             'bytes_optimizados', 'bytes_ahorrados'])
+    return df_optimizado, reporte
+
+
+def carga_dataset_preparado(ruta_csv, directorio_cache=None, tamano_maximo_cache=2 * 1024 ** 3,
+                            tipo_coordenadas='float64', geo_shape_diferido=False, **kwargs):
+    """
+    Función que regresa pd.read_csv(ruta_csv) ya pasado por prepara_dataset, usando un cache en disco. La
+    llave es el hash del contenido del csv junto con los parámetros de la preparación y de la lectura, así
+    que si cambia el archivo o los parámetros se vuelve a preparar. El resultado se guarda en formato Arrow
+    (Feather sin compresión, con las columnas category como diccionarios) y las siguientes cargas lo abren
+    con memory map. Cuando el cache pasa de tamano_maximo_cache bytes se borran las entradas usadas hace
+    más tiempo. Requiere pyarrow.
+
+    ==========
+    * Args:
+         - ruta_csv: ruta del csv.
+         - directorio_cache: carpeta del cache (por default, la carpeta cache junto al csv).
+         - tamano_maximo_cache: tamaño máximo del cache en bytes.
+         - tipo_coordenadas, geo_shape_diferido: parámetros de prepara_dataset.
+         - kwargs: argumentos adicionales para pd.read_csv.
+    * Return:
+         - Data Frame: el data set preparado.
+    ==========
+    Ejemplo:
+        >>df = carga_dataset_preparado('../data/consumo-agua.csv')
+    """
+    from pyarrow import feather
+
+    if directorio_cache is None:
+        directorio_cache = os.path.join(os.path.dirname(os.path.abspath(ruta_csv)), 'cache')
+    os.makedirs(directorio_cache, exist_ok=True)
+
+    parametros = {'version': VERSION_PREPARACION, 'tipo_coordenadas': tipo_coordenadas,
+                  'geo_shape_diferido': geo_shape_diferido, 'read_csv': kwargs}
+    llave = hashlib.sha256((_huella_archivo(ruta_csv, directorio_cache) +
+                            json.dumps(parametros, sort_keys=True, default=str)).encode('utf-8')).hexdigest()
+    ruta_datos = os.path.join(directorio_cache, llave + '.arrow')
+    ruta_geo_shape = os.path.join(directorio_cache, llave + '_geo_shape')
+
+    if os.path.exists(ruta_datos):
+        # marcamos el uso para el orden de desalojo
+        os.utime(ruta_datos)
+        df = feather.read_table(ruta_datos, memory_map=True).to_pandas(split_blocks=True)
+        if geo_shape_diferido:
+            df.attrs['geo_shape'] = GeoShapesDiferidos.carga(ruta_geo_shape)
+        return df
+
+    df = prepara_dataset(pd.read_csv(ruta_csv, **kwargs), tipo_coordenadas=tipo_coordenadas,
+                         geo_shape_diferido=geo_shape_diferido)
+
+    # escribimos a un temporal para que una corrida interrumpida no deje una entrada a medias
+    if geo_shape_diferido:
+        df.attrs['geo_shape'].guarda(ruta_geo_shape)
+    feather.write_feather(df, ruta_datos + '.tmp', compression='uncompressed')
+    os.replace(ruta_datos + '.tmp', ruta_datos)
+
+    _desaloja_cache(directorio_cache, tamano_maximo_cache, llave)
+    return df
+
+
+def _huella_archivo(ruta, directorio_cache):
+    """
+    Función que regresa el sha256 del contenido de un archivo. Se guarda en un índice por ruta, tamaño y
+    fecha de modificación para no volver a leer el archivo completo si no ha cambiado.
+    """
+    informacion = os.stat(ruta)
+    identificador = '|'.join([os.path.abspath(ruta), str(informacion.st_size), str(informacion.st_mtime_ns)])
+    ruta_indice = os.path.join(directorio_cache, 'indice_huellas.json')
+
+    indice = {}
+    if os.path.exists(ruta_indice):
+        with open(ruta_indice, encoding='utf-8') as archivo:
+            indice = json.load(archivo)
+    if identificador in indice:
+        return indice[identificador]
+
+    huella = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for pedazo in iter(lambda: archivo.read(1 << 20), b''):
+            huella.update(pedazo)
+    indice[identificador] = huella.hexdigest()
+    with open(ruta_indice, 'w', encoding='utf-8') as archivo:
+        json.dump(indice, archivo)
+    return indice[identificador]
+
+
+def _desaloja_cache(directorio_cache, tamano_maximo, llave_actual):
+    """
+    Función que borra las entradas del cache usadas hace más tiempo hasta que el cache quede por debajo de
+    tamano_maximo bytes (la entrada que se acaba de escribir nunca se borra).
+    """
+    entradas = {}
+    for nombre in os.listdir(directorio_cache):
+        if nombre == 'indice_huellas.json' or nombre.endswith('.tmp'):
+            continue
+        llave = nombre.split('_')[0].split('.')[0]
+        ruta = os.path.join(directorio_cache, nombre)
+        tamano, ultimo_uso = entradas.get(llave, (0, 0))
+        ultimo_uso = os.path.getmtime(ruta) if nombre.endswith('.arrow') else ultimo_uso
+        entradas[llave] = (tamano + os.path.getsize(ruta), ultimo_uso)
+
+    total = sum(tamano for tamano, _ in entradas.values())
+    for llave, (tamano, _) in sorted(entradas.items(), key=lambda entrada: entrada[1][1]):
+        if total <= tamano_maximo:
+            break
+        if llave == llave_actual:
+            continue
+        for nombre in os.listdir(directorio_cache):
+            if nombre.startswith(llave):
+                os.remove(os.path.join(directorio_cache, nombre))
+        total -= tamano
+
+
+def _renglones_iguales(df_a, filas_a, df_b, filas_b, columnas):
+    """
+    Función que compara renglón contra renglón (los nulos cuentan como iguales) para confirmar que dos
+    renglones con la misma huella de verdad son iguales.
+    """
+    a = df_a[columnas].iloc[filas_a].reset_index(drop=True)
+    b = df_b[columnas].iloc[filas_b].reset_index(drop=True)
+    iguales = np.ones(len(a), dtype=bool)
+    for col in columnas:
+        valores_a, valores_b = a[col], b[col]
+        if valores_a.dtype == 'category' or valores_b.dtype == 'category':
+            valores_a, valores_b = valores_a.astype(object), valores_b.astype(object)
+        iguales &= ((valores_a == valores_b) | (valores_a.isna() & valores_b.isna())).to_numpy()
+    return iguales
+
+
+def marca_duplicados(df, columnas=None, verifica=True, contexto=None):
+    """
+    Función que regresa lo mismo que df.duplicated(subset=columnas, keep='first') usando las huellas de
+    renglón (las del contexto, si se da uno). Con verifica=True cada renglón marcado se compara contra el primero con su misma
+    huella; si alguna huella choca entre renglones distintos, ese grupo se resuelve con df.duplicated.
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - columnas: lista de columnas llave (por default, todas).
+         - verifica: si es False se confía en las huellas sin comparar los renglones.
+         - contexto: ContextoPerfilamiento opcional del data frame (guarda las huellas).
+    * Return:
+         - arreglo booleano, True en los renglones que repiten a uno anterior.
+    ==========
+    Ejemplo:
+        >>duplicados = marca_duplicados(df, ['gid', 'bimestre'])
+    """
+    columnas = list(df.columns) if columnas is None else list(columnas)
+    cache = None if contexto is None else contexto.huellas
+    codigos, unicos = pd.factorize(huellas_renglones(df, columnas, cache))
+    # posición de la primera aparición de cada huella
+    primeras = np.empty(len(unicos), dtype='int64')
+    primeras[codigos[::-1]] = np.arange(len(codigos) - 1, -1, -1)
+    duplicados = primeras[codigos] != np.arange(len(codigos))
+    if not verifica or not duplicados.any():
+        return duplicados
+
+    filas = np.flatnonzero(duplicados)
+    iguales = _renglones_iguales(df, filas, df, primeras[codigos[filas]], columnas)
+    if not iguales.all():
+        # grupos con choques: se resuelven comparando los valores completos
+        grupos = np.isin(codigos, codigos[filas[~iguales]])
+        renglones = np.flatnonzero(grupos)
+        duplicados[renglones] = df[columnas].iloc[renglones].duplicated(keep='first').to_numpy()
+    return duplicados
+
+
+def cuenta_duplicados(df, columnas=None, verifica=True, contexto=None):
+    """
+    Función que cuenta los renglones duplicados (ver marca_duplicados).
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - columnas: lista de columnas llave (por default, todas).
+         - verifica: si es False se confía en las huellas sin comparar los renglones.
+         - contexto: ContextoPerfilamiento opcional del data frame (guarda las huellas).
+    * Return:
+         - int: número de renglones que repiten a uno anterior.
+    ==========
+    Ejemplo:
+        >>numero_de_duplicados = cuenta_duplicados(df)
+    """
+    return int(marca_duplicados(df, columnas, verifica, contexto).sum())
+
+
+def compara_cargas(df_anterior, df_nuevo, columnas=None, verifica=True):
+    """
+    Función que compara dos cargas del data set (por ejemplo, dos entregas del mismo bimestre) con las
+    huellas de renglón: qué renglones de la carga nueva no estaban en la anterior y cuáles de la anterior ya
+    no vienen. Con verifica=True los renglones que coinciden por huella se comparan valor por valor.
+
+    ==========
+    * Args:
+         - df_anterior: la carga anterior.
+         - df_nuevo: la carga nueva.
+         - columnas: lista de columnas llave (por default, todas las de la carga nueva).
+         - verifica: si es False se confía en las huellas sin comparar los renglones.
+    * Return:
+         - nuevos: arreglo booleano sobre df_nuevo, True en los renglones que no estaban en df_anterior.
+         - eliminados: arreglo booleano sobre df_anterior, True en los renglones que ya no están en df_nuevo.
+    ==========
+    Ejemplo:
+        >>nuevos, eliminados = compara_cargas(df_enero, df_enero_corregido)
+        >>df_enero_corregido[nuevos]
+    """
+    columnas = list(df_nuevo.columns) if columnas is None else list(columnas)
+    huellas_anterior = huellas_renglones(df_anterior, columnas)
+    huellas_nuevo = huellas_renglones(df_nuevo, columnas)
+
+    def no_encontrados(huellas, df, huellas_otro, df_otro):
+        orden = np.argsort(huellas_otro, kind='mergesort')
+        ordenadas = huellas_otro[orden]
+        posiciones = np.minimum(np.searchsorted(ordenadas, huellas), max(len(ordenadas) - 1, 0))
+        encontrados = ordenadas[posiciones] == huellas if len(ordenadas) > 0 else np.zeros(len(huellas), bool)
+        if verifica and encontrados.any():
+            filas = np.flatnonzero(encontrados)
+            iguales = _renglones_iguales(df, filas, df_otro, orden[posiciones[filas]], columnas)
+            # con un choque, buscamos entre todos los renglones del otro lado con la misma huella
+            for fila in filas[~iguales]:
+                candidatos = np.flatnonzero(huellas_otro == huellas[fila])
+                encontrados[fila] = _renglones_iguales(df, np.repeat(fila, len(candidatos)), df_otro,
+                                                       candidatos, columnas).any()
+        return ~encontrados
+
+    return (no_encontrados(huellas_nuevo, df_nuevo, huellas_anterior, df_anterior),
+            no_encontrados(huellas_anterior, df_anterior, huellas_nuevo, df_nuevo))
+
+
+def _datos_modas(tabla_importantes, cota_error=0, numero_modas=3):
+    """
+    Función que arma las listas [moda, veces, porcentaje] del perfilamiento categórico. Si la variable tiene
+    menos categorías que modas, las modas que faltan se llenan con un texto; si los conteos son aproximados
+    se agrega la cota del error al final de cada lista.
+    """
+    datos_modas = []
+    for i in range(numero_modas):
+        if i >= len(tabla_importantes):
+            datos_modas.append("No hay moda " + str(i + 1))
+            continue
+        datos_moda = [tabla_importantes.index[i], tabla_importantes['conteo'].iloc[i],
+                      tabla_importantes['porcentaje'].iloc[i]]
+        if cota_error > 0:
+            datos_moda.append(cota_error)
+        datos_modas.append(datos_moda)
+    return datos_modas
+
+
+class PerfilPorGrupos:
+    """
+    Perfilamiento por grupo (por default alcaldia, colonia y bimestre) en una sola pasada: cada renglón se
+    traduce a un código de grupo y las métricas de todos los grupos se acumulan a la vez con np.bincount
+    (conteos, nulos, media y desviación estándar con la combinación de Chan) y con un ordenamiento por
+    (grupo, valor) para mínimos y máximos. Para las variables no numéricas se guarda el conteo de cada par
+    (grupo, valor), del que salen el número de categorías y la moda.
+
+    Los datos se pueden dar por bloques: la memoria depende del número de grupos y de pares (grupo, valor)
+    distintos, no del número de renglones. Dos perfilamientos se pueden combinar (combina).
+
+    ==========
+    Ejemplo:
+        >>perfil = PerfilPorGrupos()
+        >>for bloque in pd.read_csv('../data/consumo-agua.csv', chunksize=100000):
+        >>    perfil.actualiza(prepara_dataset(bloque))
+        >>tabla = perfil.tabla()
+    """
+
+    def __init__(self, columnas_grupo=None, columnas=None):
+        self.columnas_grupo = list(COLUMNAS_GRUPO if columnas_grupo is None else columnas_grupo)
+        self.columnas_pedidas = None if columnas is None else list(columnas)
+        self.columnas = []
+        self.familias = {}
+        self.claves = []
+        self.ids = {}
+        self.renglones = np.zeros(0, dtype='int64')
+        self.conteos = {}
+        self.medias = {}
+        self.m2 = {}
+        self.minimos = {}
+        self.maximos = {}
+        self.valores = {}
+        self.frecuencias = {}
+
+    def actualiza(self, df):
+        """
+        Agrega un bloque (data frame) al perfilamiento.
+        """
+        return self.combina(self._perfil_de_bloque(df))
+
+    def _perfil_de_bloque(self, df):
+        parcial = PerfilPorGrupos(self.columnas_grupo, self.columnas_pedidas)
+        if self.columnas_pedidas is None:
+            parcial.columnas = [col for col in df.columns if col not in self.columnas_grupo]
+        else:
+            parcial.columnas = list(self.columnas_pedidas)
+        parcial.familias = dict(self.familias)
+        for col in parcial.columnas:
+            if col not in parcial.familias:
+                familia = familia_de_tipo(df[col].dtype)
+                parcial.familias[col] = 'numerica' if familia in FAMILIAS_NUMERICAS else familia
+
+        # Código de grupo de cada renglón: se combinan los códigos de cada llave (el nulo es el código 0,
+        # así que forma su propio grupo) y se vuelven a numerar en orden de aparición
+        combinado = np.zeros(len(df), dtype='int64')
+        for col in self.columnas_grupo:
+            codigos_llave, unicos = pd.factorize(df[col])
+            combinado = combinado * (len(unicos) + 1) + codigos_llave + 1
+        codigos, _ = pd.factorize(combinado)
+        primeros = np.unique(codigos, return_index=True)[1]
+        parcial.claves = list(df[self.columnas_grupo].iloc[primeros].itertuples(index=False, name=None))
+        parcial.ids = {_clave_de_grupo(clave): i for i, clave in enumerate(parcial.claves)}
+        numero_grupos = len(parcial.claves)
+        parcial.renglones = np.bincount(codigos, minlength=numero_grupos).astype('int64')
+
+        for col in parcial.columnas:
+            if parcial.familias[col] == 'numerica':
+                valores = df[col].to_numpy(dtype='float64', na_value=np.nan)
+                validos = ~np.isnan(valores)
+                codigos_validos = codigos[validos]
+                valores = valores[validos]
+                conteo = np.bincount(codigos_validos, minlength=numero_grupos)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    media = np.bincount(codigos_validos, weights=valores, minlength=numero_grupos) / conteo
+                desviaciones = valores - media[codigos_validos]
+                parcial.m2[col] = np.bincount(codigos_validos, weights=desviaciones * desviaciones,
+                                              minlength=numero_grupos)
+                parcial.medias[col] = media
+
+                # Extremos: ordenando por (grupo, valor) el primero de cada grupo es el mínimo y el último el máximo
+                orden = np.lexsort((valores, codigos_validos))
+                codigos_ordenados = codigos_validos[orden]
+                grupos, primeros = np.unique(codigos_ordenados, return_index=True)
+                ultimos = np.append(primeros[1:], len(orden)) - 1
+                minimos = np.full(numero_grupos, np.nan)
+                maximos = np.full(numero_grupos, np.nan)
+                minimos[grupos] = valores[orden[primeros]]
+                maximos[grupos] = valores[orden[ultimos]]
+                parcial.minimos[col] = minimos
+                parcial.maximos[col] = maximos
+            else:
+                codigos_valor, unicos = pd.factorize(df[col])
+                validos = codigos_valor >= 0
+                codigos_validos = codigos[validos]
+                conteo = np.bincount(codigos_validos, minlength=numero_grupos)
+                pares = (codigos_validos.astype('int64') << 32) | codigos_valor[validos].astype('int64')
+                parcial.valores[col] = list(unicos)
+                parcial.frecuencias[col] = pd.Series(pares).value_counts(sort=False)
+            parcial.conteos[col] = conteo.astype('int64')
+        return parcial
+
+    def combina(self, otro):
+        """
+        Combina este perfilamiento con otro (de otro bloque o de otro proceso) con las mismas columnas de grupo.
+        """
+        for col in otro.columnas:
+            if col not in self.familias:
+                self.columnas.append(col)
+                self.familias[col] = otro.familias[col]
+
+        # Posición en este perfilamiento de cada grupo del otro (los grupos nuevos se agregan al final)
+        posiciones = np.empty(len(otro.claves), dtype='int64')
+        for i, clave in enumerate(otro.claves):
+            llave = _clave_de_grupo(clave)
+            if llave not in self.ids:
+                self.ids[llave] = len(self.claves)
+                self.claves.append(clave)
+            posiciones[i] = self.ids[llave]
+        numero_grupos = len(self.claves)
+
+        self.renglones = _extiende(self.renglones, numero_grupos, 0)
+        np.add.at(self.renglones, posiciones, otro.renglones)
+        for col in otro.columnas:
+            conteo = _extiende(self.conteos.get(col, np.zeros(0, dtype='int64')), numero_grupos, 0)
+            conteo_otro = np.zeros(numero_grupos, dtype='int64')
+            conteo_otro[posiciones] = otro.conteos[col]
+
+            if self.familias[col] == 'numerica':
+                media = _extiende(self.medias.get(col, np.zeros(0)), numero_grupos, np.nan)
+                m2 = _extiende(self.m2.get(col, np.zeros(0)), numero_grupos, 0.0)
+                media_otro = np.full(numero_grupos, np.nan)
+                m2_otro = np.zeros(numero_grupos)
+                media_otro[posiciones] = otro.medias[col]
+                m2_otro[posiciones] = otro.m2[col]
+
+                # Combinación de Chan: media y suma de cuadrados de las desviaciones de la unión
+                total = conteo + conteo_otro
+                con_datos = total > 0
+                media_nueva = np.where(conteo_otro == 0, media, media_otro)
+                ambos = (conteo > 0) & (conteo_otro > 0)
+                delta = media_otro[ambos] - media[ambos]
+                media_nueva[ambos] = media[ambos] + delta * conteo_otro[ambos] / total[ambos]
+                m2_nuevo = np.where(con_datos, m2 + m2_otro, 0.0)
+                m2_nuevo[ambos] += delta * delta * conteo[ambos] * conteo_otro[ambos] / total[ambos]
+                self.medias[col] = media_nueva
+                self.m2[col] = m2_nuevo
+
+                minimos = _extiende(self.minimos.get(col, np.zeros(0)), numero_grupos, np.nan)
+                maximos = _extiende(self.maximos.get(col, np.zeros(0)), numero_grupos, np.nan)
+                minimos[posiciones] = np.fmin(minimos[posiciones], otro.minimos[col])
+                maximos[posiciones] = np.fmax(maximos[posiciones], otro.maximos[col])
+                self.minimos[col] = minimos
+                self.maximos[col] = maximos
+            else:
+                # Los valores del otro se traducen al diccionario de valores de éste
+                codigos_valor = _codigos_en_diccionario(self.valores.setdefault(col, []), otro.valores[col])
+
+                pares_otro = otro.frecuencias[col].index.to_numpy(dtype='int64')
+                pares_otro = (posiciones[pares_otro >> 32] << 32) | codigos_valor[pares_otro & 0xFFFFFFFF]
+                frecuencias_otro = pd.Series(otro.frecuencias[col].to_numpy(), index=pares_otro)
+                if col in self.frecuencias:
+                    frecuencias_otro = pd.concat([self.frecuencias[col], frecuencias_otro])
+                    frecuencias_otro = frecuencias_otro.groupby(level=0, sort=False).sum()
+                self.frecuencias[col] = frecuencias_otro
+            self.conteos[col] = conteo + conteo_otro
+        return self
+
+    def tabla(self):
+        """
+        Regresa el perfilamiento en formato largo: un renglón por (grupo, variable, métrica), con índice
+        columnas_grupo + ['variable', 'metrica'] y la columna valor. Los grupos van ordenados por sus llaves.
+        """
+        numero_grupos = len(self.claves)
+        llaves = pd.DataFrame(self.claves, columns=self.columnas_grupo)
+        orden = llaves.sort_values(self.columnas_grupo, kind='mergesort').index.to_numpy()
+
+        bloques = []
+        variables = []
+        metricas = []
+        for col in self.columnas:
+            nulos = self.renglones - self.conteos[col]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                por_nulos = nulos / self.renglones
+            datos = [self.renglones, nulos, por_nulos]
+            if self.familias[col] == 'numerica':
+                lista_metricas = LISTA_PERFILAMIENTO_GRUPO_NUMERICO
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    desviacion = np.sqrt(self.m2[col] / (self.conteos[col] - 1))
+                desviacion[self.conteos[col] < 2] = np.nan
+                datos += [np.round(self.medias[col], 2), np.round(desviacion, 2),
+                          np.round(self.minimos[col], 2), np.round(self.maximos[col], 2)]
+            else:
+                lista_metricas = LISTA_PERFILAMIENTO_GRUPO_CATEGORICO
+                frecuencias = self.frecuencias[col]
+                pares = frecuencias.index.to_numpy(dtype='int64')
+                grupos = pares >> 32
+                codigos_valor = pares & 0xFFFFFFFF
+                categorias = np.bincount(grupos, minlength=numero_grupos)
+
+                # Moda: el valor más frecuente del grupo; en un empate, el que apareció primero en los datos
+                orden_pares = np.lexsort((codigos_valor, -frecuencias.to_numpy(), grupos))
+                grupos_moda, primeros = np.unique(grupos[orden_pares], return_index=True)
+                moda = np.full(numero_grupos, np.nan, dtype='object')
+                veces = np.zeros(numero_grupos, dtype='int64')
+                valores = np.array(self.valores[col] + [None], dtype='object')[:-1]
+                moda[grupos_moda] = valores[codigos_valor[orden_pares[primeros]]]
+                veces[grupos_moda] = frecuencias.to_numpy()[orden_pares[primeros]]
+                datos += [categorias, moda, veces]
+            bloques.append(np.column_stack([np.asarray(dato, dtype='object') for dato in datos]))
+            variables += [col] * len(lista_metricas)
+            metricas += lista_metricas
+
+        if len(bloques) == 0:
+            valores = np.empty((numero_grupos, 0), dtype='object')
+        else:
+            valores = np.hstack(bloques)[orden]
+        numero_metricas = len(metricas)
+        niveles = [np.repeat(llaves[col].to_numpy()[orden], numero_metricas) for col in self.columnas_grupo]
+        niveles += [np.tile(np.array(variables, dtype='object'), numero_grupos),
+                    np.tile(np.array(metricas, dtype='object'), numero_grupos)]
+        indice = pd.MultiIndex.from_arrays(niveles, names=self.columnas_grupo + ['variable', 'metrica'])
+        return pd.DataFrame({'valor': valores.reshape(-1)}, index=indice)
+
+
+def _clave_de_grupo(clave):
+    """
+    Llave de diccionario de un grupo: los nulos (NaN, None, NaT) se cambian por None para que sean iguales entre sí.
+    """
+    return tuple(None if pd.isna(valor) else valor for valor in clave)
+
+
+def genera_profiling_por_grupos(df, columnas_grupo=None, columnas=None, tamano_bloque=None):
+    """
+    Función que genera el perfilamiento de cada grupo (por default alcaldia, colonia y bimestre) en una sola
+    pasada, en lugar de filtrar el data frame por grupo y perfilar cada pedazo. Para las variables numéricas
+    se calculan observaciones, nulos, media, desviación estándar, mínimo y máximo; para las demás,
+    observaciones, nulos, número de categorías y la moda con sus veces.
+
+    ==========
+    * Args:
+         - df: el data frame, o un iterable de data frames (por ejemplo pd.read_csv(..., chunksize=...)).
+         - columnas_grupo: columnas que definen los grupos (default COLUMNAS_GRUPO).
+         - columnas: variables a perfilar (default todas las que no son de grupo).
+         - tamano_bloque: si se indica y df es un data frame, se procesa en bloques de ese número de renglones
+           para acotar la memoria temporal.
+    * Return:
+         - Data Frame: perfilamiento en formato largo, con índice columnas_grupo + ['variable', 'metrica'] y la
+           columna valor.
+    ==========
+    Ejemplo:
+        >>tabla = genera_profiling_por_grupos(df)
+        >>tabla.loc[('iztapalapa', 'santa cruz meyehualco', 1)]
+
+        # Una columna por métrica
+        >>tabla['valor'].unstack('metrica')
+    """
+    perfil = PerfilPorGrupos(columnas_grupo, columnas)
+    if isinstance(df, pd.DataFrame):
+        if tamano_bloque is None:
+            bloques = [df]
+        else:
+            bloques = (df.iloc[inicio:inicio + tamano_bloque] for inicio in range(0, len(df), tamano_bloque))
+    else:
+        bloques = df
+    for bloque in bloques:
+        perfil.actualiza(bloque)
+    return perfil.tabla()
+
+
+def mascara_ceros(df, columnas_consumo=None):
+    """
+    Función que regresa la máscara de los renglones en los que la suma de las variables de consumo es cero
+    (como en el notebook Analisis_ceros, los nulos no suman).
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - columnas_consumo: variables de consumo (default las columnas que empiezan con 'consumo_').
+    * Return:
+         - arreglo booleano de NumPy con un elemento por renglón.
+    ==========
+    Ejemplo:
+        >>proporcion_ceros = mascara_ceros(agua).mean()
+    """
+    if columnas_consumo is None:
+        columnas_consumo = [col for col in df.columns if str(col).startswith('consumo_')]
+    return (df[list(columnas_consumo)].sum(axis=1) == 0).to_numpy()
+
+
+class AnalisisCeros:
+    """
+    Análisis de los renglones con consumo cero (ver mascara_ceros) por variable categórica y por pares de
+    variables (por ejemplo colonia×alcaldía). La máscara se calcula una vez por bloque y cada variable se
+    traduce una sola vez a códigos enteros; los renglones y los ceros de cada categoría salen de dos
+    np.bincount sobre esos códigos, y los de cada par de un código combinado, en lugar de un pd.crosstab por
+    variable sobre el data frame filtrado. Los datos se pueden dar por bloques y dos análisis se pueden
+    combinar.
+
+    ==========
+    Ejemplo:
+        >>analisis = AnalisisCeros()
+        >>for bloque in pd.read_csv('../data/consumo-agua.csv', chunksize=100000):
+        >>    analisis.actualiza(prepara_dataset(bloque))
+        >>analisis.tabla('alcaldia').head()
+        >>analisis.tabla_par('colonia', 'alcaldia')['ceros'].unstack(fill_value=0)
+    """
+
+    def __init__(self, columnas=None, pares=None, columnas_consumo=None):
+        self.columnas = list(VARIABLES_CATEGORICAS_CEROS if columnas is None else columnas)
+        self.pares = [tuple(par) for par in (PARES_CEROS if pares is None else pares)]
+        self.columnas_consumo = columnas_consumo
+        self.renglones = 0
+        self.ceros = 0
+        self.valores = {col: [] for col in self._columnas_usadas()}
+        self.conteos = {col: np.zeros((2, 0), dtype='int64') for col in self.columnas}
+        self.conteos_pares = {par: pd.DataFrame({'renglones': [], 'ceros': []}, dtype='int64')
+                              for par in self.pares}
+
+    def _columnas_usadas(self):
+        columnas = list(self.columnas)
+        for par in self.pares:
+            columnas += [col for col in par if col not in columnas]
+        return columnas
+
+    def actualiza(self, df):
+        """
+        Agrega un bloque (data frame) al análisis.
+        """
+        ceros = mascara_ceros(df, self.columnas_consumo)
+
+        # Códigos en el diccionario de cada variable (-1 para los nulos, que no se cuentan)
+        codigos = {}
+        for col in self.valores:
+            codigos_bloque, unicos = pd.factorize(df[col])
+            traduccion = _codigos_en_diccionario(self.valores[col], list(unicos))
+            codigos[col] = np.where(codigos_bloque >= 0, traduccion[codigos_bloque], -1)
+
+        for col in self.columnas:
+            validos = codigos[col] >= 0
+            numero_valores = len(self.valores[col])
+            conteos = np.zeros((2, numero_valores), dtype='int64')
+            conteos[:, :self.conteos[col].shape[1]] = self.conteos[col]
+            conteos[0] += np.bincount(codigos[col][validos], minlength=numero_valores)
+            conteos[1] += np.bincount(codigos[col][validos & ceros], minlength=numero_valores)
+            self.conteos[col] = conteos
+
+        for par in self.pares:
+            validos = (codigos[par[0]] >= 0) & (codigos[par[1]] >= 0)
+            combinados = (codigos[par[0]][validos].astype('int64') << 32) | codigos[par[1]][validos]
+            codigos_par, unicos_par = pd.factorize(combinados)
+            bloque = pd.DataFrame({'renglones': np.bincount(codigos_par, minlength=len(unicos_par)),
+                                   'ceros': np.bincount(codigos_par[ceros[validos]], minlength=len(unicos_par))},
+                                  index=unicos_par)
+            self._suma_par(par, bloque)
+
+        self.renglones += len(df)
+        self.ceros += int(ceros.sum())
+        return self
+
+    def _suma_par(self, par, bloque):
+        conteos = pd.concat([self.conteos_pares[par], bloque])
+        self.conteos_pares[par] = conteos.groupby(level=0, sort=False).sum().astype('int64')
+
+    def combina(self, otro):
+        """
+        Combina este análisis con otro (de otro bloque o de otro proceso) con las mismas variables.
+        """
+        traducciones = {col: _codigos_en_diccionario(self.valores[col], otro.valores[col])
+                        for col in self.valores}
+        for col in self.columnas:
+            numero_valores = len(self.valores[col])
+            conteos = np.zeros((2, numero_valores), dtype='int64')
+            conteos[:, :self.conteos[col].shape[1]] = self.conteos[col]
+            conteos[:, traducciones[col]] += otro.conteos[col]
+            self.conteos[col] = conteos
+        for par in self.pares:
+            bloque = otro.conteos_pares[par]
+            codigos = bloque.index.to_numpy(dtype='int64')
+            codigos = (traducciones[par[0]][codigos >> 32] << 32) | traducciones[par[1]][codigos & 0xFFFFFFFF]
+            self._suma_par(par, bloque.set_axis(codigos, axis=0))
+        self.renglones += otro.renglones
+        self.ceros += otro.ceros
+        return self
+
+    def proporcion(self):
+        """
+        Regresa la proporción de renglones con consumo cero.
+        """
+        return self.ceros / self.renglones
+
+    def tabla(self, col):
+        """
+        Regresa, para cada categoría de col, los renglones, los renglones con consumo cero y la tasa de ceros,
+        ordenada de más a menos ceros (en un empate, en orden de aparición).
+        """
+        renglones, ceros = self.conteos[col]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tasa = ceros / renglones
+        tabla = pd.DataFrame({'renglones': renglones, 'ceros': ceros, 'tasa_ceros': tasa},
+                             index=pd.Index(self.valores[col], dtype='object', name=col))
+        return tabla.sort_values('ceros', ascending=False, kind='mergesort')
+
+    def tabla_par(self, col_a, col_b):
+        """
+        Regresa la tabla de tabla() para cada combinación observada de (col_a, col_b), con índice de dos
+        niveles. Con ['ceros'].unstack(fill_value=0) queda igual que pd.crosstab sobre los renglones en cero.
+        """
+        conteos = self.conteos_pares[(col_a, col_b)]
+        codigos = conteos.index.to_numpy(dtype='int64')
+        valores_a = np.array(self.valores[col_a] + [None], dtype='object')[:-1]
+        valores_b = np.array(self.valores[col_b] + [None], dtype='object')[:-1]
+        indice = pd.MultiIndex.from_arrays([valores_a[codigos >> 32], valores_b[codigos & 0xFFFFFFFF]],
+                                           names=[col_a, col_b])
+        tabla = pd.DataFrame({'renglones': conteos['renglones'].to_numpy(),
+                              'ceros': conteos['ceros'].to_numpy()}, index=indice)
+        tabla['tasa_ceros'] = tabla['ceros'] / tabla['renglones']
+        return tabla.sort_values('ceros', ascending=False, kind='mergesort')
+
+
+def analiza_ceros(df, columnas=None, pares=None, columnas_consumo=None, tamano_bloque=None):
+    """
+    Función que calcula la proporción de renglones con consumo cero y las tasas de ceros por cada variable
+    categórica y por cada par de variables, en una sola pasada (ver AnalisisCeros).
+
+    ==========
+    * Args:
+         - df: el data frame, o un iterable de data frames (por ejemplo pd.read_csv(..., chunksize=...)).
+         - columnas: variables categóricas (default VARIABLES_CATEGORICAS_CEROS).
+         - pares: pares de variables (default PARES_CEROS).
+         - columnas_consumo: variables de consumo (default las columnas que empiezan con 'consumo_').
+         - tamano_bloque: si se indica y df es un data frame, se procesa en bloques de ese número de renglones.
+    * Return:
+         - proporcion_ceros: proporción de renglones con consumo cero.
+         - tablas: diccionario variable -> tabla con renglones, ceros y tasa_ceros por categoría.
+         - tablas_pares: diccionario (variable_a, variable_b) -> la misma tabla por combinación.
+    ==========
+    Ejemplo:
+        >>proporcion_ceros, tablas, tablas_pares = analiza_ceros(agua)
+        >>tablas['alcaldia'].head()
+        >>tablas_pares[('colonia', 'alcaldia')]['ceros'].unstack(fill_value=0)
+    """
+    analisis = AnalisisCeros(columnas, pares, columnas_consumo)
+    if isinstance(df, pd.DataFrame):
+        if tamano_bloque is None:
+            bloques = [df]
+        else:
+            bloques = (df.iloc[inicio:inicio + tamano_bloque] for inicio in range(0, len(df), tamano_bloque))
+    else:
+        bloques = df
+    for bloque in bloques:
+        analisis.actualiza(bloque)
+
+    tablas = {col: analisis.tabla(col) for col in analisis.columnas}
+    tablas_pares = {par: analisis.tabla_par(*par) for par in analisis.pares}
+    return analisis.proporcion(), tablas, tablas_pares
+
+
+def _intermedio_conteo_valores(serie, calculados):
+    familia = familia_de_tipo(serie.dtype)
+    if familia == 'categorica':
+        return cuenta_categorias(serie)['conteos']
+    if familia in FAMILIAS_NUMERICAS:
+        # igual que el top de repetidos de calcula_estadisticos_numericos
+        codigos, valores_unicos = pd.factorize(valores_numericos_canonicos(serie))
+        veces = np.bincount(codigos[codigos >= 0], minlength=len(valores_unicos))
+        return pd.Series(veces, index=valores_unicos).sort_values(ascending=False, kind='stable')
+    return serie.value_counts(dropna=True)
+
+
+def _cuantil_ordenado(ordenados, q):
+    # interpolación lineal sobre un arreglo ya ordenado (igual que np.percentile)
+    if len(ordenados) == 0:
+        return np.nan
+    posicion = (len(ordenados) - 1) * q
+    abajo = int(np.floor(posicion))
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+def _primero(conteos, valor):
+    conteos = conteos[conteos > 0]
+    if len(conteos) == 0:
+        return np.nan
+    return conteos.index[0] if valor else conteos.iloc[0]
+
+
+# Resultados intermedios por columna: (intermedios de los que depende, función(serie, calculados))
+INTERMEDIOS_PERFILAMIENTO = {
+    'mascara_nulos': ([], lambda serie, calculados: serie.isna().to_numpy()),
+    'valores': ([], lambda serie, calculados: serie.to_numpy(dtype='float64', na_value=np.nan)),
+    'no_nulos': (['valores', 'mascara_nulos'],
+                 lambda serie, calculados: calculados['valores'][~calculados['mascara_nulos']]),
+    'ordenados': (['no_nulos'], lambda serie, calculados: np.sort(calculados['no_nulos'])),
+    'conteo_valores': ([], _intermedio_conteo_valores),
+    'longitudes': ([], lambda serie, calculados: serie.str.len()),
+}
+
+# Métricas: (familias a las que aplica o None para todas, intermedios que usa, función(calculados))
+METRICAS_PERFILAMIENTO = {
+    'nulos': (None, ['mascara_nulos'], lambda c: np.int64(c['mascara_nulos'].sum())),
+    'proporcion_nulos': (None, ['mascara_nulos'], lambda c: c['mascara_nulos'].mean()),
+    'conteo': (None, ['mascara_nulos'], lambda c: np.int64((~c['mascara_nulos']).sum())),
+    'media': (['numericas'], ['no_nulos'], lambda c: c['no_nulos'].mean() if len(c['no_nulos']) else np.nan),
+    'desviacion': (['numericas'], ['no_nulos'],
+                   lambda c: c['no_nulos'].std(ddof=1) if len(c['no_nulos']) > 1 else np.nan),
+    'minimo': (['numericas'], ['ordenados'], lambda c: _cuantil_ordenado(c['ordenados'], 0)),
+    'cuartil_25': (['numericas'], ['ordenados'], lambda c: _cuantil_ordenado(c['ordenados'], 0.25)),
+    'mediana': (['numericas'], ['ordenados'], lambda c: _cuantil_ordenado(c['ordenados'], 0.5)),
+    'cuartil_75': (['numericas'], ['ordenados'], lambda c: _cuantil_ordenado(c['ordenados'], 0.75)),
+    'maximo': (['numericas'], ['ordenados'], lambda c: _cuantil_ordenado(c['ordenados'], 1)),
+    'unicos': (None, ['conteo_valores'], lambda c: int((c['conteo_valores'] > 0).sum())),
+    'moda': (None, ['conteo_valores'], lambda c: _primero(c['conteo_valores'], True)),
+    'veces_moda': (None, ['conteo_valores'], lambda c: _primero(c['conteo_valores'], False)),
+    'top5': (None, ['conteo_valores'], lambda c: c['conteo_valores'].head(5)),
+    'longitud_promedio': (['texto'], ['longitudes'], lambda c: c['longitudes'].mean()),
+    'longitud_minima': (['texto'], ['longitudes'], lambda c: c['longitudes'].min()),
+    'longitud_maxima': (['texto'], ['longitudes'], lambda c: c['longitudes'].max()),
+}
+
+SECCIONES_PERFILAMIENTO = ['numericas', 'categoricas', 'texto', 'otras']
+
+
+def _seccion_de_tipo(tipo):
+    familia = familia_de_tipo(tipo)
+    if familia in FAMILIAS_NUMERICAS:
+        return 'numericas'
+    if familia == 'categorica':
+        return 'categoricas'
+    if familia == 'texto':
+        return 'texto'
+    return 'otras'
+
+
+class PlanPerfilamiento:
+    """
+    Plan de cálculo de un reporte con sólo las métricas y columnas pedidas: para cada columna se juntan los
+    intermedios que necesitan sus métricas (máscara de nulos, valores, arreglo ordenado, conteo de valores,
+    longitudes) con sus dependencias, sin repetir, y en orden. Cada intermedio se calcula una sola vez y lo
+    usan todas las métricas que lo necesitan; por ejemplo, mínimo, cuartiles, mediana y máximo salen del
+    mismo arreglo ordenado. Las secciones del reporte se calculan hasta que se piden.
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - metricas: lista de métricas de METRICAS_PERFILAMIENTO (default todas).
+         - columnas: lista de columnas (default todas).
+    ==========
+    Ejemplo:
+        >>plan = PlanPerfilamiento(df, ['proporcion_nulos', 'media'])
+        >>plan.pasos()
+        >>reporte = plan.reporte()
+        >>reporte['numericas']
+    """
+
+    def __init__(self, df, metricas=None, columnas=None):
+        metricas = list(METRICAS_PERFILAMIENTO) if metricas is None else list(metricas)
+        desconocidas = [metrica for metrica in metricas if metrica not in METRICAS_PERFILAMIENTO]
+        if desconocidas:
+            raise ValueError('Métricas desconocidas: ' + ', '.join(map(str, desconocidas)))
+        self.df = df
+        self.metricas = metricas
+        self.columnas = list(df.columns) if columnas is None else list(columnas)
+
+        # Sección, métricas e intermedios (en orden de cálculo) de cada columna
+        self.seccion = {col: _seccion_de_tipo(df[col].dtype) for col in self.columnas}
+        self.metricas_columna = {}
+        self.intermedios_columna = {}
+        for col in self.columnas:
+            aplicables = [metrica for metrica in metricas if METRICAS_PERFILAMIENTO[metrica][0] is None
+                          or self.seccion[col] in METRICAS_PERFILAMIENTO[metrica][0]]
+            intermedios = []
+            for metrica in aplicables:
+                for intermedio in METRICAS_PERFILAMIENTO[metrica][1]:
+                    _agrega_intermedio(intermedio, intermedios)
+            self.metricas_columna[col] = aplicables
+            self.intermedios_columna[col] = intermedios
+
+    def pasos(self):
+        """
+        Regresa el plan como data frame: un renglón por (columna, intermedio) en el orden en que se calculan,
+        con las métricas que lo usan.
+        """
+        renglones = []
+        for col in self.columnas:
+            for intermedio in self.intermedios_columna[col]:
+                usan = [metrica for metrica in self.metricas_columna[col]
+                        if intermedio in _con_dependencias(METRICAS_PERFILAMIENTO[metrica][1])]
+                renglones.append([self.seccion[col], col, intermedio, usan])
+        return pd.DataFrame(renglones, columns=['seccion', 'columna', 'intermedio', 'metricas'])
+
+    def calcula_columna(self, col):
+        """
+        Calcula los intermedios y las métricas de una columna y regresa las métricas (los intermedios se
+        descartan al terminar, así que la memoria es la de una columna a la vez).
+        """
+        serie = self.df[col]
+        calculados = {}
+        for intermedio in self.intermedios_columna[col]:
+            with _etapa('intermedio_' + intermedio, len(serie), col):
+                calculados[intermedio] = INTERMEDIOS_PERFILAMIENTO[intermedio][1](serie, calculados)
+        return [METRICAS_PERFILAMIENTO[metrica][2](calculados) for metrica in self.metricas_columna[col]]
+
+    def reporte(self):
+        """
+        Regresa el ReportePerfilamiento (perezoso) de este plan.
+        """
+        return ReportePerfilamiento(self)
+
+
+def _agrega_intermedio(intermedio, intermedios):
+    # agrega primero las dependencias, sin repetir
+    for dependencia in INTERMEDIOS_PERFILAMIENTO[intermedio][0]:
+        _agrega_intermedio(dependencia, intermedios)
+    if intermedio not in intermedios:
+        intermedios.append(intermedio)
+
+
+def _con_dependencias(intermedios):
+    lista = []
+    for intermedio in intermedios:
+        _agrega_intermedio(intermedio, lista)
+    return lista
+
+
+class ReportePerfilamiento:
+    """
+    Reporte de un PlanPerfilamiento: cada sección (numericas, categoricas, texto, otras) es un data frame con
+    la columna metrica y una columna por variable, como las tablas de genera_profiling_por_variable, y se
+    calcula la primera vez que se pide.
+
+    ==========
+    Ejemplo:
+        >>reporte = genera_reporte(df, ['proporcion_nulos', 'media'])
+        >>reporte.secciones()
+        >>reporte['numericas']
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self._calculadas = {}
+
+    def secciones(self):
+        """
+        Regresa las secciones que tienen al menos una columna con métricas.
+        """
+        return [seccion for seccion in SECCIONES_PERFILAMIENTO
+                if any(self.plan.seccion[col] == seccion and self.plan.metricas_columna[col]
+                       for col in self.plan.columnas)]
+
+    def __getitem__(self, seccion):
+        if seccion not in SECCIONES_PERFILAMIENTO:
+            raise KeyError(seccion)
+        if seccion not in self._calculadas:
+            columnas = [col for col in self.plan.columnas
+                        if self.plan.seccion[col] == seccion and self.plan.metricas_columna[col]]
+            metricas = [metrica for metrica in self.plan.metricas
+                        if any(metrica in self.plan.metricas_columna[col] for col in columnas)]
+            tabla = pd.DataFrame(data={'metrica': metricas})
+            for col in columnas:
+                valores = dict(zip(self.plan.metricas_columna[col], self.plan.calcula_columna(col)))
+                tabla[col] = [valores.get(metrica, np.nan) for metrica in metricas]
+            self._calculadas[seccion] = tabla
+        return self._calculadas[seccion]
+
+    def calcula_todo(self):
+        """
+        Calcula todas las secciones y las regresa en un diccionario.
+        """
+        return {seccion: self[seccion] for seccion in self.secciones()}
+
+
+def genera_reporte(df, metricas=None, columnas=None):
+    """
+    Función que arma el reporte de perfilamiento sólo con las métricas y columnas pedidas (ver
+    PlanPerfilamiento). El cálculo se hace hasta que se pide cada sección, y sólo de lo necesario: pedir
+    únicamente proporcion_nulos recorre cada columna una vez para su máscara de nulos.
+
+    ==========
+    * Args:
+         - df: el data frame.
+         - metricas: lista de métricas de METRICAS_PERFILAMIENTO (default todas).
+         - columnas: lista de columnas (default todas).
+    * Return:
+         - ReportePerfilamiento: reporte perezoso; reporte[seccion] regresa la tabla de la sección.
+    ==========
+    Ejemplo:
+        >>reporte = genera_reporte(df, ['proporcion_nulos', 'media'], ['consumo_total', 'colonia'])
+        >>reporte['numericas']
+        >>reporte.plan.pasos()
+    """
+    return PlanPerfilamiento(df, metricas, columnas).reporte()
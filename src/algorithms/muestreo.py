@@ -0,0 +1,257 @@
+"""
+Perfilamiento estimado a partir de una muestra estratificada, con intervalos de confianza.
+"""
+import statistics
+import pandas as pd
+import numpy as np
+
+from .base import ContextoPerfilamiento, _codigos_en_diccionario, _extiende, separa_variables_por_tipo
+
+
+class MuestraEstratificada:
+    """
+    Muestra aleatoria sin reemplazo de hasta tamano_por_estrato renglones por cada valor de columna_estrato
+    (por ejemplo alcaldia o bimestre), construida por bloques: a cada renglón se le asigna una prioridad
+    aleatoria y en cada estrato se quedan las menores (muestreo de reservorio por prioridades), así que el
+    costo por bloque es lineal y la memoria sólo depende del tamaño de la muestra. Se guarda también el número
+    total de renglones de cada estrato para escalar las estimaciones al data set completo.
+
+    ==========
+    Ejemplo:
+        >>muestra = MuestraEstratificada('alcaldia', 2000)
+        >>for bloque in pd.read_csv('../data/consumo-agua.csv', chunksize=100000):
+        >>    muestra.actualiza(prepara_dataset(bloque))
+        >>numericas, nulos, categoricas = muestra.estimaciones()
+    """
+
+    def __init__(self, columna_estrato, tamano_por_estrato=1000, semilla=0):
+        self.columna_estrato = columna_estrato
+        self.tamano_por_estrato = tamano_por_estrato
+        self.generador = np.random.default_rng(semilla)
+        self.valores_estrato = []
+        self.renglones_estrato = np.zeros(0, dtype='int64')
+        self.muestra = None
+        self.estratos = np.zeros(0, dtype='int64')
+        self.prioridades = np.zeros(0)
+
+    def actualiza(self, df):
+        """
+        Agrega un bloque (data frame) a la muestra.
+        """
+        codigos, unicos = pd.factorize(df[self.columna_estrato])
+        unicos = list(unicos)
+        if (codigos < 0).any():
+            # los nulos forman su propio estrato
+            codigos = np.where(codigos < 0, len(unicos), codigos)
+            unicos.append(np.nan)
+        estratos = _codigos_en_diccionario(self.valores_estrato, unicos)[codigos]
+        numero_estratos = len(self.valores_estrato)
+        self.renglones_estrato = _extiende(self.renglones_estrato, numero_estratos, 0)
+        self.renglones_estrato += np.bincount(estratos, minlength=numero_estratos)
+
+        # Primero se eligen los candidatos del bloque y luego se mezclan con la muestra anterior
+        prioridades = self.generador.random(len(df))
+        elegidos = _menores_por_estrato(estratos, prioridades, self.tamano_por_estrato)
+        candidatos = df.iloc[elegidos]
+        if self.muestra is not None:
+            candidatos = pd.concat([self.muestra, candidatos])
+        estratos = np.concatenate([self.estratos, estratos[elegidos]])
+        prioridades = np.concatenate([self.prioridades, prioridades[elegidos]])
+        elegidos = _menores_por_estrato(estratos, prioridades, self.tamano_por_estrato)
+        self.muestra = candidatos.iloc[elegidos]
+        self.estratos = estratos[elegidos]
+        self.prioridades = prioridades[elegidos]
+        return self
+
+    def estimaciones(self, confianza=0.95, lista_numericas=None, lista_categoricas=None):
+        """
+        Regresa las estimaciones para el data set completo con sus intervalos de confianza (aproximación
+        normal, con corrección por población finita en cada estrato):
+
+         - numericas: media de cada variable numérica (estimador de razón: suma entre observaciones no nulas)
+           y el total estimado de observaciones no nulas.
+         - nulos: proporción y total estimado de nulos de cada variable.
+         - categoricas: proporción de cada categoría entre las observaciones no nulas y su conteo estimado.
+        """
+        muestra = self.muestra
+        z = statistics.NormalDist().inv_cdf(0.5 + confianza / 2)
+        if lista_numericas is None or lista_categoricas is None:
+            vars_type = ContextoPerfilamiento(muestra).vars_type
+            numericas, _, categoricas, _ = separa_variables_por_tipo(vars_type)
+            lista_numericas = numericas if lista_numericas is None else lista_numericas
+            lista_categoricas = categoricas if lista_categoricas is None else lista_categoricas
+        lista_numericas = [col for col in lista_numericas if col != self.columna_estrato]
+        lista_categoricas = [col for col in lista_categoricas if col != self.columna_estrato]
+        estimador = _EstimadorEstratificado(self.estratos, self.renglones_estrato, z)
+
+        renglones = []
+        for col in lista_numericas:
+            valores = muestra[col].to_numpy(dtype='float64', na_value=np.nan)
+            no_nulos = ~np.isnan(valores)
+            media = estimador.razon(np.where(no_nulos, valores, 0.0), no_nulos.astype('float64'))
+            total = estimador.total(no_nulos.astype('float64'))
+            renglones.append([col] + media + total)
+        estimaciones_numericas = pd.DataFrame(renglones, columns=['variable', 'media', 'media_error_estandar',
+                                                                  'media_ic_inferior', 'media_ic_superior',
+                                                                  'no_nulos_estimados', 'no_nulos_ic_inferior',
+                                                                  'no_nulos_ic_superior']).set_index('variable')
+
+        renglones = []
+        for col in muestra.columns:
+            nulos = muestra[col].isna().to_numpy().astype('float64')
+            renglones.append([col] + estimador.razon(nulos, np.ones(len(nulos))) + estimador.total(nulos))
+        estimaciones_nulos = pd.DataFrame(renglones, columns=['variable', 'proporcion_nulos', 'error_estandar',
+                                                              'ic_inferior', 'ic_superior', 'nulos_estimados',
+                                                              'nulos_ic_inferior', 'nulos_ic_superior'])
+        estimaciones_nulos = estimaciones_nulos.set_index('variable')
+
+        tablas = []
+        for col in lista_categoricas:
+            codigos, categorias = pd.factorize(muestra[col])
+            tabla = estimador.proporciones(codigos, len(categorias))
+            tabla.index = pd.MultiIndex.from_arrays([np.repeat(np.array([col], dtype='object'), len(categorias)),
+                                                     pd.Index(categorias, dtype='object')],
+                                                    names=['variable', 'valor'])
+            tablas.append(tabla.sort_values('proporcion', ascending=False, kind='mergesort'))
+        columnas = ['proporcion', 'error_estandar', 'ic_inferior', 'ic_superior', 'conteo_estimado',
+                    'conteo_ic_inferior', 'conteo_ic_superior']
+        if tablas:
+            estimaciones_categoricas = pd.concat(tablas)
+        else:
+            estimaciones_categoricas = pd.DataFrame(columns=columnas)
+        return estimaciones_numericas, estimaciones_nulos, estimaciones_categoricas
+
+
+def _menores_por_estrato(estratos, prioridades, tamano):
+    """
+    Regresa las posiciones de las tamano prioridades más chicas de cada estrato.
+    """
+    # Para no ordenar el bloque completo primero se filtra con un umbral por estrato: con prioridades uniformes
+    # queda debajo de él una fracción de alrededor de tamano/N_h de cada estrato (más cuatro desviaciones de
+    # holgura), y sólo se ordenan esos candidatos. Si en algún estrato no alcanzan se toma el estrato completo,
+    # así que el resultado es exacto.
+    renglones = np.bincount(estratos).astype('float64')
+    with np.errstate(divide='ignore'):
+        umbral = (tamano + 4 * np.sqrt(tamano) + 10) / renglones
+    candidatos = np.flatnonzero(prioridades < umbral[estratos])
+    suficientes = np.bincount(estratos[candidatos], minlength=len(renglones)) >= np.minimum(renglones, tamano)
+    if not suficientes.all():
+        umbral[~suficientes] = np.inf
+        candidatos = np.flatnonzero(prioridades < umbral[estratos])
+
+    estratos_candidatos = estratos[candidatos]
+    orden = np.lexsort((prioridades[candidatos], estratos_candidatos))
+    estratos_ordenados = estratos_candidatos[orden]
+    inicio_estrato = np.flatnonzero(np.r_[True, estratos_ordenados[1:] != estratos_ordenados[:-1]])
+    lugar = np.arange(len(orden)) - np.repeat(inicio_estrato, np.diff(np.r_[inicio_estrato, len(orden)]))
+    return np.sort(candidatos[orden[lugar < tamano]])
+
+
+class _EstimadorEstratificado:
+    """
+    Estimadores de muestreo estratificado: total y razón (suma de y entre suma de x, con la varianza por
+    linealización) con corrección por población finita.
+    """
+
+    def __init__(self, estratos, renglones_estrato, z):
+        self.estratos = estratos
+        self.N = renglones_estrato.astype('float64')
+        self.n = np.bincount(estratos, minlength=len(self.N)).astype('float64')
+        self.z = z
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # N_h^2 (1 - n_h/N_h) / n_h, sólo para estratos con al menos dos renglones en la muestra
+            self.factor = np.where(self.n > 1, self.N ** 2 * (1 - self.n / self.N) / self.n, 0.0)
+            self.expansion = np.where(self.n > 0, self.N / self.n, 0.0)
+
+    def _varianza(self, sumas, sumas_cuadrados):
+        # suma sobre estratos de N_h^2 (1 - f_h) s_h^2 / n_h, con s_h^2 la varianza muestral del estrato
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s2 = np.where(self.n > 1, (sumas_cuadrados - sumas ** 2 / self.n) / (self.n - 1), 0.0)
+        return (self.factor * np.maximum(s2, 0)).sum()
+
+    def total(self, y):
+        sumas = np.bincount(self.estratos, weights=y, minlength=len(self.N))
+        total = (self.expansion * sumas).sum()
+        error = np.sqrt(self._varianza(sumas, np.bincount(self.estratos, weights=y * y, minlength=len(self.N))))
+        return [total, total - self.z * error, total + self.z * error]
+
+    def razon(self, y, x):
+        longitud = len(self.N)
+        total_y = (self.expansion * np.bincount(self.estratos, weights=y, minlength=longitud)).sum()
+        total_x = (self.expansion * np.bincount(self.estratos, weights=x, minlength=longitud)).sum()
+        if total_x == 0:
+            return [np.nan, np.nan, np.nan, np.nan]
+        razon = total_y / total_x
+        residuos = y - razon * x
+        error = np.sqrt(self._varianza(np.bincount(self.estratos, weights=residuos, minlength=longitud),
+                                       np.bincount(self.estratos, weights=residuos * residuos,
+                                                   minlength=longitud))) / total_x
+        return [razon, error, razon - self.z * error, razon + self.z * error]
+
+    def proporciones(self, codigos, numero_categorias):
+        # Para cada categoría c: y = [valor == c], x = [valor no nulo]; las sumas por estrato salen de un
+        # solo bincount de (estrato, categoría)
+        longitud = len(self.N)
+        validos = codigos >= 0
+        cuentas = np.bincount(self.estratos[validos] * numero_categorias + codigos[validos],
+                              minlength=longitud * numero_categorias).reshape(longitud, numero_categorias)
+        no_nulos = cuentas.sum(axis=1)
+        totales = self.expansion @ cuentas
+        total_x = (self.expansion * no_nulos).sum()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            proporcion = totales / total_x
+        # residuo z = y - p x: suma = cuentas - p no_nulos, suma de cuadrados = cuentas (1 - 2p) + p^2 no_nulos
+        sumas = cuentas - np.outer(no_nulos, proporcion)
+        sumas_cuadrados = cuentas * (1 - 2 * proporcion) + np.outer(no_nulos, proporcion ** 2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            n = self.n[:, None]
+            s2 = np.where(n > 1, (sumas_cuadrados - sumas ** 2 / n) / (n - 1), 0.0)
+            s2_totales = np.where(n > 1, (cuentas - cuentas ** 2 / n) / (n - 1), 0.0)
+        error = np.sqrt((self.factor[:, None] * np.maximum(s2, 0)).sum(axis=0)) / total_x
+        error_totales = np.sqrt((self.factor[:, None] * np.maximum(s2_totales, 0)).sum(axis=0))
+        return pd.DataFrame({'proporcion': proporcion, 'error_estandar': error,
+                             'ic_inferior': proporcion - self.z * error, 'ic_superior': proporcion + self.z * error,
+                             'conteo_estimado': totales, 'conteo_ic_inferior': totales - self.z * error_totales,
+                             'conteo_ic_superior': totales + self.z * error_totales})
+
+
+def genera_profiling_por_muestreo(df, columna_estrato='alcaldia', tamano_por_estrato=1000, confianza=0.95,
+                                  semilla=0, tamano_bloque=None):
+    """
+    Función que estima el perfilamiento a partir de una muestra estratificada por columna_estrato, para
+    explorar de forma interactiva: el data set se recorre una sola vez con costo lineal por bloque (no se
+    ordena el bloque) y las estimaciones sólo dependen del tamaño de la muestra. Entrega medias, proporciones
+    de nulos y proporciones de categorías con intervalos de confianza, y los conteos escalados al data set
+    completo.
+
+    ==========
+    * Args:
+         - df: el data frame, o un iterable de data frames (por ejemplo pd.read_csv(..., chunksize=...)).
+         - columna_estrato: columna que define los estratos (por ejemplo alcaldia o bimestre).
+         - tamano_por_estrato: tamaño máximo de la muestra de cada estrato.
+         - confianza: nivel de confianza de los intervalos.
+         - semilla: semilla del muestreo.
+         - tamano_bloque: si se indica y df es un data frame, se recorre en bloques de ese número de renglones.
+    * Return:
+         - estimaciones_numericas: Data Frame con la media de cada variable numérica y su intervalo.
+         - estimaciones_nulos: Data Frame con la proporción y el total de nulos de cada variable.
+         - estimaciones_categoricas: Data Frame con la proporción y el conteo de cada categoría.
+         - muestra: la muestra (se le puede aplicar genera_profiling_por_variable).
+    ==========
+    Ejemplo:
+        >>numericas, nulos, categoricas, muestra = genera_profiling_por_muestreo(df, 'bimestre', 2000)
+        >>categoricas.loc['indice_des']
+    """
+    muestra = MuestraEstratificada(columna_estrato, tamano_por_estrato, semilla)
+    if isinstance(df, pd.DataFrame):
+        if tamano_bloque is None:
+            bloques = [df]
+        else:
+            bloques = (df.iloc[inicio:inicio + tamano_bloque] for inicio in range(0, len(df), tamano_bloque))
+    else:
+        bloques = df
+    for bloque in bloques:
+        muestra.actualiza(bloque)
+
+    estimaciones_numericas, estimaciones_nulos, estimaciones_categoricas = muestra.estimaciones(confianza)
+    return estimaciones_numericas, estimaciones_nulos, estimaciones_categoricas, muestra.muestra
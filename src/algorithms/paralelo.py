@@ -0,0 +1,233 @@
+"""
+Backend de procesos: perfila cada columna en un proceso distinto, pasándole la columna por memoria
+compartida (ver eda.genera_profiling_por_variable con n_jobs).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import gc
+import pandas as pd
+import numpy as np
+
+from .base import ContextoPerfilamiento
+
+
+# Familias de variables que se perfilan por separado y el texto que se regresa si no hay ninguna
+FAMILIAS_PERFILAMIENTO = [('numerica', "No hay variables numéricas"),
+                          ('categorica', "No hay variables categóricas"),
+                          ('texto', "No hay variables de tipo texto")]
+
+
+def genera_profiling_en_paralelo(df, listas, n_jobs, opciones, perfiladores, contexto=None):
+    """
+    Función que perfila cada columna en un proceso distinto y arma las tres tablas de
+    genera_profiling_por_variable con las columnas en el mismo orden que la corrida en serie.
+
+    Las columnas no se mandan a los procesos como Data Frames (pickle): todas se copian una vez a un solo
+    segmento de memoria compartida (como en correlacion) y cada proceso sólo recibe el nombre del segmento y
+    la posición, tipo y tamaño de los arreglos de su columna. Las numéricas van tal cual (las de tipos de
+    pandas con máscara, como Int64, como sus valores y su máscara de nulos), las categóricas como sus
+    códigos (las categorías sí viajan, pero son pocas) y las de texto como los buffers de un arreglo de
+    strings de Arrow (offsets, nulos y bytes UTF-8). Sólo las columnas de texto con valores que no son
+    strings (o si no está pyarrow) y las numéricas de otros tipos de pandas se mandan como los códigos de
+    pd.factorize junto con sus valores únicos. Lo que el contexto ya sabe de cada columna (tipo, nulos y
+    número de únicos) viaja en el descriptor para que los procesos no lo vuelvan a calcular.
+
+    Para saber el tamaño del segmento primero se convierten todas las columnas; en las numéricas y
+    categóricas eso no copia nada, pero los buffers de Arrow de las de texto conviven con el segmento hasta
+    que se copian a él.
+
+    ==========
+    * Args:
+         - df: el data frame al que se le va a realizar el perfilamiento.
+         - listas: [lista_numericas, lista_category, lista_texto] como las regresa separa_variables_por_tipo.
+         - n_jobs: número de procesos.
+         - opciones: diccionario con k_cuantiles, precision_hll y capacidad_top.
+         - perfiladores: diccionario con la función que perfila cada familia ('numerica', 'categorica' y
+           'texto'), con la firma de genera_profiling_de_numericos, genera_profiling_de_categorias y
+           genera_profiling_de_texto. Se reciben como parámetro (eda es quien llama a este módulo, así que
+           no se importan de ahí).
+         - contexto: ContextoPerfilamiento opcional del data frame.
+    * Return:
+         - profiling_numericas, profiling_categoricas, profiling_de_texto (igual que genera_profiling_por_variable).
+    ==========
+    Ejemplo:
+        >>listas = separa_variables_por_tipo(vars_type)
+        >>opciones = {'k_cuantiles': None, 'precision_hll': None, 'capacidad_top': None}
+        >>perfiladores = {'numerica': genera_profiling_de_numericos, 'categorica': genera_profiling_de_categorias,
+        >>                'texto': genera_profiling_de_texto}
+        >>perfiles = genera_profiling_en_paralelo(df, [listas[0], listas[2], listas[3]], 8, opciones, perfiladores)
+    """
+    contexto = ContextoPerfilamiento(df) if contexto is None else contexto
+    columnas = []
+    for (familia, _), lista in zip(FAMILIAS_PERFILAMIENTO, listas):
+        for col in lista:
+            arreglos, extra = _arreglo_compartible(df[col], familia)
+            columnas.append((col, familia, arreglos, extra))
+
+    # cada arreglo empieza en un múltiplo de 8 bytes dentro del segmento
+    tamanos = [-(-arreglo.nbytes // 8) * 8 for _, _, arreglos, _ in columnas for arreglo in arreglos]
+    inicios = iter(np.cumsum([0] + tamanos)[:-1].tolist())
+    memoria = shared_memory.SharedMemory(create=True, size=max(int(sum(tamanos)), 1))
+    try:
+        descriptores = []
+        for col, familia, arreglos, extra in columnas:
+            formas = []
+            for arreglo in arreglos:
+                inicio = next(inicios)
+                np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=memoria.buf, offset=inicio)[:] = arreglo
+                formas.append((inicio, arreglo.dtype.str, len(arreglo)))
+            # los buffers de texto ya copiados no se necesitan más
+            arreglos.clear()
+            descriptores.append((col, familia, memoria.name, formas, len(df), extra,
+                                 contexto.resumen_columna(col)))
+
+        n_procesos = max(1, min(n_jobs, len(descriptores)))
+        with ProcessPoolExecutor(max_workers=n_procesos) as procesos:
+            perfiles = list(procesos.map(_perfila_columna_compartida, descriptores,
+                                         [opciones] * len(descriptores), [perfiladores] * len(descriptores)))
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+    # Juntamos las columnas en el orden de las listas
+    resultados = []
+    for familia, sin_variables in FAMILIAS_PERFILAMIENTO:
+        perfiles_familia = [perfil for descriptor, perfil in zip(descriptores, perfiles)
+                            if descriptor[1] == familia]
+        if len(perfiles_familia) == 0:
+            resultados.append(sin_variables)
+            continue
+        tabla = pd.DataFrame(data={'metrica': perfiles_familia[0]['metrica']})
+        for perfil in perfiles_familia:
+            tabla[perfil.columns[1]] = perfil.iloc[:, 1]
+        resultados.append(tabla)
+    return tuple(resultados)
+
+
+def _arreglo_compartible(serie, familia):
+    """
+    Función que convierte una columna en una lista de arreglos de NumPy de tamaño fijo (que se pueden copiar
+    a memoria compartida) más lo que haga falta para reconstruirla.
+    """
+    if familia == 'categorica':
+        return [serie.cat.codes.to_numpy()], serie.dtype
+    if familia == 'texto':
+        buffers = _buffers_texto(serie)
+        if buffers is not None:
+            return buffers, ('arrow', serie.dtype)
+        codigos, valores = pd.factorize(serie.to_numpy())
+        return [codigos], valores
+    if isinstance(serie.dtype, np.dtype):
+        return [serie.to_numpy()], None
+    # los tipos de pandas con máscara (Int64, Float64, ...) viajan como sus valores en el tipo de NumPy y su
+    # máscara de nulos: pasarlos por float64 cambiaría los enteros mayores que 2**53
+    if issubclass(serie.dtype.construct_array_type(), (pd.arrays.IntegerArray, pd.arrays.FloatingArray)):
+        mascara = serie.isna().to_numpy()
+        return [serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0), mascara], ('mascara', serie.dtype)
+    codigos, valores = pd.factorize(serie)
+    return [codigos], ('codigos', valores)
+
+
+def _buffers_texto(serie):
+    """
+    Regresa [offsets (int64), nulos (bool), bytes UTF-8] de una columna de strings como un arreglo large_string
+    de Arrow, o None si la columna tiene valores que no son strings o no está pyarrow.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    try:
+        if hasattr(serie.array, '__arrow_array__'):
+            arreglo = pa.array(serie.array).cast(pa.large_string())
+        else:
+            arreglo = pa.array(serie.to_numpy(dtype='object'), type=pa.large_string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+    if isinstance(arreglo, pa.ChunkedArray):
+        arreglo = arreglo.combine_chunks()
+    _, offsets, datos = arreglo.buffers()
+    offsets = np.frombuffer(offsets, dtype='int64')[arreglo.offset:arreglo.offset + len(arreglo) + 1]
+    datos = np.zeros(0, dtype='uint8') if datos is None else np.frombuffer(datos, dtype='uint8')
+    nulos = arreglo.is_null().to_numpy(zero_copy_only=False)
+    return [offsets - offsets[0], nulos, datos[offsets[0]:offsets[-1]]]
+
+
+def _perfila_columna_compartida(descriptor, opciones, perfiladores):
+    """
+    Función que corre en cada proceso: reconstruye la columna desde la memoria compartida y regresa su
+    perfilamiento (Data Frame con las columnas metrica y el nombre de la variable). Las numéricas y las
+    categóricas se perfilan directo sobre el segmento, sin copiarlas; sólo el texto se vuelve a armar como
+    objetos de Python. El perfilamiento no guarda referencias a la columna, así que al terminar se sueltan
+    todas y se cierra el segmento.
+    """
+    col, familia, nombre_memoria, formas, n_renglones, extra, resumen = descriptor
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    try:
+        arreglos = [np.ndarray((longitud,), dtype=np.dtype(tipo), buffer=memoria.buf, offset=inicio)
+                    for inicio, tipo, longitud in formas]
+        if familia == 'categorica':
+            valores = pd.Categorical.from_codes(arreglos[0], dtype=extra)
+        elif familia == 'texto' and isinstance(extra, tuple):
+            valores = _texto_de_buffers(*arreglos)
+            if extra[1] != np.dtype('object'):
+                valores = pd.array(valores, dtype=extra[1])
+        elif familia == 'texto':
+            # el código -1 (nulo) toma el último elemento, que es el NaN que se agrega
+            valores = np.append(extra, np.nan)[arreglos[0]]
+        elif extra is None:
+            valores = arreglos[0]
+        elif extra[0] == 'mascara':
+            valores = extra[1].construct_array_type()(arreglos[0], arreglos[1])
+        else:
+            valores = extra[1].take(arreglos[0], allow_fill=True)
+        del arreglos
+
+        df = pd.DataFrame({col: valores}, copy=False)
+        del valores
+        contexto = ContextoPerfilamiento(df)
+        contexto.carga_resumen_columna(col, resumen)
+        vars_type = contexto.vars_type
+
+        perfilador = perfiladores[familia]
+        if familia == 'numerica':
+            perfil = perfilador(df, [col], vars_type, opciones['k_cuantiles'], opciones['precision_hll'],
+                                opciones['capacidad_top'])
+        elif familia == 'categorica':
+            perfil = perfilador(df, [col], vars_type, opciones['precision_hll'], opciones['capacidad_top'],
+                                contexto)
+        else:
+            perfil = perfilador(df, [col], vars_type, opciones['precision_hll'], contexto,
+                                motor=opciones.get('motor_texto', 'pandas'))
+        del df, contexto, vars_type
+    finally:
+        _cierra_memoria(memoria)
+    return perfil
+
+
+def _cierra_memoria(memoria):
+    """
+    Cierra el segmento en un proceso. Si algún objeto de pandas quedó en un ciclo de referencias con una vista
+    del segmento, se recolecta antes de volver a intentar.
+    """
+    try:
+        memoria.close()
+    except BufferError:
+        gc.collect()
+        memoria.close()
+
+
+def _texto_de_buffers(offsets, nulos, datos):
+    """
+    Reconstruye una columna de strings (objetos de Python, NaN en los nulos) a partir de sus buffers de Arrow.
+    Los strings se copian, así que al terminar no queda ninguna referencia a la memoria compartida.
+    """
+    import pyarrow as pa
+
+    validez = pa.py_buffer(np.packbits(~nulos, bitorder='little'))
+    arreglo = pa.Array.from_buffers(pa.large_string(), len(nulos),
+                                    [validez, pa.py_buffer(offsets), pa.py_buffer(datos)])
+    valores = arreglo.to_numpy(zero_copy_only=False)
+    del arreglo
+    valores[nulos] = np.nan
+    return valores
@@ -0,0 +1,705 @@
+"""
+Sketches combinables para perfilar por bloques o en varios procesos: huellas de 64 bits, conjunto
+de huellas, HyperLogLog, cuantiles KLL, conteo de valores y top de frecuentes (Misra-Gries). No
+dependen del resto del paquete; cada uno se puede guardar sin pickle con estado/de_estado.
+"""
+import json
+import pandas as pd
+import numpy as np
+
+
+def huellas_64(serie):
+    """
+    Función que calcula una huella (hash) de 64 bits por cada valor no nulo de una serie. Los numéricos se
+    pasan a float64 antes de calcular la huella para que 5 y 5.0 den la misma huella en cualquier bloque.
+
+    ==========
+    * Args:
+         - serie: serie de pandas (numérica, categórica o de texto).
+    * Return:
+         - arreglo uint64 con una huella por valor no nulo.
+    ==========
+    Ejemplo:
+        >>huellas = huellas_64(df['colonia'])
+    """
+    serie = serie.dropna()
+    if serie.dtype.kind in 'iufb':
+        return pd.util.hash_array(serie.to_numpy(dtype='float64'))
+    if str(serie.dtype) == 'category':
+        return pd.util.hash_pandas_object(serie, index=False).to_numpy()
+    # categorize=False evita armar la tabla hash de valores distintos que queremos ahorrarnos
+    return pd.util.hash_array(serie.to_numpy(dtype='object'), categorize=False)
+
+
+class ConjuntoHuellas:
+    """
+    Conjunto de huellas de 64 bits guardado como unas cuantas corridas ordenadas de tamaños que crecen
+    geométricamente (cada corrida es al menos el doble de la siguiente). Agregar n huellas cuesta
+    O(n log N) amortizado en lugar de reordenar las N huellas que ya se tienen, así que actualizar un
+    perfilamiento con un bloque nuevo no depende del tamaño de la historia. Las corridas no se modifican
+    (al juntarse se crea otra), así que se pueden guardar en disco una por archivo y sólo escribir las
+    nuevas (ver estado con segmentos).
+
+    ==========
+    Ejemplo:
+        >>conjunto = ConjuntoHuellas()
+        >>vistas = conjunto.contiene(huellas)
+        >>conjunto.agrega(huellas)
+    """
+
+    def __init__(self):
+        self.corridas = []
+        # archivo donde ya está guardada cada corrida (None si todavía no se guarda)
+        self.archivos = []
+
+    def __len__(self):
+        return sum(len(corrida) for corrida in self.corridas)
+
+    def contiene(self, huellas):
+        """
+        Regresa un arreglo booleano que indica qué huellas ya están en el conjunto.
+        """
+        huellas = np.asarray(huellas, dtype='uint64')
+        vistas = np.zeros(len(huellas), dtype=bool)
+        for corrida in self.corridas:
+            posiciones = np.minimum(np.searchsorted(corrida, huellas), len(corrida) - 1)
+            vistas |= corrida[posiciones] == huellas
+        return vistas
+
+    def agrega(self, huellas):
+        """
+        Agrega huellas al conjunto (las repetidas o ya vistas se ignoran).
+        """
+        nuevas = np.unique(np.asarray(huellas, dtype='uint64'))
+        nuevas = nuevas[~self.contiene(nuevas)]
+        if len(nuevas) == 0:
+            return self
+        self.corridas.append(nuevas)
+        self.archivos.append(None)
+        while len(self.corridas) > 1 and len(self.corridas[-2]) <= 2 * len(self.corridas[-1]):
+            ultima = self.corridas.pop()
+            self.archivos.pop()
+            self.corridas[-1] = np.sort(np.concatenate([self.corridas[-1], ultima]))
+            self.archivos[-1] = None
+        return self
+
+    def combina(self, otro):
+        """
+        Agrega todas las huellas de otro conjunto.
+        """
+        for corrida in otro.corridas:
+            self.agrega(corrida)
+        return self
+
+    def cuenta_comunes(self, otro):
+        """
+        Regresa cuántas huellas de otro conjunto ya están en éste.
+        """
+        return int(sum(self.contiene(corrida).sum() for corrida in otro.corridas))
+
+    def estado(self, arreglos, prefijo, segmentos=None):
+        """
+        Guarda las corridas en arreglos (diccionario de arreglos de NumPy) y regresa los datos escalares. Con
+        segmentos (un objeto con guarda(corrida, archivo) que regresa el nombre del segmento, ruta(nombre) y
+        carga(nombre)) cada corrida va a su propio segmento y las que ya estaban guardadas no se reescriben.
+        """
+        if segmentos is not None:
+            nombres = [segmentos.guarda(corrida, archivo) for corrida, archivo in zip(self.corridas, self.archivos)]
+            self.archivos = [segmentos.ruta(nombre) for nombre in nombres]
+            return {'segmentos': nombres}
+        for i, corrida in enumerate(self.corridas):
+            arreglos[prefijo + '/corrida_' + str(i)] = corrida
+        return {'corridas': len(self.corridas)}
+
+    @classmethod
+    def de_estado(cls, estado, arreglos, prefijo, segmentos=None):
+        """
+        Reconstruye el conjunto a partir de lo que regresó estado.
+        """
+        conjunto = cls()
+        if 'segmentos' in estado:
+            conjunto.corridas = [segmentos.carga(nombre) for nombre in estado['segmentos']]
+            conjunto.archivos = [segmentos.ruta(nombre) for nombre in estado['segmentos']]
+        else:
+            conjunto.corridas = [arreglos[prefijo + '/corrida_' + str(i)] for i in range(estado['corridas'])]
+            conjunto.archivos = [None] * len(conjunto.corridas)
+        return conjunto
+
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidad (número de valores distintos) HyperLogLog con 2^precision registros de 6 bits
+    (guardados en uint8), combinable entre bloques y procesos. Mientras el número de distintos no pasa de
+    umbral_exacto también guarda las huellas exactas y regresa el conteo exacto. El error estándar del
+    estimado es 1.04/sqrt(2^precision) (0.8% con precision=14).
+
+    ==========
+    * Args:
+         - precision: número de bits para elegir el registro (entre 4 y 18).
+         - umbral_exacto: cardinalidad hasta la que se regresa el conteo exacto (por defecto 2^precision).
+    ==========
+    Ejemplo:
+        >>hll = HyperLogLog(precision=14)
+        >>hll.actualiza(df['colonia'])
+        >>hll.cardinalidad()
+    """
+
+    def __init__(self, precision=14, umbral_exacto=None):
+        self.precision = precision
+        self.umbral_exacto = 2 ** precision if umbral_exacto is None else umbral_exacto
+        self.registros = np.zeros(2 ** precision, dtype='uint8')
+        self.huellas = np.array([], dtype='uint64')
+
+    def error_estandar(self):
+        """
+        Regresa el error estándar relativo del estimado (0 mientras el conteo es exacto).
+        """
+        if self.huellas is not None:
+            return 0.0
+        return 1.04 / np.sqrt(len(self.registros))
+
+    def actualiza(self, serie):
+        """
+        Agrega los valores (no nulos) de una serie.
+        """
+        return self.actualiza_huellas(huellas_64(serie))
+
+    def actualiza_huellas(self, huellas):
+        """
+        Agrega huellas de 64 bits ya calculadas (ver huellas_64).
+        """
+        huellas = np.asarray(huellas, dtype='uint64')
+        if len(huellas) == 0:
+            return self
+        p = self.precision
+        m = len(self.registros)
+
+        # Los primeros p bits eligen el registro; el rango es la posición del primer 1 en los bits restantes
+        indice = (huellas >> np.uint64(64 - p)).astype('int64')
+        resto = huellas << np.uint64(p)
+        ceros = np.zeros(len(huellas), dtype='int64')
+        for corrimiento in (32, 16, 8, 4, 2, 1):
+            sin_unos = (resto >> np.uint64(64 - corrimiento)) == 0
+            ceros += corrimiento * sin_unos
+            resto = np.where(sin_unos, resto << np.uint64(corrimiento), resto)
+        rango = (np.minimum(ceros, 64 - p) + 1).astype('uint8')
+
+        # Máximo rango por registro sin memoria extra de m x 64: se asignan los rangos ordenados de menor a
+        # mayor (el ordenamiento estable de uint8 es radix, lineal) y con índices repetidos gana la última
+        # asignación, que es la del rango mayor
+        orden = np.argsort(rango, kind='stable')
+        maximo = np.zeros(m, dtype='uint8')
+        maximo[indice[orden]] = rango[orden]
+        self.registros = np.maximum(self.registros, maximo)
+
+        if self.huellas is not None:
+            # Si el estimado ya rebasa por mucho el umbral no vale la pena ordenar las huellas
+            if self._estimado() > 2 * self.umbral_exacto:
+                self.huellas = None
+            else:
+                self._agrega_huellas(np.unique(huellas))
+        return self
+
+    def _agrega_huellas(self, unicas):
+        """
+        Inserta huellas únicas y ordenadas en las huellas exactas (que ya están ordenadas) sin reordenarlas.
+        """
+        if len(unicas) > self.umbral_exacto:
+            self.huellas = None
+            return
+        posiciones = np.searchsorted(self.huellas, unicas)
+        ya_estan = np.zeros(len(unicas), dtype=bool)
+        dentro = posiciones < len(self.huellas)
+        ya_estan[dentro] = self.huellas[posiciones[dentro]] == unicas[dentro]
+        self.huellas = np.insert(self.huellas, posiciones[~ya_estan], unicas[~ya_estan])
+        if len(self.huellas) > self.umbral_exacto:
+            self.huellas = None
+
+    def combina(self, otro):
+        """
+        Combina este estimador con otro de la misma precisión.
+        """
+        if otro.precision != self.precision:
+            raise ValueError("Sólo se pueden combinar HyperLogLog con la misma precisión")
+        self.registros = np.maximum(self.registros, otro.registros)
+        if self.huellas is not None and otro.huellas is not None:
+            self._agrega_huellas(otro.huellas)
+        else:
+            self.huellas = None
+        return self
+
+    def es_exacto(self):
+        return self.huellas is not None
+
+    def cardinalidad(self):
+        """
+        Regresa el número (estimado o exacto) de valores distintos.
+        """
+        if self.huellas is not None:
+            return len(self.huellas)
+        return int(round(self._estimado()))
+
+    def _estimado(self):
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimado = alfa * m * m / np.sum(2.0 ** -self.registros.astype('float64'))
+        vacios = int((self.registros == 0).sum())
+        # Corrección para cardinalidades pequeñas (conteo lineal)
+        if estimado <= 2.5 * m and vacios > 0:
+            estimado = m * np.log(m / vacios)
+        return estimado
+
+    def estado(self, arreglos, prefijo):
+        """
+        Guarda los registros (y las huellas exactas, si las hay) en arreglos y regresa los datos escalares.
+        """
+        arreglos[prefijo + '/registros'] = self.registros
+        if self.huellas is not None:
+            arreglos[prefijo + '/huellas'] = self.huellas
+        return {'precision': self.precision, 'umbral_exacto': self.umbral_exacto,
+                'exacto': self.huellas is not None}
+
+    @classmethod
+    def de_estado(cls, estado, arreglos, prefijo):
+        """
+        Reconstruye el estimador a partir de lo que regresó estado.
+        """
+        hll = cls(estado['precision'], estado['umbral_exacto'])
+        hll.registros = arreglos[prefijo + '/registros']
+        hll.huellas = arreglos[prefijo + '/huellas'] if estado['exacto'] else None
+        return hll
+
+
+# Capacidad mínima de los compactores de SketchCuantiles (la de DataSketches, de la que sale su cota de error)
+CAPACIDAD_MINIMA_KLL = 8
+
+
+class SketchCuantiles:
+    """
+    Sketch de cuantiles tipo KLL: guarda una muestra ponderada de los valores en niveles (compactores) de
+    peso 2^h, con memoria acotada por k, y se puede combinar con el sketch de otro bloque o de otro proceso.
+    El error de rango normalizado es de alrededor de 2.296/k^0.9723 (confianza del 99%), la cota de la
+    implementación de referencia de KLL (DataSketches), que vale porque los compactores tienen la misma
+    capacidad mínima de 8 valores (CAPACIDAD_MINIMA_KLL); mientras no se ha compactado nada el resultado es
+    exacto.
+
+    ==========
+    * Args:
+         - k: presupuesto de memoria (número de valores en el nivel más alto); k=200 da ~1.3% de error.
+         - semilla: semilla para la elección aleatoria de la mitad que sube de nivel.
+    ==========
+    Ejemplo:
+        >>sketch = SketchCuantiles(k=SketchCuantiles.k_para_error(0.01))
+        >>sketch.actualiza(df['consumo_total'])
+        >>valor, inferior, superior = sketch.cuantil(0.5)
+    """
+
+    def __init__(self, k=200, semilla=0):
+        self.k = k
+        self.n = 0
+        self.compactores = [np.array([], dtype='float64')]
+        self.minimo = np.nan
+        self.maximo = np.nan
+        self.aleatorio = np.random.default_rng(semilla)
+
+    @staticmethod
+    def k_para_error(error):
+        """
+        Regresa el k necesario para un error de rango normalizado dado (por ejemplo 0.01 = 1%).
+        """
+        return int(np.ceil((2.296 / error) ** (1 / 0.9723)))
+
+    def error_rango(self):
+        """
+        Regresa la cota del error de rango normalizado del sketch (0 si todavía es exacto).
+        """
+        if len(self.compactores) == 1:
+            return 0.0
+        return 2.296 / self.k ** 0.9723
+
+    def memoria(self):
+        """
+        Regresa el número de valores que guarda el sketch.
+        """
+        return sum(len(c) for c in self.compactores)
+
+    def actualiza(self, valores):
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        if len(valores) == 0:
+            return self
+        self.n += len(valores)
+        self.minimo = np.fmin(self.minimo, valores.min())
+        self.maximo = np.fmax(self.maximo, valores.max())
+        self.compactores[0] = np.concatenate([self.compactores[0], valores])
+        self._compacta()
+        return self
+
+    def combina(self, otro):
+        while len(self.compactores) < len(otro.compactores):
+            self.compactores.append(np.array([], dtype='float64'))
+        for nivel, compactor in enumerate(otro.compactores):
+            self.compactores[nivel] = np.concatenate([self.compactores[nivel], compactor])
+        self.n += otro.n
+        self.minimo = np.fmin(self.minimo, otro.minimo)
+        self.maximo = np.fmax(self.maximo, otro.maximo)
+        self._compacta()
+        return self
+
+    def _capacidad(self, nivel):
+        # capacidad mínima de 8, la misma de la implementación de referencia con la que se calculó el error
+        altura = len(self.compactores)
+        return max(CAPACIDAD_MINIMA_KLL, int(np.ceil(self.k * (2 / 3) ** (altura - 1 - nivel))))
+
+    def _compacta(self):
+        nivel = 0
+        while nivel < len(self.compactores):
+            compactor = self.compactores[nivel]
+            if len(compactor) <= self._capacidad(nivel):
+                nivel += 1
+                continue
+            if nivel + 1 == len(self.compactores):
+                self.compactores.append(np.array([], dtype='float64'))
+
+            # Ordenamos y sube la mitad (pares o nones al azar) con el doble de peso; si el número de
+            # valores es impar, uno se queda en el nivel
+            compactor = np.sort(compactor)
+            resto = compactor[:len(compactor) % 2]
+            compactor = compactor[len(compactor) % 2:]
+            inicio = self.aleatorio.integers(2)
+            self.compactores[nivel + 1] = np.concatenate([self.compactores[nivel + 1], compactor[inicio::2]])
+            self.compactores[nivel] = resto
+            # al crecer la altura cambian las capacidades, así que revisamos desde abajo
+            nivel = 0
+
+    def cuantil(self, q):
+        """
+        Regresa el cuantil q junto con sus cotas (los valores en los rangos q - error y q + error).
+        """
+        if self.n == 0:
+            return np.nan, np.nan, np.nan
+        if len(self.compactores) == 1:
+            valor = np.percentile(self.compactores[0], q * 100)
+            return valor, valor, valor
+
+        valores, pesos = self._muestra_ordenada()
+        acumulado = np.cumsum(pesos) / pesos.sum()
+
+        def valor_en_rango(rango):
+            if rango <= 0:
+                return self.minimo
+            if rango >= 1:
+                return self.maximo
+            return valores[min(np.searchsorted(acumulado, rango, side='left'), len(valores) - 1)]
+
+        error = self.error_rango()
+        return valor_en_rango(q), valor_en_rango(q - error), valor_en_rango(q + error)
+
+    def rangos(self, valores):
+        """
+        Regresa el rango aproximado de cada valor (de 1 a n, los empates con su promedio, como rank()); NaN en
+        los nulos. Mientras el sketch es exacto el resultado es igual a rank() sobre los valores del sketch.
+        """
+        valores = np.asarray(valores, dtype='float64')
+        muestra, pesos = self._muestra_ordenada()
+        acumulado = np.concatenate([[0.0], np.cumsum(pesos)])
+        menores = acumulado[np.searchsorted(muestra, valores, side='left')]
+        hasta = acumulado[np.searchsorted(muestra, valores, side='right')]
+        rangos = menores + (hasta - menores + 1) / 2
+        rangos[np.isnan(valores)] = np.nan
+        return rangos
+
+    def _muestra_ordenada(self):
+        """
+        Regresa los valores del sketch ordenados junto con su peso.
+        """
+        valores = np.concatenate(self.compactores)
+        pesos = np.concatenate([np.full(len(c), 2.0 ** nivel) for nivel, c in enumerate(self.compactores)])
+        orden = np.argsort(valores, kind='stable')
+        return valores[orden], pesos[orden]
+
+    def estado(self, arreglos, prefijo):
+        """
+        Guarda los compactores en arreglos y regresa los datos escalares (incluido el estado del generador
+        aleatorio, para que al seguir actualizando se compacte igual que sin guardar).
+        """
+        for nivel, compactor in enumerate(self.compactores):
+            arreglos[prefijo + '/nivel_' + str(nivel)] = compactor
+        return {'k': self.k, 'n': self.n, 'minimo': self.minimo, 'maximo': self.maximo,
+                'niveles': len(self.compactores), 'aleatorio': self.aleatorio.bit_generator.state}
+
+    @classmethod
+    def de_estado(cls, estado, arreglos, prefijo):
+        """
+        Reconstruye el sketch a partir de lo que regresó estado.
+        """
+        sketch = cls(estado['k'])
+        sketch.n = estado['n']
+        sketch.minimo = np.float64(estado['minimo'])
+        sketch.maximo = np.float64(estado['maximo'])
+        sketch.compactores = [arreglos[prefijo + '/nivel_' + str(nivel)] for nivel in range(estado['niveles'])]
+        sketch.aleatorio.bit_generator.state = estado['aleatorio']
+        return sketch
+
+
+class ConteoDeValores:
+    """
+    Acumulador combinable con el conteo de cada valor de una columna y la posición (renglón global) en la
+    que apareció por primera vez, para reproducir el orden de value_counts y de unique() al trabajar por
+    bloques. La memoria depende del número de valores distintos, no del número de renglones.
+
+    ==========
+    Ejemplo:
+        >>conteo = ConteoDeValores()
+        >>conteo.actualiza(df['colonia'], desplazamiento=0)
+        >>conteo.tabla()
+    """
+
+    def __init__(self):
+        self.conteos = None
+        self.pendientes = []
+
+    def actualiza(self, serie, desplazamiento):
+        """
+        Agrega los valores de un bloque; desplazamiento es la posición global del primer renglón del bloque.
+        """
+        codigos, valores = pd.factorize(np.asarray(serie))
+        validos = codigos >= 0
+
+        # factorize numera los valores en orden de aparición, así que el código k aparece por primera vez
+        # justo donde el máximo acumulado de los códigos sube a k
+        maximo_acumulado = np.maximum.accumulate(codigos) if len(codigos) > 0 else codigos
+        primera = np.flatnonzero(np.diff(np.r_[-1, maximo_acumulado]) > 0)
+        bloque = pd.DataFrame({'conteo': np.bincount(codigos[validos], minlength=len(valores)),
+                               'primera': primera + desplazamiento},
+                              index=pd.Index(valores))
+        self.pendientes.append(bloque)
+
+        # Compactamos cuando lo pendiente ya es más grande que lo acumulado
+        acumulado = 0 if self.conteos is None else len(self.conteos)
+        if sum(len(p) for p in self.pendientes) > max(acumulado, 1024):
+            self.compacta()
+
+    def combina(self, otro):
+        """
+        Combina este acumulador con otro (por ejemplo, el de otro proceso o de otro bloque del archivo).
+        """
+        otro.compacta()
+        if otro.conteos is not None:
+            self.pendientes.append(otro.conteos)
+        self.compacta()
+        return self
+
+    def desplaza(self, desplazamiento):
+        """
+        Recorre las posiciones de primera aparición (para combinarlo después de otro acumulador).
+        """
+        self.compacta()
+        if self.conteos is not None:
+            self.conteos['primera'] += desplazamiento
+
+    def compacta(self):
+        if len(self.pendientes) == 0:
+            return
+        todos = pd.concat(([] if self.conteos is None else [self.conteos]) + self.pendientes)
+        self.conteos = todos.groupby(level=0, sort=False).agg({'conteo': 'sum', 'primera': 'min'})
+        self.pendientes = []
+
+    def tabla(self):
+        """
+        Regresa el Data Frame (índice = valor, columnas conteo y primera) en orden de primera aparición.
+        """
+        self.compacta()
+        if self.conteos is None:
+            return pd.DataFrame({'conteo': pd.Series(dtype='int64'), 'primera': pd.Series(dtype='int64')})
+        return self.conteos.sort_values('primera', kind='mergesort')
+
+    def value_counts(self):
+        """
+        Regresa el equivalente de serie.value_counts(dropna=True).
+        """
+        return self.tabla()['conteo'].sort_values(ascending=False)
+
+    def unicos(self, primer_nulo=None):
+        """
+        Regresa el equivalente de list(serie.unique()); primer_nulo es la posición del primer nulo de la
+        columna (None si no tiene nulos) para insertarlo donde apareció.
+        """
+        tabla = self.tabla()
+        valores = list(tabla.index)
+        if primer_nulo is not None:
+            valores.insert(int(np.searchsorted(tabla['primera'].to_numpy(), primer_nulo)), np.nan)
+        return valores
+
+    def estado(self, arreglos, prefijo):
+        """
+        Guarda los valores, conteos y primeras apariciones en arreglos y regresa los datos escalares.
+        """
+        self.compacta()
+        if self.conteos is None:
+            return {'valores': None}
+        arreglos[prefijo + '/conteo'] = self.conteos['conteo'].to_numpy()
+        arreglos[prefijo + '/primera'] = self.conteos['primera'].to_numpy()
+        return {'valores': _guarda_valores(self.conteos.index, arreglos, prefijo + '/valores')}
+
+    @classmethod
+    def de_estado(cls, estado, arreglos, prefijo):
+        """
+        Reconstruye el conteo a partir de lo que regresó estado.
+        """
+        return cls()._carga_conteos(estado, arreglos, prefijo)
+
+    def _carga_conteos(self, estado, arreglos, prefijo):
+        if estado['valores'] is not None:
+            valores = _carga_valores(estado['valores'], arreglos, prefijo + '/valores')
+            self.conteos = pd.DataFrame({'conteo': arreglos[prefijo + '/conteo'],
+                                         'primera': arreglos[prefijo + '/primera']}, index=pd.Index(valores))
+        return self
+
+
+def _guarda_valores(valores, arreglos, prefijo):
+    """
+    Guarda un índice de valores en arreglos sin pickle y regresa cómo se guardó: 'numerico' tal cual,
+    'texto' como bytes UTF-8 con sus posiciones (como GeoShapesDiferidos) y 'json' cualquier otra mezcla de
+    números y textos.
+    """
+    arreglo = np.asarray(valores)
+    if arreglo.dtype.kind in 'biuf':
+        arreglos[prefijo] = arreglo
+        return 'numerico'
+    if all(isinstance(valor, str) for valor in arreglo):
+        codificados = [valor.encode('utf-8') for valor in arreglo]
+        arreglos[prefijo + '/posiciones'] = np.cumsum([0] + [len(valor) for valor in codificados])
+        arreglos[prefijo] = np.frombuffer(b''.join(codificados), dtype='uint8')
+        return 'texto'
+    arreglos[prefijo] = np.array(json.dumps(list(arreglo), default=_valor_json))
+    return 'json'
+
+
+def _carga_valores(forma, arreglos, prefijo):
+    """
+    Regresa los valores que guardó _guarda_valores.
+    """
+    if forma == 'numerico':
+        return arreglos[prefijo]
+    if forma == 'texto':
+        datos = arreglos[prefijo].tobytes()
+        posiciones = arreglos[prefijo + '/posiciones']
+        return np.array([datos[inicio:fin].decode('utf-8') for inicio, fin in zip(posiciones[:-1], posiciones[1:])],
+                        dtype='object')
+    return np.array(json.loads(str(arreglos[prefijo])), dtype='object')
+
+
+def _valor_json(valor):
+    # escalares de NumPy (np.int64, np.bool_, ...) que json no sabe escribir
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError("No se puede guardar el valor " + repr(valor) + " de tipo " + type(valor).__name__)
+
+
+def tabla_top_repetidos(conteos, top=5):
+    """
+    Función que arma la tabla de top repetidos de genera_profiling_de_numericos (columna conteo_top_5) a
+    partir de los conteos por valor en orden de primera aparición. Se ordena una sola vez, de mayor a menor
+    con un ordenamiento estable, así que los empates quedan en orden de aparición.
+
+    ==========
+    * Args:
+         - conteos: Series con el conteo de cada valor (índice = valor), en orden de primera aparición.
+         - top: número de valores que se regresan.
+    * Return:
+         - Data Frame: columna conteo_top_5 con los top valores más repetidos.
+    ==========
+    Ejemplo:
+        >>tabla_top_repetidos(pd.Series([3, 5, 3], index=[10.5, 2.0, 7.25]), top=2)
+    """
+    return pd.DataFrame({'conteo_top_5': conteos.sort_values(ascending=False, kind='stable')}).head(top)
+
+
+class TopFrecuentes(ConteoDeValores):
+    """
+    Resumen Misra-Gries combinable de los valores más frecuentes: guarda a lo más `capacidad` contadores y,
+    cuando se pasa, les resta a todos el (capacidad+1)-ésimo conteo más grande. Cada conteo reportado es
+    menor o igual al real por a lo más `error` (que nunca pasa de N/(capacidad+1)), así que cualquier valor
+    con frecuencia mayor a N/(capacidad+1) siempre aparece. Con capacidad=None no descarta nada y los conteos
+    son exactos. Funciona igual en memoria (actualiza_por_bloques) y por bloques (actualiza/combina).
+
+    ==========
+    * Args:
+         - capacidad: número máximo de contadores (None para conteo exacto).
+    ==========
+    Ejemplo:
+        >>frecuentes = TopFrecuentes(capacidad=1000).actualiza_por_bloques(df['colonia'])
+        >>frecuentes.tabla_conteo_porcentaje().head(3)
+    """
+
+    def __init__(self, capacidad=None):
+        super().__init__()
+        self.capacidad = capacidad
+        self.error = 0
+        self.total = 0
+
+    def actualiza(self, serie, desplazamiento):
+        self.total += int(serie.notna().sum())
+        super().actualiza(serie, desplazamiento)
+        return self
+
+    def actualiza_por_bloques(self, serie, tamano_bloque=100000):
+        """
+        Agrega una serie completa en bloques de tamano_bloque renglones para no armar su tabla hash entera.
+        """
+        for inicio in range(0, len(serie), tamano_bloque):
+            self.actualiza(serie.iloc[inicio:inicio + tamano_bloque], inicio)
+        self.compacta()
+        return self
+
+    def combina(self, otro):
+        self.error += otro.error
+        self.total += otro.total
+        return super().combina(otro)
+
+    def compacta(self):
+        super().compacta()
+        if self.capacidad is None or self.conteos is None or len(self.conteos) <= self.capacidad:
+            return
+        conteos = self.conteos['conteo'].to_numpy()
+        umbral = np.partition(conteos, len(conteos) - self.capacidad - 1)[len(conteos) - self.capacidad - 1]
+        conteos = self.conteos.assign(conteo=self.conteos['conteo'] - umbral)
+        self.conteos = conteos.loc[conteos['conteo'] > 0]
+        self.error += int(umbral)
+
+    def tabla_conteo_porcentaje(self, orden='aparicion'):
+        """
+        Regresa la tabla de CreaTablaConteoPorcentaje(df, col, True) con columnas conteo y porcentaje. Los
+        empates quedan en orden de aparición (como value_counts en object/numéricas) o, con orden='valor',
+        en orden de valor (como value_counts en columnas category).
+        """
+        tabla = self.tabla()
+        if orden == 'valor':
+            tabla = tabla.sort_index()
+        tabla_importantes = pd.DataFrame(tabla['conteo'].sort_values(ascending=False))
+        tabla_importantes['porcentaje'] = (tabla_importantes['conteo'] / max(self.total, 1)) \
+            .mul(100).round(2).astype(str) + '%'
+        return tabla_importantes
+
+    def top_repetidos(self, top=5):
+        """
+        Regresa la tabla de top repetidos de genera_profiling_de_numericos (columna conteo_top_5); si los
+        conteos son aproximados agrega la columna cota_error.
+        """
+        df_resultado = tabla_top_repetidos(self.tabla()['conteo'], top)
+        if self.error > 0:
+            df_resultado['cota_error'] = self.error
+        return df_resultado
+
+    def estado(self, arreglos, prefijo):
+        estado = super().estado(arreglos, prefijo)
+        estado.update({'capacidad': self.capacidad, 'error': self.error, 'total': self.total})
+        return estado
+
+    @classmethod
+    def de_estado(cls, estado, arreglos, prefijo):
+        frecuentes = cls(estado['capacidad'])
+        frecuentes.error = estado['error']
+        frecuentes.total = estado['total']
+        return frecuentes._carga_conteos(estado, arreglos, prefijo)
@@ -0,0 +1,352 @@
+"""
+Backend de DuckDB: el perfilamiento general y por variable como consultas de agregación sobre el csv,
+un parquet o el cache Arrow, sin cargar el data set en pandas.
+"""
+import os
+import pandas as pd
+import numpy as np
+
+from .base import ContextoPerfilamiento, _etapa, familia_de_tipo, separa_variables_por_tipo
+from .sketches import tabla_top_repetidos
+from .eda import (
+    LISTA_PERFILAMIENTO_TEXTO, _arma_profiling_de_numericos, _arma_profiling_general, genera_profiling_de_categorias)
+
+
+# Valores que pd.read_csv toma como nulos por default, para que DuckDB lea el csv igual que pandas
+VALORES_NULOS_CSV = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                     '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan', 'null']
+
+# Tipos que detecta DuckDB en un csv y el dtype que le da pd.read_csv a esa columna (sin nulos); el resto
+# (fechas, horas, ...) se vuelven a leer como VARCHAR porque pandas los deja como object
+TIPOS_CSV_PANDAS = {'BOOLEAN': 'bool', 'BIGINT': 'int64', 'DOUBLE': 'float64', 'VARCHAR': 'object'}
+
+
+class PerfilSQL:
+    """
+    Perfilamiento empujado a DuckDB (base de datos columnar embebida en el proceso): las métricas de
+    genera_profiling_general y genera_profiling_por_variable se traducen a unas cuantas consultas de
+    agregación que corren directo sobre el csv, un parquet o el cache Arrow de carga_dataset_preparado, sin
+    cargar el data set en pandas. DuckDB recorre el archivo en paralelo (un hilo por núcleo, o hilos) y puede
+    pasar a disco lo que no cabe en memoria. Las tablas salen iguales a las del camino de pandas sobre
+    pd.read_csv(ruta) (o el data frame guardado en el parquet/cache), redondeo incluido. Requiere duckdb.
+
+    Consultas: una con los conteos de nulos, una con los renglones distintos, una con los momentos, cuartiles
+    (interpolación lineal, igual que describe()), extremos y únicos de todas las numéricas, una con las
+    longitudes y únicos de todas las de texto y una con las frecuencias de las numéricas para el top5. El top5
+    se arma con los valores en orden de aparición y el mismo ordenamiento de pandas, así que los empates salen
+    igual; en columnas con más de maximo_distintos valores distintos sólo se traen los candidatos al top y los
+    empates del último lugar pueden salir en otro orden. Las columnas category (parquet o cache Arrow) se
+    perfilan con pandas leyendo sólo esas columnas.
+
+    ==========
+    * Args:
+         - ruta: ruta del csv (.csv), del parquet (.parquet) o del cache Arrow/Feather (.arrow, .feather).
+         - hilos: número de hilos de DuckDB (por default, todos los núcleos).
+         - maximo_distintos: número máximo de valores distintos de una numérica para armar su top5 exacto.
+    ==========
+    Ejemplo:
+        >>perfil = PerfilSQL('../data/consumo-agua.csv')
+        >>perfilamiento_general = perfil.genera_profiling_general()
+        >>profiling_numericas,profiling_categoricas,profiling_de_texto = perfil.genera_profiling_por_variable()
+    """
+
+    def __init__(self, ruta, hilos=None, maximo_distintos=200000):
+        import duckdb
+
+        self.ruta = ruta
+        self.maximo_distintos = maximo_distintos
+        self.conexion = duckdb.connect()
+        if hilos is not None:
+            self.conexion.execute('SET threads TO ' + str(int(hilos)))
+        # el top5 depende de que las tablas temporales guarden los renglones en el orden del archivo
+        self.conexion.execute('SET preserve_insertion_order = true')
+
+        extension = os.path.splitext(ruta)[1].lower()
+        self._tabla_arrow = None
+        if extension == '.parquet':
+            import pyarrow.parquet as pq
+            self.formato = 'parquet'
+            self.conexion.execute('CREATE VIEW datos AS SELECT * FROM read_parquet(' + _literal_sql(ruta) + ')')
+            tipos = pq.read_schema(ruta).empty_table().to_pandas().dtypes
+        elif extension in ('.arrow', '.feather'):
+            from pyarrow import feather
+            # con memory map el sistema operativo pagina el archivo, no se copia a memoria
+            self.formato = 'arrow'
+            self._tabla_arrow = feather.read_table(ruta, memory_map=True)
+            self.conexion.register('datos', self._tabla_arrow)
+            tipos = self._tabla_arrow.schema.empty_table().to_pandas().dtypes
+        else:
+            self.formato = 'csv'
+            tipos = self._crea_vista_csv()
+        self.columnas = list(tipos.index)
+        self._tipos_base = dict(tipos)
+
+        self._nulos = None
+        self._vars_type = None
+
+    def _crea_vista_csv(self):
+        """
+        Crea la vista sobre el csv y regresa el dtype que le daría pd.read_csv a cada columna (sin nulos).
+        """
+        lectura = ('read_csv(' + _literal_sql(self.ruta) + ', header=true, sample_size=-1, nullstr=[' +
+                   ', '.join(_literal_sql(valor) for valor in VALORES_NULOS_CSV) + ']')
+        self.conexion.execute('CREATE VIEW datos AS SELECT * FROM ' + lectura + ')')
+        esquema = self.conexion.execute('DESCRIBE datos').fetchall()
+
+        como_texto = [nombre for nombre, tipo, *_ in esquema if tipo not in TIPOS_CSV_PANDAS]
+        if como_texto:
+            tipos = ', '.join(_literal_sql(nombre) + ": 'VARCHAR'" for nombre in como_texto)
+            self.conexion.execute('CREATE OR REPLACE VIEW datos AS SELECT * FROM ' + lectura +
+                                  ', types={' + tipos + '})')
+        self._tipos_sql = {nombre: TIPOS_CSV_PANDAS.get(tipo, 'object') for nombre, tipo, *_ in esquema}
+        return pd.Series({nombre: np.dtype(tipo) for nombre, tipo in self._tipos_sql.items()}, dtype='object')
+
+    def _consulta(self, consulta):
+        """
+        Corre una consulta y regresa sus renglones.
+        """
+        return self.conexion.execute(consulta).fetchall()
+
+    @property
+    def renglones(self):
+        """
+        Número de renglones del archivo.
+        """
+        self.nulos_por_columna()
+        return self._renglones
+
+    def nulos_por_columna(self):
+        """
+        Regresa el número de nulos por columna (igual que df.isnull().sum()), con una sola consulta.
+        """
+        if self._nulos is None:
+            with _etapa('sql_nulos'):
+                conteos = self._consulta('SELECT count(*), ' + ', '.join(
+                    'count(' + _identificador_sql(col) + ')' for col in self.columnas) + ' FROM datos')[0]
+            self._renglones = int(conteos[0])
+            self._nulos = pd.Series([self._renglones - conteo for conteo in conteos[1:]], index=self.columnas,
+                                    dtype='int64')
+        return self._nulos
+
+    def vars_type(self):
+        """
+        Tabla de tipos (columnas tipo y variable) con los dtypes que tendría el data frame en pandas.
+        """
+        if self._vars_type is None:
+            nulos = self.nulos_por_columna()
+            tipos = []
+            for col in self.columnas:
+                tipo = self._tipos_base[col]
+                # igual que pandas: enteras con nulos pasan a float64, booleanas con nulos a object y una
+                # columna del csv sin ningún valor queda como float64
+                if isinstance(tipo, np.dtype) and tipo.kind in 'iu' and nulos[col] > 0:
+                    tipo = np.dtype('float64')
+                elif isinstance(tipo, np.dtype) and tipo.kind == 'b' and nulos[col] > 0:
+                    tipo = np.dtype('object')
+                if self.formato == 'csv' and 0 < self._renglones == nulos[col]:
+                    tipo = np.dtype('float64')
+                tipos.append(tipo)
+            vars_type = pd.DataFrame(pd.Series(tipos, index=self.columnas, dtype='object'), columns=['tipo'])
+            vars_type['variable'] = vars_type.index
+            self._vars_type = vars_type
+        return self._vars_type
+
+    def cuenta_duplicados(self):
+        """
+        Regresa el número de renglones que repiten a uno anterior (los nulos cuentan como iguales).
+        """
+        with _etapa('sql_duplicados', self.renglones):
+            distintos = self._consulta('SELECT count(*) FROM (SELECT DISTINCT * FROM datos)')[0][0]
+        return self.renglones - int(distintos)
+
+    def genera_profiling_general(self):
+        """
+        Regresa la misma tabla que genera_profiling_general(df).
+        """
+        nulos_totales = self.nulos_por_columna().sum()
+        return _arma_profiling_general(self.vars_type(), self.renglones, nulos_totales, self.cuenta_duplicados())
+
+    def genera_profiling_por_variable(self):
+        """
+        Regresa las mismas tablas que genera_profiling_por_variable(df).
+        """
+        vars_type = self.vars_type()
+        lista_numericas, lista_date, lista_category, lista_texto = separa_variables_por_tipo(vars_type)
+        tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
+
+        if len(lista_numericas)==0:
+            profiling_numericas = "No hay variables numéricas"
+        else:
+            estadisticos = self.estadisticos_numericos(lista_numericas)
+            profiling_numericas = _arma_profiling_de_numericos(lista_numericas, tipos, estadisticos)
+
+        if len(lista_category)==0:
+            profiling_categoricas = "No hay variables categóricas"
+        else:
+            # sólo el parquet y el cache Arrow tienen columnas category
+            with _etapa('sql_categoricas_pandas', self.renglones):
+                if self.formato == 'arrow':
+                    df = self._tabla_arrow.select(lista_category).to_pandas()
+                else:
+                    df = pd.read_parquet(self.ruta, columns=lista_category)
+            contexto = ContextoPerfilamiento(df)
+            profiling_categoricas = genera_profiling_de_categorias(df, lista_category, contexto.vars_type,
+                                                                   contexto=contexto)
+
+        if len(lista_texto)==0:
+            profiling_texto = "No hay variables de tipo texto"
+        else:
+            profiling_texto = pd.DataFrame(data={'metrica':LISTA_PERFILAMIENTO_TEXTO})
+            for col, datos_variable in zip(lista_texto, self.datos_texto(lista_texto)):
+                profiling_texto[col] = [tipos[col]] + datos_variable
+
+        return (profiling_numericas,profiling_categoricas,profiling_texto)
+
+    def estadisticos_numericos(self, lista_numericas, top=5):
+        """
+        Regresa los estadísticos de las numéricas con el formato de calcula_estadisticos_numericos.
+        """
+        agregados = []
+        for col in lista_numericas:
+            x = 'CAST(' + _identificador_sql(col) + ' AS DOUBLE)'
+            agregados += ['count(' + x + ')', 'fsum(' + x + ')', 'stddev_samp(' + x + ')',
+                          'quantile_cont(' + x + ', [0.25, 0.5, 0.75])', 'min(' + x + ')', 'max(' + x + ')',
+                          'count(DISTINCT ' + x + ')']
+        with _etapa('sql_numericas', self.renglones):
+            resultado = self._consulta('SELECT ' + ', '.join(agregados) + ' FROM datos')[0]
+
+        estadisticos = {llave: [] for llave in ('conteo', 'media', 'desviacion', 'cuartil_25', 'cuartil_50',
+                                                'cuartil_75', 'minimo', 'maximo', 'unicos')}
+        for j in range(len(lista_numericas)):
+            conteo, suma, desviacion, cuartiles, minimo, maximo, unicos = resultado[7 * j:7 * j + 7]
+            cuartiles = [np.nan] * 3 if cuartiles is None else cuartiles
+            estadisticos['conteo'].append(np.float64(conteo))
+            estadisticos['media'].append(np.float64(suma) / np.float64(conteo) if conteo > 0 else np.float64(np.nan))
+            estadisticos['desviacion'].append(_flotante_sql(desviacion))
+            for llave, cuartil in zip(('cuartil_25', 'cuartil_50', 'cuartil_75'), cuartiles):
+                estadisticos[llave].append(_flotante_sql(cuartil))
+            estadisticos['minimo'].append(_flotante_sql(minimo))
+            estadisticos['maximo'].append(_flotante_sql(maximo))
+            estadisticos['unicos'].append(int(unicos))
+        estadisticos = {llave: np.array(valores) for llave, valores in estadisticos.items()}
+        estadisticos['nulos'] = self.nulos_por_columna()[lista_numericas].to_numpy()
+        estadisticos['top5'] = self._top_repetidos(lista_numericas, estadisticos['unicos'], top)
+        return estadisticos
+
+    def _top_repetidos(self, lista_numericas, unicos, top):
+        """
+        Regresa el top de valores más repetidos de cada numérica (lista de Data Frames con la columna
+        conteo_top_5), con una sola consulta: las numéricas se leen una vez a una tabla temporal y de ahí sale
+        un GROUP BY por variable. El número de renglón es el rowid de esa tabla, que sigue el orden del archivo
+        porque la conexión conserva el orden de inserción (row_number() OVER () sin ORDER BY puede numerar en
+        otro orden cuando DuckDB usa varios hilos, y cambiaría los empates del top).
+        """
+        renglones = ', '.join('CAST(' + _identificador_sql(col) + ' AS DOUBLE) AS ' + _identificador_sql(col)
+                              for col in lista_numericas)
+        consultas = []
+        for j, (col, distintos) in enumerate(zip(lista_numericas, unicos)):
+            x = _identificador_sql(col)
+            frecuencia = ('SELECT ' + str(j) + ' AS variable, ' + x + ' AS valor, count(*) AS veces, '
+                          'min(rowid) AS primero FROM base WHERE ' + x + ' IS NOT NULL GROUP BY ' + x)
+            if distintos > self.maximo_distintos:
+                # con demasiados valores distintos sólo se traen los que alcanzan al top
+                frecuencia += (' QUALIFY veces >= coalesce(nth_value(veces, ' + str(top) + ') OVER (ORDER BY '
+                               'veces DESC ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING), 0)')
+            consultas.append(frecuencia)
+        consulta = 'SELECT * FROM (' + ' UNION ALL '.join(consultas) + ') ORDER BY variable, primero'
+        with _etapa('sql_top_numericas', self.renglones):
+            self.conexion.execute('CREATE OR REPLACE TEMP TABLE base AS SELECT ' + renglones + ' FROM datos')
+            try:
+                frecuencias = self.conexion.execute(consulta).fetchnumpy()
+            finally:
+                self.conexion.execute('DROP TABLE base')
+        limites = np.searchsorted(frecuencias['variable'], np.arange(len(lista_numericas) + 1))
+
+        vars_type = self.vars_type()
+        tipos = dict(zip(vars_type['variable'], vars_type['tipo']))
+        lista_top = []
+        for j, col in enumerate(lista_numericas):
+            de_columna = slice(limites[j], limites[j + 1])
+            # mismos valores que valores_numericos_canonicos: int64 en las enteras sin nulos
+            valores = np.asarray(frecuencias['valor'][de_columna], dtype='float64')
+            if familia_de_tipo(tipos[col]) == 'entera':
+                valores = valores.astype('uint64' if tipos[col] == 'uint64' else 'int64')
+            veces = np.asarray(frecuencias['veces'][de_columna], dtype='int64')
+
+            # vienen en orden de aparición (primero), igual que en calcula_estadisticos_numericos
+            lista_top.append(tabla_top_repetidos(pd.Series(veces, index=valores), top))
+        return lista_top
+
+    def datos_texto(self, lista_texto):
+        """
+        Regresa, por cada variable de texto, los renglones de su columna en el perfilamiento de texto (sin el
+        tipo), con una sola consulta para todas las variables.
+        """
+        agregados = []
+        for col in lista_texto:
+            x = 'CAST(' + _identificador_sql(col) + ' AS VARCHAR)'
+            agregados += ['count(DISTINCT ' + x + ')', 'sum(length(' + x + '))', 'min(length(' + x + '))',
+                          'max(length(' + x + '))']
+        with _etapa('sql_texto', self.renglones):
+            resultado = self._consulta('SELECT ' + ', '.join(agregados) + ' FROM datos')[0]
+
+        nulos = self.nulos_por_columna()
+        renglones = self.renglones
+        datos = []
+        for j, col in enumerate(lista_texto):
+            unicos, suma, minimo, maximo = resultado[4 * j:4 * j + 4]
+            conteo = renglones - nulos[col]
+            tam_prom = np.float64(suma) / conteo if conteo > 0 else np.float64(np.nan)
+            # como en str.len(): con nulos las longitudes son float64
+            if nulos[col] > 0:
+                tam_min, tam_max = _flotante_sql(minimo), _flotante_sql(maximo)
+            else:
+                tam_min, tam_max = np.int64(minimo), np.int64(maximo)
+            datos.append([renglones, int(unicos), int(unicos) / renglones, tam_prom, tam_min, tam_max])
+        return datos
+
+
+def _flotante_sql(valor):
+    """
+    Regresa un resultado de SQL como np.float64 (NaN si es NULL).
+    """
+    return np.float64(np.nan if valor is None else valor)
+
+
+def _literal_sql(texto):
+    """
+    Regresa texto como literal de SQL (entre comillas simples).
+    """
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+def _identificador_sql(nombre):
+    """
+    Regresa nombre como identificador de SQL (entre comillas dobles).
+    """
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def genera_profiling_sql(ruta, hilos=None, maximo_distintos=200000):
+    """
+    Función que genera el perfilamiento general y por variable con consultas de DuckDB directo sobre el
+    archivo (csv, parquet o cache Arrow), sin cargarlo en pandas (ver PerfilSQL). Entrega las mismas tablas
+    que genera_profiling_general y genera_profiling_por_variable.
+
+    ==========
+    * Args:
+         - ruta: ruta del csv, del parquet o del cache Arrow/Feather.
+         - hilos: número de hilos de DuckDB (por default, todos los núcleos).
+         - maximo_distintos: número máximo de valores distintos de una numérica para armar su top5 exacto.
+    * Return:
+         - perfilamiento_general: Data Frame con el perfilamiento general.
+         - profiling_numericas: Data Frame con el perfilamiento para las variables numéricas.
+         - profiling_categoricas: Data Frame con el perfilamiento para las variables categóricas
+         - profiling_de_texto: Data Frame con el perfilamiento para las variables de tipo texto
+    ==========
+    Ejemplo:
+        >>general,numericas,categoricas,texto = genera_profiling_sql('../data/consumo-agua.csv')
+    """
+    perfil = PerfilSQL(ruta, hilos, maximo_distintos)
+    profiling_numericas,profiling_categoricas,profiling_texto = perfil.genera_profiling_por_variable()
+    return perfil.genera_profiling_general(),profiling_numericas,profiling_categoricas,profiling_texto
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark
+
+
+@pytest.fixture(scope='session')
+def ruta_agua(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp('datos') / 'consumo-agua.csv')
+    pd.concat(benchmark.genera_consumo_agua(20000)).to_csv(ruta, index=False)
+    return ruta
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from src.algorithms import benchmark
+
+
+def test_genera_consumo_agua_repite_los_bloques_completos():
+    renglones = benchmark.RENGLONES_POR_BLOQUE
+    chico = pd.concat(benchmark.genera_consumo_agua(renglones, semilla=3), ignore_index=True)
+    grande = pd.concat(benchmark.genera_consumo_agua(renglones + 500, semilla=3), ignore_index=True)
+    assert list(chico.columns) == benchmark.ORDEN_COLUMNAS
+    assert len(grande) == renglones + 500
+    pd.testing.assert_frame_equal(chico, grande.iloc[:renglones])
+
+
+def test_estandariza_formato_se_mide_sobre_una_copia():
+    resultados = benchmark.corre_benchmarks([2000], funciones=['EstandarizaFormato', 'prepara_dataset'],
+                                            mide_memoria=False)
+    assert [r['funcion'] for r in resultados['resultados']] == ['EstandarizaFormato', 'prepara_dataset']
+
+
+def test_arriba_del_maximo_en_memoria_se_mide_por_bloques():
+    resultados = benchmark.corre_benchmarks([3000], mide_memoria=False, maximo_en_memoria=1000)
+    assert {r['funcion'] for r in resultados['resultados']} == set(benchmark.FUNCIONES_POR_BLOQUES)
+    assert {r['modo'] for r in resultados['resultados']} == {'bloques'}
+
+
+def test_compara_con_base_marca_regresiones():
+    base = {'resultados': [{'funcion': 'f', 'renglones': 10, 'modo': 'memoria', 'segundos': 1.0,
+                            'memoria_pico_bytes': 100}]}
+    nuevos = {'resultados': [{'funcion': 'f', 'renglones': 10, 'modo': 'memoria', 'segundos': 2.0,
+                              'memoria_pico_bytes': 100}]}
+    assert benchmark.compara_con_base(nuevos, base)['regresion'].all()
+    assert not benchmark.compara_con_base(base, base)['regresion'].any()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import eda
+
+
+def tabla_conteo_porcentaje_con_value_counts(df, nomColumna, booleanNA):
+    # el método original de CreaTablaConteoPorcentaje: dos value_counts
+    df_resultado = pd.DataFrame(data=df[nomColumna].value_counts(dropna=booleanNA))
+    df_resultado['porcentaje'] = df[nomColumna].value_counts(dropna=booleanNA,
+                                                             normalize=True).mul(100).round(2).astype(str) + '%'
+    return df_resultado
+
+
+def categorias_con_value_counts(df, lista_category, vars_type):
+    # las métricas originales de genera_profiling_de_categorias (nunique, isna, unique y value_counts)
+    tabla = pd.DataFrame({'metrica': eda.LISTA_PERFILAMIENTO_CATEGORICO})
+    for col in lista_category:
+        modas = tabla_conteo_porcentaje_con_value_counts(df, col, True)
+        modas.columns = ['conteo', 'porcentaje']
+        datos_modas = [[modas.index[i], modas['conteo'].iloc[i], modas['porcentaje'].iloc[i]] for i in range(3)]
+        nulos = df[col].isna().sum()
+        tabla[col] = [vars_type.loc[col, 'tipo'], df[col].nunique(), len(df), nulos, nulos / len(df),
+                      list(df[col].unique())] + datos_modas
+    return tabla
+
+
+def _columnas():
+    generador = np.random.default_rng(0)
+    n = 5000
+    colonias = ['colonia ' + str(i) for i in range(1800)]
+    return {
+        'con_nulos': pd.Categorical(generador.choice(['BAJO', 'MEDIO', 'ALTO', None], n, p=[.4, .3, .2, .1])),
+        # categorías sin renglones y en otro orden que el de aparición
+        'sin_usar': pd.Categorical(generador.choice(['b', 'c'], n), categories=['z', 'c', 'a', 'b']),
+        # más de 127 categorías: códigos int16
+        'muchas': pd.Categorical(generador.choice(colonias, n), categories=colonias),
+        'ordenada': pd.Categorical(generador.choice([3, 1, 2], n), categories=[1, 2, 3], ordered=True),
+        'solo_nulos': pd.Categorical([None] * n, categories=['a', 'b']),
+    }
+
+
+@pytest.mark.parametrize('nombre', list(_columnas()))
+@pytest.mark.parametrize('dropna', [True, False])
+def test_cuenta_categorias_igual_que_value_counts(nombre, dropna):
+    serie = pd.Series(_columnas()[nombre], name=nombre)
+    for parte in (serie, serie.iloc[:0]):
+        conteo = eda.cuenta_categorias(parte, dropna=dropna)
+        pd.testing.assert_series_equal(conteo['conteos'], parte.value_counts(dropna=dropna))
+        assert conteo['nulos'] == parte.isna().sum()
+        assert repr(list(conteo['unicos'])) == repr(list(parte.unique()))
+
+        df = pd.DataFrame({nombre: parte})
+        pd.testing.assert_frame_equal(eda.CreaTablaConteoPorcentaje(df, nombre, dropna),
+                                      tabla_conteo_porcentaje_con_value_counts(df, nombre, dropna))
+
+
+def test_perfil_de_categorias_igual_que_value_counts():
+    df = pd.DataFrame({nombre: valores for nombre, valores in _columnas().items() if nombre != 'solo_nulos'})
+    contexto = eda.ContextoPerfilamiento(df)
+    lista_category = contexto.listas[2]
+    assert lista_category == list(df.columns)
+    tabla = eda.genera_profiling_de_categorias(df, lista_category, contexto.vars_type)
+    esperado = categorias_con_value_counts(df, lista_category, contexto.vars_type)
+    assert tabla.astype(str).to_string() == esperado.astype(str).to_string()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark, eda
+
+
+def renglones_en_cero(df):
+    # el filtro del notebook Analisis_ceros
+    variables_numericas = [col for col in df.columns if col.startswith('consumo_')]
+    return df[df[variables_numericas].sum(axis=1) == 0]
+
+
+@pytest.fixture(scope='module')
+def agua():
+    df = pd.concat(benchmark.genera_consumo_agua(8000), ignore_index=True)
+    generador = np.random.default_rng(0)
+    # suficientes renglones en cero para todas las categorías
+    consumo = [col for col in df.columns if col.startswith('consumo_')]
+    df.loc[generador.random(len(df)) < 0.2, consumo] = 0.0
+    df.loc[generador.random(len(df)) < 0.02, 'colonia'] = np.nan
+    return eda.prepara_dataset(df)
+
+
+@pytest.mark.parametrize('tamano_bloque', [None, 1500])
+def test_ceros_igual_que_crosstab(agua, tamano_bloque):
+    proporcion, tablas, tablas_pares = eda.analiza_ceros(agua, tamano_bloque=tamano_bloque)
+    agua_cero = renglones_en_cero(agua)
+    assert proporcion == agua_cero.shape[0] / agua.shape[0]
+
+    for col in eda.VARIABLES_CATEGORICAS_CEROS:
+        esperado = pd.crosstab(index=agua_cero[col], columns='count')['count']
+        ceros = tablas[col]['ceros']
+        assert ceros[ceros > 0].sort_index().to_dict() == esperado.sort_index().to_dict()
+        renglones = agua[col].value_counts()
+        assert tablas[col]['renglones'].to_dict() == renglones[renglones > 0].to_dict()
+
+    for col_a, col_b in eda.PARES_CEROS:
+        esperado = pd.crosstab(index=agua_cero[col_a], columns=agua_cero[col_b])
+        tabla = tablas_pares[(col_a, col_b)]['ceros'].unstack(fill_value=0)
+        tabla = tabla.loc[tabla.sum(axis=1) > 0, tabla.sum(axis=0) > 0]
+        assert tabla.shape == esperado.shape
+        np.testing.assert_array_equal(tabla.loc[list(esperado.index), list(esperado.columns)].to_numpy(),
+                                      esperado.to_numpy())
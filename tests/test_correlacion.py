@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import correlacion
+
+
+def _df_prueba(n=20000):
+    generador = np.random.default_rng(0)
+    base = generador.normal(size=n)
+    df = pd.DataFrame({'consumo_total': np.exp(base) * 50,
+                       'consumo_prom': np.exp(base) * 25 + generador.normal(0, 5, n),
+                       'bimestre': generador.integers(1, 7, n),
+                       'latitud': 19.4 + generador.normal(0, 0.1, n),
+                       'domestico': generador.random(n) < 0.3})
+    df.loc[df.index[::7], 'consumo_prom'] = np.nan
+    df.loc[df.index[:300], 'latitud'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('precision, tolerancia', [('float64', 1e-12), ('float32', 1e-6)])
+def test_correlacion_y_covarianza_igual_que_pandas(precision, tolerancia):
+    df = _df_prueba()
+    por_bloques = correlacion.CorrelacionPorBloques(precision=precision)
+    for inicio in range(0, len(df), 3000):
+        por_bloques.actualiza(df.iloc[inicio:inicio + 3000])
+    pd.testing.assert_frame_equal(por_bloques.correlacion(), df.corr(), check_exact=False, rtol=0, atol=tolerancia)
+    covarianza = df.cov()
+    # la covarianza tiene la escala de las variables: se compara relativa a la diagonal
+    escala = np.sqrt(np.outer(np.diag(covarianza), np.diag(covarianza)))
+    assert (np.abs(por_bloques.covarianza().to_numpy() - covarianza.to_numpy()) <= tolerancia * escala).all()
+
+
+def test_combina_igual_que_un_solo_acumulador():
+    df = _df_prueba()
+    completo = correlacion.CorrelacionPorBloques().actualiza(df)
+    partes = correlacion.CorrelacionPorBloques().actualiza(df.iloc[:7000])
+    partes.combina(correlacion.CorrelacionPorBloques().actualiza(df.iloc[7000:]))
+    pd.testing.assert_frame_equal(partes.correlacion(), completo.correlacion(), check_exact=False, rtol=0,
+                                  atol=1e-12)
+    pd.testing.assert_frame_equal(partes.covarianza(), completo.covarianza(), check_exact=False, rtol=1e-12)
+
+
+def test_minimo_observaciones_igual_que_min_periods():
+    df = _df_prueba(2000)
+    df['escasa'] = np.nan
+    df.loc[df.index[:40], 'escasa'] = np.arange(40.0)
+    esperado = df.corr(min_periods=50)
+    obtenido = correlacion.genera_correlacion(df, tamano_bloque=300, minimo_observaciones=50)
+    pd.testing.assert_frame_equal(obtenido, esperado, check_exact=False, rtol=0, atol=1e-12)
+    assert obtenido['escasa'].isna().all()
+
+
+def test_en_paralelo_igual_que_en_serie():
+    df = _df_prueba()
+    en_serie = correlacion.genera_correlacion(df, tamano_bloque=3000)
+    en_paralelo = correlacion.genera_correlacion(df, tamano_bloque=3000, n_jobs=2)
+    pd.testing.assert_frame_equal(en_paralelo, en_serie, check_exact=False, rtol=0, atol=1e-12)
+    pd.testing.assert_frame_equal(en_paralelo, df.corr(), check_exact=False, rtol=0, atol=1e-12)
+
+
+def test_spearman_dentro_del_error_de_los_rangos():
+    df = _df_prueba().dropna()
+    esperado = df.corr(method='spearman')
+    # con k_cuantiles mayor que los valores de cada variable los rangos son exactos
+    exacto = correlacion.genera_correlacion(df, metodo='spearman', tamano_bloque=3000, k_cuantiles=len(df))
+    pd.testing.assert_frame_equal(exacto, esperado, check_exact=False, rtol=0, atol=1e-10)
+    aproximado = correlacion.genera_correlacion(df, metodo='spearman', tamano_bloque=3000, k_cuantiles=200)
+    assert (np.abs(aproximado - esperado).to_numpy() < 5e-4).all()
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from src.algorithms import eda
+
+
+def _duplicados_en_tabla(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        general = eda.genera_profiling_general(df)
+    return general.set_index('Estadisticas').loc['Renglones duplicados', 'Resultado']
+
+
+def test_duplicados_despues_de_modificar_el_data_frame():
+    df = pd.DataFrame({'a': [1, 2, 3, 4], 'b': ['x', 'y', 'z', 'w']})
+    assert eda.cuenta_duplicados(df) == 0
+    assert _duplicados_en_tabla(df) == 0
+
+    df.loc[1, ['a', 'b']] = df.loc[0, ['a', 'b']]
+    assert df.duplicated().sum() == 1
+    assert eda.cuenta_duplicados(df) == 1
+    assert _duplicados_en_tabla(df) == 1
+
+
+def test_duplicados_igual_que_pandas():
+    generador = np.random.default_rng(0)
+    df = pd.DataFrame({'a': generador.integers(0, 20, 5000), 'b': generador.choice(['x', None, 'z'], 5000),
+                       'c': generador.choice([0.0, -0.0, np.nan, 1.5], 5000)})
+    assert eda.cuenta_duplicados(df) == df.duplicated().sum()
+    assert (eda.marca_duplicados(df, ['a', 'c']) == df.duplicated(['a', 'c']).to_numpy()).all()
+
+
+def test_el_contexto_guarda_las_huellas():
+    df = pd.DataFrame({'a': [1, 1, 2], 'b': ['x', 'x', 'y']})
+    contexto = eda.ContextoPerfilamiento(df)
+    assert eda.cuenta_duplicados(df, contexto=contexto) == 1
+    assert list(contexto.huellas) == [('a', 'b')]
+    huellas = contexto.huellas[('a', 'b')]
+    assert eda.huellas_renglones(df, cache=contexto.huellas) is huellas
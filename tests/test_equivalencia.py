@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from src.algorithms import acumuladores, eda, sql
+
+SIN_SKETCHES = {'k_cuantiles': None, 'precision_hll': None, 'capacidad_top': None}
+
+
+def como_texto(tablas):
+    # sin variables de un tipo la tabla es un mensaje en lugar de un data frame
+    return [tabla if isinstance(tabla, str) else tabla.astype(str).to_string() for tabla in tablas]
+
+
+@pytest.fixture(scope='module')
+def exacto(ruta_agua):
+    df = pd.read_csv(ruta_agua)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tablas = (eda.genera_profiling_general(df),) + eda.genera_profiling_por_variable(df)
+    return df, como_texto(tablas)
+
+
+def test_por_bloques_igual_que_exacto(ruta_agua, exacto):
+    with contextlib.redirect_stdout(io.StringIO()):
+        perfil = acumuladores.PerfilPorBloques(**SIN_SKETCHES)
+        for bloque in pd.read_csv(ruta_agua, chunksize=3000):
+            perfil.actualiza(bloque)
+    tablas = (perfil.genera_profiling_general(),) + perfil.genera_profiling_por_variable()
+    assert como_texto(tablas) == exacto[1]
+
+
+def test_en_paralelo_igual_que_exacto(exacto):
+    df, esperado = exacto
+    assert como_texto(eda.genera_profiling_por_variable(df, n_jobs=2)) == esperado[1:]
+
+
+def test_duckdb_igual_que_exacto(ruta_agua, exacto):
+    pytest.importorskip('duckdb')
+    assert como_texto(sql.genera_profiling_sql(ruta_agua)) == exacto[1]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark, eda
+
+COLUMNAS_GRUPO = ['alcaldia', 'bimestre']
+COLUMNAS = ['consumo_total', 'consumo_prom_dom', 'indice_des', 'colonia']
+
+
+def sin_nan(llave):
+    # los grupos con llave nula se comparan con None
+    return tuple(None if pd.isna(parte) else parte for parte in llave)
+
+
+def moda_en_orden_de_aparicion(serie, orden):
+    conteos = serie.value_counts()
+    if len(conteos) == 0:
+        return np.nan, 0
+    # en un empate, el valor que aparece primero en todos los datos
+    modas = set(conteos.index[conteos == conteos.iloc[0]])
+    return next(valor for valor in orden if valor in modas), conteos.iloc[0]
+
+
+def por_grupos_filtrando(df, columnas_grupo, columnas):
+    # el método anterior: filtrar el data frame por grupo y perfilar cada pedazo
+    renglones = {}
+    ordenes = {col: df[col].dropna().unique() for col in columnas}
+    for clave, grupo in df.groupby(columnas_grupo, dropna=False):
+        for col in columnas:
+            serie = grupo[col]
+            nulos = serie.isnull().sum()
+            metricas = [len(serie), nulos, nulos / len(serie)]
+            if eda.familia_de_tipo(serie.dtype) in eda.FAMILIAS_NUMERICAS:
+                metricas += [round(serie.mean(), 2), round(serie.std(), 2), round(serie.min(), 2),
+                             round(serie.max(), 2)]
+                nombres = eda.LISTA_PERFILAMIENTO_GRUPO_NUMERICO
+            else:
+                metricas += [serie.nunique()] + list(moda_en_orden_de_aparicion(serie, ordenes[col]))
+                nombres = eda.LISTA_PERFILAMIENTO_GRUPO_CATEGORICO
+            for metrica, valor in zip(nombres, metricas):
+                renglones[clave + (col, metrica)] = valor
+    return renglones
+
+
+@pytest.fixture(scope='module')
+def agua():
+    df = pd.concat(benchmark.genera_consumo_agua(6000), ignore_index=True)
+    generador = np.random.default_rng(0)
+    # unos grupos con llave nula y una variable sin datos en algún grupo
+    df.loc[generador.random(len(df)) < 0.01, 'alcaldia'] = np.nan
+    df.loc[(df['alcaldia'] == df['alcaldia'].dropna().iloc[0]) & (df['bimestre'] == 1), 'consumo_prom_dom'] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('tamano_bloque', [None, 1000])
+def test_por_grupos_igual_que_filtrar_cada_grupo(agua, tamano_bloque):
+    tabla = eda.genera_profiling_por_grupos(agua, COLUMNAS_GRUPO, COLUMNAS, tamano_bloque=tamano_bloque)
+    esperado = por_grupos_filtrando(agua, COLUMNAS_GRUPO, COLUMNAS)
+    esperado = {sin_nan(llave): valor for llave, valor in esperado.items()}
+    assert len(tabla) == len(esperado)
+    for llave, valor in tabla['valor'].items():
+        referencia = esperado[sin_nan(llave)]
+        if isinstance(referencia, (float, np.floating)):
+            # las medias salen de sumas en otro orden: a lo más un centavo de diferencia al redondear
+            assert valor == pytest.approx(referencia, abs=0.0100001, nan_ok=True), llave
+        else:
+            assert valor == referencia, llave
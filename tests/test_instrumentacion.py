@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+import json
+
+import pandas as pd
+
+from src.algorithms import eda
+
+
+def perfila(df):
+    with contextlib.redirect_stdout(io.StringIO()) as salida:
+        tablas = (eda.genera_profiling_general(df),) + eda.genera_profiling_por_variable(df)
+    tablas = [tabla if isinstance(tabla, str) else tabla.astype(str).to_string() for tabla in tablas]
+    return tablas, salida.getvalue()
+
+
+def test_instrumentar_no_cambia_los_resultados(ruta_agua, tmp_path):
+    # preparado para que haya variables de los tres tipos
+    df = eda.prepara_dataset(pd.read_csv(ruta_agua, nrows=5000))
+    esperado = perfila(df)
+    ruta_log = str(tmp_path / 'perfilamiento.jsonl')
+    with eda.instrumenta(ruta_log, mide_memoria=True) as instrumentacion:
+        assert perfila(df) == esperado
+    # fuera del bloque ya no se registra nada
+    registros = len(instrumentacion.registros)
+    assert perfila(df) == esperado
+    assert len(instrumentacion.registros) == registros
+
+    tabla = instrumentacion.tabla()
+    etapas = set(tabla['etapa'])
+    assert {'tipos', 'nulos', 'duplicados', 'particion_tipos', 'numericas_bloque', 'numericas_unicos_top',
+            'categoricas', 'texto'} <= etapas
+    # una etapa por columna de cada tipo
+    numericas, _, categoricas, texto = eda.separa_variables_por_tipo(eda.ContextoPerfilamiento(df).vars_type)
+    for etapa, columnas in [('numericas_unicos_top', numericas), ('categoricas', categoricas), ('texto', texto)]:
+        assert sorted(tabla.loc[tabla['etapa'] == etapa, 'columna']) == sorted(columnas)
+    assert (tabla['renglones'].dropna() == len(df)).all()
+    assert (tabla['memoria_pico_bytes'] >= 0).all()
+
+    with open(ruta_log) as archivo:
+        assert [json.loads(linea) for linea in archivo] == instrumentacion.registros
+    assert instrumentacion.resumen()['veces'].sum() == len(tabla)
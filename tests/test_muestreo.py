@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from src.algorithms import eda, muestreo
+
+
+def _menores_ordenando(estratos, prioridades, tamano):
+    elegidos = [np.flatnonzero(estratos == estrato)[np.argsort(prioridades[estratos == estrato])[:tamano]]
+                for estrato in np.unique(estratos)]
+    return np.sort(np.concatenate(elegidos))
+
+
+def test_menores_por_estrato_igual_que_ordenar():
+    generador = np.random.default_rng(0)
+    estratos = generador.choice(6, 3000, p=[0.5, 0.3, 0.1, 0.05, 0.04, 0.01])
+    prioridades = generador.random(3000)
+    for tamano in [1, 10, 40, 400]:
+        esperado = _menores_ordenando(estratos, prioridades, tamano)
+        np.testing.assert_array_equal(muestreo._menores_por_estrato(estratos, prioridades, tamano), esperado)
+
+    # prioridades que no son uniformes: el umbral no alcanza y se toma el estrato completo
+    sesgadas = prioridades ** 8
+    np.testing.assert_array_equal(muestreo._menores_por_estrato(estratos, sesgadas, 40),
+                                  _menores_ordenando(estratos, sesgadas, 40))
+
+
+def test_muestra_estratificada_por_bloques():
+    generador = np.random.default_rng(1)
+    df = pd.DataFrame({'alcaldia': generador.choice(['a', 'b', 'c', None], 20000),
+                       'consumo': generador.gamma(2.0, 10.0, 20000)})
+    muestra = muestreo.MuestraEstratificada('alcaldia', 300)
+    for inicio in range(0, len(df), 3000):
+        muestra.actualiza(df.iloc[inicio:inicio + 3000])
+    conteos = df['alcaldia'].value_counts(dropna=False)
+    assert muestra.renglones_estrato.sum() == len(df)
+    assert (np.bincount(muestra.estratos) == 300).all()
+    assert sorted(muestra.renglones_estrato) == sorted(conteos)
+    assert not muestra.muestra.index.duplicated().any()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from src.algorithms import eda
+
+
+def test_estandariza_texto_igual_a_los_pasos_originales():
+    serie = pd.Series(['  Álvaro  Obregón ', 'COYOACÁN', None, 'Peñón', 3, 'coyoacan'])
+    esperado = eda.StringEspacios(eda.StringStrip(eda.StringAcentos(eda.StringLowercase(
+        pd.DataFrame({'x': serie})))))['x']
+    pd.testing.assert_series_equal(eda.EstandarizaTexto(serie), esperado, check_names=False)
+
+
+def test_estandariza_texto_conserva_el_orden_de_las_categorias():
+    serie = pd.Series(pd.Categorical(['Bajo', 'Medio', 'Alto', ' alto'], categories=['Bajo', 'Medio', 'Alto', ' alto'],
+                                     ordered=True))
+    resultado = eda.EstandarizaTexto(serie)
+    assert list(resultado.cat.categories) == ['bajo', 'medio', 'alto']
+    assert resultado.cat.ordered
+    assert list(resultado < 'alto') == [True, True, False, False]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from src.algorithms import eda
+
+
+def _df_con_nulos(n=5000, columnas=14):
+    generador = np.random.default_rng(0)
+    datos = generador.normal(size=(n, columnas))
+    # cada renglón con 0, 1 o 2 nulos (más el del texto)
+    renglones = np.arange(n)
+    datos[renglones, generador.integers(0, columnas, n)] = np.where(generador.random(n) < 0.2, np.nan, 1.0)
+    datos[renglones, generador.integers(0, columnas, n)] = np.where(generador.random(n) < 0.1, np.nan, 1.0)
+    df = pd.DataFrame(datos, columns=['c' + str(j) for j in range(columnas)], index=np.arange(n) * 3)
+    df['texto'] = np.where(generador.random(n) < 0.05, None, 'x')
+    return df
+
+
+def nulos_por_renglon_con_ciclo(df, top=10, kind='quicksort'):
+    # la tabla original: un isnull().sum() por renglón y un sort_values de todos los renglones
+    arreglo_renglones = []
+    arreglo_nulos = []
+    for i in range(len(df.index)):
+        arreglo_renglones.append("Nan in row " + str(i))
+        arreglo_nulos.append(df.iloc[i].isnull().sum())
+    tabla = pd.DataFrame(data={'renglon': arreglo_renglones, 'valores_nulos': arreglo_nulos})
+    tabla = tabla.loc[tabla['valores_nulos'] > 0]
+    return tabla.sort_values('valores_nulos', ascending=False, kind=kind).head(top)
+
+
+def test_top_de_renglones_igual_que_el_ciclo():
+    df = _df_con_nulos()
+    # renglones con 4 a 13 nulos: el top 10 no tiene empates
+    for k, renglon in enumerate(np.random.default_rng(1).choice(len(df), 10, replace=False)):
+        df.iloc[renglon] = [1.0] * (df.shape[1] - 1) + ['x']
+        df.iloc[renglon, :k + 4] = np.nan
+    pd.testing.assert_frame_equal(eda.cuenta_nulos_por_renglones_tabla(df), nulos_por_renglon_con_ciclo(df),
+                                  check_index_type=False)
+
+
+def test_empates_en_orden_de_renglon():
+    df = _df_con_nulos(2000)
+    for top in (1, 10, 500, 5000):
+        esperado = nulos_por_renglon_con_ciclo(df, top, kind='stable')
+        pd.testing.assert_frame_equal(eda.cuenta_nulos_por_renglones_tabla(df, top), esperado,
+                                      check_index_type=False)
+
+
+def test_histograma_igual_que_isnull():
+    df = _df_con_nulos()
+    _, histograma = eda.cuenta_nulos_por_renglones_tabla(df, regresa_histograma=True)
+    esperado = df.isnull().sum(axis=1).value_counts().sort_index()
+    assert list(histograma['valores_nulos']) == list(esperado.index)
+    assert list(histograma['renglones']) == list(esperado)
+
+
+def nulos_por_columnas_con_isnull(df):
+    # la tabla original: dos df.isnull() completos
+    tabla = pd.concat([df.isnull().sum(), 100 * df.isnull().sum() / len(df)], axis=1)
+    tabla = tabla.rename(columns={0: 'Missing Values', 1: '% del Total'})
+    return tabla[tabla.iloc[:, 1] != 0].sort_values('% del Total', ascending=False).round(1)
+
+
+def profiling_general_con_isnull(df):
+    # los conteos originales de genera_profiling_general (isnull, dtypes y duplicated)
+    total_celdas = df.shape[0] * df.shape[1]
+    tipos = df.dtypes.astype(str)
+    nulos_totales = nulos_por_columnas_con_isnull(df)['Missing Values'].sum()
+    duplicados = len(df.loc[df.duplicated(keep='first')])
+    return [df.shape[1], len(df), total_celdas, int(tipos.isin(['int64', 'float64']).sum()),
+            int((tipos == 'Date').sum()), int((tipos == 'category').sum()), int((tipos == 'object').sum()),
+            nulos_totales, ((nulos_totales / total_celdas) * 100).round(1).astype(str) + '%',
+            duplicados, str((duplicados / total_celdas) * 100) + '%']
+
+
+def _df_mixto(n=3001):
+    # un número de renglones que no es múltiplo de 8 para la máscara empaquetada
+    df = _df_con_nulos(n, 4)
+    generador = np.random.default_rng(2)
+    df['entera'] = generador.integers(0, 3, n)
+    df['categoria'] = pd.Categorical(generador.choice(['a', 'b', None], n))
+    df.iloc[n // 2:n // 2 + 40] = df.iloc[:40].to_numpy()
+    return df
+
+
+def test_contexto_compartido_igual_que_isnull():
+    df = _df_mixto()
+    contexto = eda.ContextoPerfilamiento(df)
+    with contextlib.redirect_stdout(io.StringIO()) as salida:
+        general = eda.genera_profiling_general(df, contexto)
+        columnas = eda.cuenta_nulos_por_columnas(df, contexto)
+        renglones = eda.cuenta_nulos_por_renglones(df, contexto)
+    assert general['Resultado'].astype(str).tolist() == [str(valor) for valor in profiling_general_con_isnull(df)]
+    pd.testing.assert_frame_equal(columnas, nulos_por_columnas_con_isnull(df))
+    assert renglones == sum(df.apply(lambda x: sum(x.isnull().values), axis=1) > 0)
+
+    # sin contexto se imprime y se regresa lo mismo
+    with contextlib.redirect_stdout(io.StringIO()) as salida_sin_contexto:
+        eda.genera_profiling_general(df)
+        eda.cuenta_nulos_por_columnas(df)
+        eda.cuenta_nulos_por_renglones(df)
+    assert salida.getvalue() == salida_sin_contexto.getvalue()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from src.algorithms import eda
+
+
+def _con_repetidos(generador, valores_repetidos, resto):
+    # los valores repetidos aparecen 800, 700, ..., 100 veces: el orden del top no depende de los empates
+    repetidos = np.repeat(valores_repetidos, np.arange(800, 800 - 100 * len(valores_repetidos), -100))
+    return generador.permutation(np.concatenate([repetidos, resto]))
+
+
+def _df_prueba(n=30000):
+    generador = np.random.default_rng(0)
+    resto = n - 3600
+    df = pd.DataFrame({'consumo_total': _con_repetidos(generador, np.arange(8) * 12.5,
+                                                       generador.gamma(2.0, 50.0, resto)),
+                       'bimestre': _con_repetidos(generador, np.arange(8), generador.integers(10, 10 ** 6, resto)),
+                       'nomgeo': np.nan})
+    df['consumo_prom'] = _con_repetidos(generador, np.arange(8) / 4, np.full(resto, np.nan))
+    df.loc[df.index[:3], 'nomgeo'] = 1.0
+    return df
+
+
+def numericas_con_describe(df, lista_numericas):
+    # el perfilamiento original: describe(), nunique, value_counts e isna por columna
+    tabla = pd.DataFrame({'metrica': eda.LISTA_PERFILAMIENTO_NUMERICO})
+    for col in lista_numericas:
+        descripcion = df[col].describe()
+        top5 = pd.DataFrame(df[col].value_counts(dropna=True))
+        top5.columns = ['conteo_top_5']
+        top5 = top5.sort_values('conteo_top_5', ascending=False).head(5)
+        tabla[col] = [df[col].dtype, descripcion['count'], descripcion['mean'].round(2), descripcion['std'].round(2),
+                      descripcion['25%'].round(2), descripcion['50%'].round(2), descripcion['75%'].round(2),
+                      descripcion['min'].round(2), descripcion['max'].round(2), df[col].nunique(), top5]
+    return tabla
+
+
+def test_numericas_igual_que_describe_por_columna():
+    df = _df_prueba()
+    lista_numericas = ['bimestre', 'consumo_total', 'nomgeo', 'consumo_prom']
+    esperado = numericas_con_describe(df, lista_numericas)
+    obtenido = eda.genera_profiling_de_numericos(df, lista_numericas, eda.ContextoPerfilamiento(df).vars_type)
+    assert list(obtenido['metrica']) == list(esperado['metrica'])
+    for col in lista_numericas:
+        for valor, valor_esperado in zip(obtenido[col][:-1], esperado[col][:-1]):
+            assert valor == valor_esperado or (pd.isna(valor) and pd.isna(valor_esperado))
+        pd.testing.assert_frame_equal(obtenido[col].iloc[-1], esperado[col].iloc[-1])
+
+
+def test_top_repetidos_empates_en_orden_de_aparicion():
+    serie = pd.Series([4.0, 7.0, 7.0, 1.0, 4.0, 9.0, 1.0, np.nan, 2.0, 9.0, 2.0])
+    top5 = eda.calcula_estadisticos_numericos(pd.DataFrame({'x': serie}), ['x'])['top5'][0]
+    assert list(top5.index) == [4.0, 7.0, 1.0, 9.0, 2.0]
+    assert list(top5['conteo_top_5']) == [2] * 5
+
+
+def test_precision_hll_sin_capacidad_top_da_unicos_exactos():
+    df = _df_prueba()
+    exacto = eda.calcula_estadisticos_numericos(df, ['bimestre', 'consumo_total'])
+    # sin capacidad_top el top exacto ya factoriza la columna y los únicos salen exactos de ahí
+    sin_top = eda.calcula_estadisticos_numericos(df, ['bimestre', 'consumo_total'], precision_hll=8)
+    assert list(sin_top['unicos']) == list(exacto['unicos'])
+    acotado = eda.calcula_estadisticos_numericos(df, ['bimestre', 'consumo_total'], precision_hll=8,
+                                                 capacidad_top=100)
+    assert (np.abs(acotado['unicos'] / exacto['unicos'] - 1) < 4 * 1.04 / np.sqrt(2 ** 8)).all()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from src.algorithms import eda, paralelo
+
+
+def _df_prueba(n=3000):
+    generador = np.random.default_rng(0)
+    df = pd.DataFrame({'consumo': generador.gamma(2.0, 10.0, n),
+                       'bimestre': pd.array(generador.integers(1, 7, n), dtype='Int64'),
+                       'alcaldia': pd.Categorical(generador.choice(['coyoacan', 'tlalpan', None], n)),
+                       'colonia': generador.choice(['del valle', 'ñañá', '', None], n).astype(object),
+                       'mixta': generador.choice([1, 'a', None], n).astype(object),
+                       'arrow': pd.Series(generador.choice(['α', 'b', None], n)).astype('string[pyarrow]')})
+    df.loc[:2, 'colonia'] = np.nan
+    return df
+
+
+def test_paralelo_igual_que_en_serie():
+    df = _df_prueba()
+    for motor in ['pandas', 'arrow']:
+        en_serie = eda.genera_profiling_por_variable(df, motor_texto=motor)
+        contexto = eda.ContextoPerfilamiento(df)
+        contexto.nulos_por_columna()
+        contexto.conteo_valores('colonia')
+        en_paralelo = eda.genera_profiling_por_variable(df, n_jobs=2, contexto=contexto, motor_texto=motor)
+        for tabla_serie, tabla_paralelo in zip(en_serie, en_paralelo):
+            assert repr(tabla_serie) == repr(tabla_paralelo)
+
+
+def test_texto_viaja_como_buffers_de_arrow():
+    serie = pd.Series(['hola', None, '', 'ñandú'], dtype=object)
+    offsets, nulos, datos = paralelo._buffers_texto(serie)
+    assert list(offsets) == [0, 4, 4, 4, 11]
+    assert list(nulos) == [False, True, False, False]
+    valores = paralelo._texto_de_buffers(offsets, nulos, datos)
+    assert list(valores[[0, 2, 3]]) == ['hola', '', 'ñandú'] and np.isnan(valores[1])
+    assert paralelo._buffers_texto(pd.Series([1, 'a'], dtype=object)) is None
+
+
+def test_enteros_con_mascara_viajan_exactos():
+    # enteros que no caben exactos en float64: 2**53 y 2**53 + 1 son el mismo flotante
+    grandes = np.array([2 ** 53, 2 ** 53 + 1, 2 ** 53 + 3, 7] * 50, dtype='int64')
+    serie = pd.Series(pd.array(grandes, dtype='Int64'), name='grandes')
+    serie[::9] = pd.NA
+    arreglos, extra = paralelo._arreglo_compartible(serie, 'numerica')
+    assert [arreglo.dtype for arreglo in arreglos] == [np.dtype('int64'), np.dtype('bool')]
+    reconstruida = extra[1].construct_array_type()(*arreglos)
+    pd.testing.assert_extension_array_equal(reconstruida, serie.array)
+
+    df = serie.to_frame()
+    en_serie = eda.genera_profiling_por_variable(df)
+    en_paralelo = eda.genera_profiling_por_variable(df, n_jobs=2)
+    assert repr(en_serie) == repr(en_paralelo)
+
+
+def test_un_solo_segmento_para_todas_las_columnas(monkeypatch):
+    df = pd.concat([_df_prueba(500).add_suffix('_' + str(i)) for i in range(8)], axis=1)
+    creados = []
+    original = paralelo.shared_memory.SharedMemory
+
+    def registra(*args, **kwargs):
+        memoria = original(*args, **kwargs)
+        if kwargs.get('create'):
+            creados.append(memoria.name)
+        return memoria
+
+    monkeypatch.setattr(paralelo.shared_memory, 'SharedMemory', registra)
+    en_paralelo = eda.genera_profiling_por_variable(df, n_jobs=2)
+    assert len(creados) == 1
+    monkeypatch.undo()
+    assert repr(eda.genera_profiling_por_variable(df)) == repr(en_paralelo)
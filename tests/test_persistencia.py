@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import acumuladores, sketches
+
+
+def _df_prueba(n=4000):
+    generador = np.random.default_rng(0)
+    df = pd.DataFrame({'consumo': generador.gamma(2.0, 10.0, n),
+                       'bimestre': pd.array(generador.integers(1, 7, n), dtype='Int64'),
+                       'alcaldia': pd.Categorical(generador.choice(['coyoacan', 'tlalpan', None], n)),
+                       'colonia': generador.choice(['del valle', 'ñañá', '', None], n).astype(object)})
+    df.loc[df.index[::11], 'consumo'] = np.nan
+    return df
+
+
+def _tablas(perfil):
+    return [repr(tabla) for tabla in (perfil.genera_profiling_general(),) + perfil.genera_profiling_por_variable()]
+
+
+@pytest.mark.parametrize('parametros', [(None, None, None), (50, 10, 20)])
+def test_guarda_y_carga_igual_que_sin_guardar(tmp_path, parametros):
+    df = _df_prueba()
+    ruta = str(tmp_path / 'perfil.npz')
+    continuo = acumuladores.PerfilPorBloques(*parametros)
+    for inicio in range(0, len(df), 1000):
+        bloque = df.iloc[inicio:inicio + 1000]
+        continuo.actualiza(bloque)
+        if inicio == 0:
+            perfil = acumuladores.PerfilPorBloques(*parametros)
+        else:
+            perfil = acumuladores.PerfilPorBloques.carga(ruta)
+        perfil.actualiza(bloque).guarda(ruta)
+    assert _tablas(acumuladores.PerfilPorBloques.carga(ruta)) == _tablas(continuo)
+
+
+def test_conteo_de_valores_sin_pickle():
+    for serie in [pd.Series(['ñandú', 'b', None, 'ñandú']), pd.Series([1.5, np.nan, 2.0, 1.5]),
+                  pd.Series([1, 'a', True, 'a'], dtype=object)]:
+        conteo = sketches.ConteoDeValores()
+        conteo.actualiza(serie, 0)
+        arreglos = {}
+        estado = json.loads(json.dumps(conteo.estado(arreglos, 'conteo')))
+        assert all(arreglo.dtype != object for arreglo in arreglos.values())
+        cargado = sketches.ConteoDeValores.de_estado(estado, arreglos, 'conteo')
+        pd.testing.assert_frame_equal(cargado.tabla(), conteo.tabla())
+
+
+def test_carga_rechaza_otra_version(tmp_path):
+    ruta = str(tmp_path / 'perfil.npz')
+    acumuladores.PerfilPorBloques().actualiza(_df_prueba(100)).guarda(ruta)
+    with np.load(ruta) as arreglos:
+        arreglos = dict(arreglos)
+    estado = json.loads(str(arreglos['estado']))
+    estado['version'] = acumuladores.VERSION_ESTADO_PERFIL + 1
+    arreglos['estado'] = np.array(json.dumps(estado))
+    with open(ruta, 'wb') as archivo:
+        np.savez(archivo, **arreglos)
+    with pytest.raises(ValueError):
+        acumuladores.PerfilPorBloques.carga(ruta)
+
+
+def test_actualizar_no_reescribe_las_huellas_anteriores(tmp_path):
+    df = _df_prueba(40000)
+    df['id'] = np.arange(len(df))
+    ruta = str(tmp_path / 'perfil.npz')
+    directorio = tmp_path / 'perfil_huellas'
+    acumuladores.actualiza_perfil_persistido(ruta, df.iloc[:32000])
+    inicial = {archivo.name: archivo.stat().st_mtime_ns for archivo in directorio.iterdir()}
+    assert sum((directorio / nombre).stat().st_size for nombre in inicial) > 32000 * 8
+
+    continuo = acumuladores.PerfilPorBloques().actualiza(df.iloc[:32000])
+    for inicio in range(32000, len(df), 2000):
+        bloque = df.iloc[inicio:inicio + 2000]
+        antes = {archivo.name for archivo in directorio.iterdir()}
+        acumuladores.actualiza_perfil_persistido(ruta, bloque)
+        continuo.actualiza(bloque)
+        nuevos = [archivo for archivo in directorio.iterdir() if archivo.name not in antes]
+        # lo que se escribe depende de los renglones que llegaron después del primer lote, no de él
+        assert sum(archivo.stat().st_size for archivo in nuevos) <= (inicio + 2000 - 32000) * 8 + 128
+    # la corrida grande del primer lote sigue siendo el mismo archivo, sin reescribir
+    mayor = max(inicial, key=lambda nombre: (directorio / nombre).stat().st_size)
+    assert (directorio / mayor).stat().st_mtime_ns == inicial[mayor]
+    assert _tablas(acumuladores.PerfilPorBloques.carga(ruta)) == _tablas(continuo)
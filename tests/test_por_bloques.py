@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import acumuladores, eda
+
+SIN_SKETCHES = {'k_cuantiles': None, 'precision_hll': None, 'capacidad_top': None}
+
+
+@pytest.fixture(scope='module')
+def en_memoria(ruta_agua):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = eda.prepara_dataset(pd.read_csv(ruta_agua))
+        tablas = (eda.genera_profiling_general(df),) + eda.genera_profiling_por_variable(df)
+    return df, tablas
+
+
+def test_por_bloques_exacto_igual_que_en_memoria(ruta_agua, en_memoria):
+    with contextlib.redirect_stdout(io.StringIO()):
+        por_bloques = acumuladores.genera_profiling_por_bloques(ruta_agua, 3000, **SIN_SKETCHES)
+    assert [repr(tabla) for tabla in por_bloques] == [repr(tabla) for tabla in en_memoria[1]]
+
+
+def test_combina_igual_que_en_un_solo_perfil(en_memoria):
+    df = en_memoria[0]
+    mitad = len(df) // 2
+    primera = df.iloc[:mitad].copy()
+    # una categórica sin ningún valor en la primera mitad: su tipo sale de la segunda
+    primera['indice_des'] = pd.Categorical([np.nan] * mitad)
+    completo = acumuladores.PerfilPorBloques(**SIN_SKETCHES).actualiza(primera).actualiza(df.iloc[mitad:])
+    perfil = acumuladores.PerfilPorBloques(**SIN_SKETCHES).actualiza(primera)
+    perfil.combina(acumuladores.PerfilPorBloques(**SIN_SKETCHES).actualiza(df.iloc[mitad:]))
+    assert [repr(tabla) for tabla in perfil.genera_profiling_por_variable()] == \
+        [repr(tabla) for tabla in completo.genera_profiling_por_variable()]
+    assert repr(perfil.genera_profiling_general()) == repr(completo.genera_profiling_general())
+
+
+def test_por_bloques_acotado_dentro_de_sus_cotas(ruta_agua, en_memoria):
+    df, tablas = en_memoria
+    with contextlib.redirect_stdout(io.StringIO()):
+        general, numericas, _, texto = acumuladores.genera_profiling_por_bloques(ruta_agua, 3000)
+    assert repr(general) == repr(tablas[0])
+    assert repr(texto) == repr(tablas[3])
+
+    numericas = numericas.set_index('metrica')
+    for col in numericas.columns:
+        valores = df[col].dropna().to_numpy(dtype='float64')
+        for q, metrica in [(0.25, 'cuartil 25%'), (0.5, 'cuartil 50%'), (0.75, 'cuartil 75%')]:
+            _, inferior, superior = numericas.loc[metrica + '/cota inferior/cota superior', col]
+            assert inferior - 0.01 <= np.quantile(valores, q) <= superior + 0.01
+
+
+def test_booleanas_y_fechas_por_bloques():
+    df = pd.DataFrame({'domestico': [True, False, None, True] * 50,
+                       'fecha': pd.to_datetime(['2019-01-01', None, '2019-03-01', '2019-05-01'] * 50),
+                       'consumo': np.arange(200.0)}).astype({'domestico': 'boolean'})
+    perfil = acumuladores.PerfilPorBloques(**SIN_SKETCHES)
+    for inicio in range(0, len(df), 30):
+        perfil.actualiza(df.iloc[inicio:inicio + 30])
+    assert repr(perfil.genera_profiling_general()) == repr(eda.genera_profiling_general(df))
+    assert list(perfil.vars_type()['tipo']) == list(df.dtypes)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import eda
+
+
+def geo_point_con_split(serie):
+    # el método original de prepara_dataset
+    new = serie.str.split(",", n = 1, expand = True).reindex(columns=[0, 1])
+    return new[0].astype('float64').to_numpy(), new[1].astype('float64').to_numpy()
+
+
+@pytest.mark.parametrize('valores', [
+    ['19.4326,-99.1332', '19.3,-99.2', np.nan, ' 19.5, -99.05'],
+    ['19.4', '19.5'],
+    [np.nan, np.nan],
+    [],
+])
+def test_parsea_geo_point_igual_que_split(valores):
+    serie = pd.Series(valores, dtype='object')
+    latitud, longitud = eda.parsea_geo_point(serie)
+    esperado_latitud, esperado_longitud = geo_point_con_split(serie)
+    np.testing.assert_array_equal(latitud, esperado_latitud)
+    np.testing.assert_array_equal(longitud, esperado_longitud)
+
+
+@pytest.mark.parametrize('valores', [
+    ['1.5,2.5,3.5', '4.0,5.0,6.0'],
+    ['19.4,-99.1', '19.5,-99.2,7'],
+    ['19.4,-99.1', ''],
+    ['19.4,-99.1', 'sin coordenadas'],
+    ['19.4,-99.1,'],
+])
+def test_parsea_geo_point_mal_formado_falla_igual_que_split(valores):
+    serie = pd.Series(valores, dtype='object')
+    with pytest.raises(ValueError) as error_split:
+        geo_point_con_split(serie)
+    with pytest.raises(ValueError) as error:
+        eda.parsea_geo_point(serie)
+    assert str(error.value) == str(error_split.value)
+
+
+def test_carga_dataset_preparado_igual_que_read_csv(ruta_agua, tmp_path):
+    esperado = eda.prepara_dataset(pd.read_csv(ruta_agua))
+    directorio = str(tmp_path / 'cache')
+    # la primera carga prepara y escribe el cache, la segunda lo abre con memory map
+    for _ in range(2):
+        df = eda.carga_dataset_preparado(ruta_agua, directorio_cache=directorio)
+        pd.testing.assert_frame_equal(df, esperado)
+    assert len([nombre for nombre in os.listdir(directorio) if nombre.endswith('.arrow')]) == 1
+
+
+def test_carga_dataset_preparado_con_geo_shape_diferido(ruta_agua, tmp_path):
+    esperado = eda.prepara_dataset(pd.read_csv(ruta_agua))
+    directorio = str(tmp_path / 'cache')
+    for _ in range(2):
+        df = eda.carga_dataset_preparado(ruta_agua, directorio_cache=directorio, geo_shape_diferido=True)
+        pd.testing.assert_frame_equal(df, esperado.drop(columns=['geo_shape']))
+        pd.testing.assert_series_equal(df.attrs['geo_shape'].serie(), esperado['geo_shape'])
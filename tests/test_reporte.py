@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark, eda
+
+# métrica del reporte -> renglón de describe() (la tabla de numéricas va redondeada)
+EQUIVALENCIAS_DESCRIBE = {'media': 'mean', 'desviacion': 'std', 'cuartil_25': '25%', 'mediana': '50%',
+                          'cuartil_75': '75%', 'minimo': 'min', 'maximo': 'max'}
+
+# métrica del reporte -> renglón de la tabla de genera_profiling_por_variable
+EQUIVALENCIAS = {
+    'numericas': {'unicos': 'numero de observaciones unicas'},
+    'categoricas': {'unicos': 'numero de categorias', 'nulos': 'observaciones nulas',
+                    'proporcion_nulos': '% observaciones nulas'},
+    'texto': {'unicos': 'observaciones unicas', 'longitud_promedio': 'tamano promedio',
+              'longitud_minima': 'tamano minmo', 'longitud_maxima': 'tamano maximo'},
+}
+
+
+@pytest.fixture(scope='module')
+def agua():
+    df = eda.prepara_dataset(pd.concat(benchmark.genera_consumo_agua(4000), ignore_index=True))
+    df.loc[::5, 'geo_shape'] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def completo(agua):
+    with contextlib.redirect_stdout(io.StringIO()):
+        tablas = eda.genera_profiling_por_variable(agua)
+    return dict(zip(['numericas', 'categoricas', 'texto'], tablas))
+
+
+def test_reporte_igual_que_el_perfilamiento_completo(agua, completo):
+    reporte = eda.genera_reporte(agua)
+    assert reporte.secciones() == ['numericas', 'categoricas', 'texto']
+    for seccion, equivalencias in EQUIVALENCIAS.items():
+        tabla = reporte[seccion].set_index('metrica')
+        esperado = completo[seccion].set_index('metrica')
+        assert sorted(tabla.columns) == sorted(esperado.columns)
+        for metrica, renglon in equivalencias.items():
+            for col in tabla.columns:
+                assert tabla.loc[metrica, col] == pytest.approx(esperado.loc[renglon, col], rel=1e-12,
+                                                                nan_ok=True), (metrica, col)
+
+    numericas = reporte['numericas'].set_index('metrica')
+    describe = agua[list(numericas.columns)].describe()
+    for metrica, renglon in EQUIVALENCIAS_DESCRIBE.items():
+        np.testing.assert_allclose(numericas.loc[metrica].astype('float64'), describe.loc[renglon], rtol=1e-12)
+
+    # modas y nulos contra pandas
+    for seccion in ('numericas', 'categoricas', 'texto'):
+        tabla = reporte[seccion].set_index('metrica')
+        for col in tabla.columns:
+            conteos = agua[col].value_counts()
+            assert tabla.loc['nulos', col] == agua[col].isna().sum()
+            assert tabla.loc['conteo', col] == agua[col].count()
+            assert tabla.loc['veces_moda', col] == conteos.iloc[0]
+            assert conteos[tabla.loc['moda', col]] == conteos.iloc[0]
+            assert list(tabla.loc['top5', col]) == list(conteos.head(5))
+
+
+def test_solo_nulos_calcula_solo_la_mascara(agua):
+    plan = eda.PlanPerfilamiento(agua, ['proporcion_nulos'])
+    assert set(plan.pasos()['intermedio']) == {'mascara_nulos'}
+    with eda.instrumenta() as instrumentacion:
+        reporte = plan.reporte()
+        # nada se calcula hasta que se pide una sección
+        assert instrumentacion.registros == []
+        numericas = reporte['numericas']
+    assert {registro['etapa'] for registro in instrumentacion.registros} == {'intermedio_mascara_nulos'}
+    esperado = agua[numericas.columns[1:]].isna().mean()
+    assert numericas.set_index('metrica').loc['proporcion_nulos'].to_dict() == esperado.to_dict()
+
+
+def test_metrica_desconocida(agua):
+    with pytest.raises(ValueError):
+        eda.genera_reporte(agua, ['media', 'curtosis'])
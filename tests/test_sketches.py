@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from src.algorithms import sketches
+
+
+def test_hyperloglog_exacto_bajo_el_umbral():
+    serie = pd.Series(np.random.default_rng(0).integers(0, 3000, 20000))
+    hll = sketches.HyperLogLog(precision=12)
+    for inicio in range(0, len(serie), 3000):
+        hll.actualiza(serie.iloc[inicio:inicio + 3000])
+    assert hll.es_exacto()
+    assert hll.cardinalidad() == serie.nunique()
+
+
+def test_hyperloglog_dentro_del_error_estandar():
+    serie = pd.Series(np.random.default_rng(1).integers(0, 10 ** 12, 200000))
+    hll = sketches.HyperLogLog(precision=12)
+    for inicio in range(0, len(serie), 50000):
+        hll.actualiza(serie.iloc[inicio:inicio + 50000])
+    assert not hll.es_exacto()
+    assert abs(hll.cardinalidad() / serie.nunique() - 1) < 4 * hll.error_estandar()
+
+
+def test_hyperloglog_combinado_igual_a_una_pasada():
+    serie = pd.Series(np.random.default_rng(2).integers(0, 50000, 100000))
+    completo = sketches.HyperLogLog(precision=10, umbral_exacto=40000).actualiza(serie)
+    partes = sketches.HyperLogLog(precision=10, umbral_exacto=40000).actualiza(serie.iloc[:30000])
+    partes.combina(sketches.HyperLogLog(precision=10, umbral_exacto=40000).actualiza(serie.iloc[30000:]))
+    assert (partes.registros == completo.registros).all()
+    assert partes.cardinalidad() == completo.cardinalidad()
+
+
+def test_sketch_cuantiles_dentro_del_error_de_rango():
+    generador = np.random.default_rng(3)
+    valores = np.concatenate([generador.lognormal(3, 1.2, 150000), np.zeros(20000), generador.normal(0, 1, 30000)])
+    generador.shuffle(valores)
+    ordenados = np.sort(valores)
+    for k in (50, 200, 800):
+        sketch = sketches.SketchCuantiles(k=k, semilla=k)
+        for inicio in range(0, len(valores), 7000):
+            sketch.actualiza(valores[inicio:inicio + 7000])
+        error = sketch.error_rango()
+        assert 0 < error < 1
+        for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+            valor, inferior, superior = sketch.cuantil(q)
+            # rango normalizado del valor: cualquier posición entre sus empates es válida
+            rango_bajo = np.searchsorted(ordenados, valor, side='left') / len(valores)
+            rango_alto = np.searchsorted(ordenados, valor, side='right') / len(valores)
+            assert rango_bajo - error <= q <= rango_alto + error
+            assert inferior <= np.quantile(valores, q) <= superior
+
+
+def test_sketch_cuantiles_combinado_y_exacto():
+    valores = np.random.default_rng(4).normal(size=5000)
+    exacto = sketches.SketchCuantiles(k=10000).actualiza(valores)
+    assert exacto.error_rango() == 0
+    assert exacto.cuantil(0.25)[0] == np.percentile(valores, 25)
+    partes = sketches.SketchCuantiles(k=100).actualiza(valores[:2000])
+    partes.combina(sketches.SketchCuantiles(k=100).actualiza(valores[2000:]))
+    assert partes.n == len(valores)
+    assert abs(np.searchsorted(np.sort(valores), partes.cuantil(0.5)[0]) / len(valores) - 0.5) <= partes.error_rango()
+
+
+def test_top_frecuentes_dentro_de_su_cota_de_error():
+    generador = np.random.default_rng(5)
+    serie = pd.Series(generador.zipf(1.3, 200000) % 5000)
+    reales = serie.value_counts()
+    capacidad = 50
+    frecuentes = sketches.TopFrecuentes(capacidad).actualiza_por_bloques(serie.iloc[:120000], 20000)
+    frecuentes.combina(sketches.TopFrecuentes(capacidad).actualiza_por_bloques(serie.iloc[120000:], 20000))
+    frecuentes.compacta()
+    conteos = frecuentes.tabla()['conteo']
+    assert 0 < frecuentes.error <= len(serie) / (capacidad + 1)
+    assert len(conteos) <= capacidad
+    assert ((conteos <= reales[conteos.index]) & (reales[conteos.index] <= conteos + frecuentes.error)).all()
+    # todo valor con frecuencia mayor a N/(capacidad+1) tiene que quedar entre los contadores
+    assert set(reales.index[reales > len(serie) / (capacidad + 1)]) <= set(conteos.index)
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import eda, sql
+
+pytest.importorskip('duckdb')
+
+
+def test_top5_con_empates_en_varios_hilos(tmp_path):
+    generador = np.random.default_rng(0)
+    n = 60000
+    # cada valor aparece el mismo número de veces: el orden del top5 sólo depende de la primera aparición
+    df = pd.DataFrame({'bimestre': generador.permutation(np.repeat(np.arange(50), n // 50)),
+                       'consumo': generador.permutation(np.arange(n) % 7) * 1.5})
+    ruta = str(tmp_path / 'empates.csv')
+    df.to_csv(ruta, index=False)
+    esperado = repr(eda.genera_profiling_por_variable(df)[0])
+    for _ in range(3):
+        assert repr(sql.PerfilSQL(ruta, hilos=4).genera_profiling_por_variable()[0]) == esperado
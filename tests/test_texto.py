@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark, eda
+
+pa = pytest.importorskip('pyarrow')
+
+VALORES = {
+    'ascii': ['agua', 'consumo', 'x', 'tlalpan', 'agua'],
+    'acentos': ['álvaro obregón', 'cuauhtémoc', 'ñ', '', 'coyoacán', None, '💧 agua', ''],
+    'nulos': [None, 'a', np.nan, 'bc', None],
+    'solo_nulos': [None, np.nan],
+    'vacia': [],
+}
+
+
+def texto_con_pandas(serie):
+    # las métricas de la tabla original, con str.len() (en una columna object, sobre los objetos de Python)
+    longitudes = serie.str.len()
+    bytes_ = serie.astype('object').str.encode('utf-8').str.len().astype(longitudes.dtype)
+    return {'unicos': serie.nunique(), 'caracteres_promedio': longitudes.mean(),
+            'caracteres_minimo': longitudes.min(), 'caracteres_maximo': longitudes.max(),
+            'bytes_promedio': bytes_.mean(), 'bytes_minimo': bytes_.min(), 'bytes_maximo': bytes_.max()}
+
+
+@pytest.mark.parametrize('nombre', list(VALORES))
+@pytest.mark.parametrize('tipo', ['object', 'string[pyarrow]'])
+def test_estadisticos_arrow_igual_que_str_len(nombre, tipo):
+    serie = pd.Series(VALORES[nombre], dtype='object').astype(tipo)
+    # un pedazo de en medio para que los offsets no empiecen en cero
+    for parte in (serie, serie.iloc[1:-1]):
+        estadisticos = eda.estadisticos_texto_arrow(parte)
+        esperado = texto_con_pandas(parte)
+        for llave, valor in esperado.items():
+            # mismo valor y mismo tipo, para que la tabla se vea igual
+            assert repr(estadisticos[llave]) == repr(valor), llave
+
+        histograma = estadisticos['histograma']
+        longitudes = parte.astype('object').str.len().dropna()
+        assert histograma['renglones'].sum() == len(longitudes)
+        for _, intervalo in histograma.iterrows():
+            assert intervalo['renglones'] == ((longitudes >= intervalo['desde']) &
+                                              (longitudes < intervalo['hasta'])).sum()
+
+
+def test_columna_que_no_es_texto_regresa_none():
+    assert eda.estadisticos_texto_arrow(pd.Series(['a', 1, 2.5], dtype='object')) is None
+
+
+def test_perfil_arrow_igual_que_pandas():
+    df = pd.concat(benchmark.genera_consumo_agua(3000), ignore_index=True)
+    df.loc[::7, 'geo_shape'] = np.nan
+    contexto = eda.ContextoPerfilamiento(df)
+    lista_texto = contexto.listas[3]
+    con_pandas = eda.genera_profiling_de_texto(df, lista_texto, contexto.vars_type)
+    con_arrow = eda.genera_profiling_de_texto(df, lista_texto, contexto.vars_type, motor='arrow')
+    # los renglones de la tabla original son los mismos; arrow agrega bytes e histograma
+    assert list(con_arrow['metrica'][:len(con_pandas)]) == list(con_pandas['metrica'])
+    assert con_arrow.iloc[:len(con_pandas)].astype(str).to_string() == con_pandas.astype(str).to_string()
+    for col in lista_texto:
+        bytes_ = df[col].str.encode('utf-8').str.len()
+        metricas = con_arrow.set_index('metrica')[col]
+        assert metricas['bytes promedio'] == pytest.approx(bytes_.mean())
+        assert metricas['bytes minimo'] == bytes_.min()
+        assert metricas['bytes maximo'] == bytes_.max()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms import benchmark, eda
+
+
+def cuenta_tipo_de_dato_exacto(df, tipo):
+    # el método original de cuenta_tipo_de_dato (sólo int64 y float64 eran numéricas)
+    vars_type = pd.DataFrame(df.dtypes, columns = ['tipo'])
+    if tipo == 'numerico':
+        cantidad_tipo = len(vars_type.loc[vars_type["tipo"] == "int64"])
+        cantidad_tipo = cantidad_tipo + len(vars_type.loc[vars_type["tipo"] == "float64"])
+    else:
+        cantidad_tipo = len(vars_type.loc[vars_type["tipo"] == tipo])
+    return cantidad_tipo
+
+
+def perfila(df):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return eda.genera_profiling_por_variable(df)
+
+
+@pytest.fixture(scope='module')
+def agua():
+    df = pd.concat(benchmark.genera_consumo_agua(5000), ignore_index=True)
+    # unas flotantes que sí caben exactas en float32
+    df['consumo_medio'] = np.round(df['consumo_total'] * 2) / 2
+    return df
+
+
+@pytest.mark.parametrize('tipo', ['numerico', 'object', 'category', 'int64', 'float64'])
+def test_cuenta_tipo_de_dato_igual_que_original(agua, tipo):
+    assert eda.cuenta_tipo_de_dato(agua, tipo) == cuenta_tipo_de_dato_exacto(agua, tipo)
+
+
+def test_optimiza_tipos_conserva_valores_y_familias(agua):
+    optimizado, reporte = eda.optimiza_tipos(agua)
+    assert optimizado['anio'].dtype == 'int16'
+    assert optimizado['consumo_medio'].dtype == 'float32'
+    assert optimizado['alcaldia'].dtype == 'category'
+    pd.testing.assert_frame_equal(optimizado.astype(agua.dtypes.to_dict()), agua)
+    # las numéricas compactadas se siguen contando como numéricas
+    assert eda.cuenta_tipo_de_dato(optimizado, 'numerico') == cuenta_tipo_de_dato_exacto(agua, 'numerico')
+
+    bytes_originales = agua.memory_usage(index=False, deep=True)
+    bytes_optimizados = optimizado.memory_usage(index=False, deep=True)
+    reporte = reporte.set_index('variable')
+    assert reporte['bytes_originales'].to_dict() == bytes_originales.to_dict()
+    assert reporte['bytes_optimizados'].to_dict() == bytes_optimizados.to_dict()
+    assert (reporte['bytes_ahorrados'] == reporte['bytes_originales'] - reporte['bytes_optimizados']).all()
+
+
+def test_optimiza_tipos_perfila_igual_que_original(agua):
+    optimizado, _ = eda.optimiza_tipos(agua)
+    numericas, categoricas, _ = perfila(optimizado)
+    esperado_numericas, _, _ = perfila(agua)
+    # salvo el renglón del tipo, las numéricas se perfilan con los valores en int64/float64
+    sin_tipo = esperado_numericas['metrica'] != 'tipo'
+    assert (numericas[sin_tipo].astype(str).to_string() ==
+            esperado_numericas[sin_tipo].astype(str).to_string())
+
+    # las de texto que pasan a category se perfilan como si se hubieran convertido a mano
+    a_categoria = [col for col in agua.columns if optimizado[col].dtype == 'category']
+    _, esperado_categoricas, _ = perfila(agua.astype({col: 'category' for col in a_categoria}))
+    assert categoricas.astype(str).to_string() == esperado_categoricas.astype(str).to_string()